@@ -5,7 +5,11 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from motor.motor_asyncio import AsyncIOMotorClient
 from models.user import User, UserResponse
+from database import get_database
+from services.cache import TTLCache
+from typing import Dict
 import os
+import time
 from bson import ObjectId
 
 # JWT Configuration
@@ -15,6 +19,22 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60  # 30 days
 
 security = HTTPBearer()
 
+# Verified principals keyed by raw token, so repeat requests skip jwt.decode
+# and the users lookup. Entries never outlive the token's own expiry.
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+principal_cache = TTLCache(
+    maxsize=int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000")),
+    ttl=PRINCIPAL_CACHE_TTL,
+    name="principals"
+)
+# Bumped on logout/profile changes; cached principals from older generations are ignored
+_principal_generations: Dict[str, int] = {}
+
+
+def invalidate_user_principals(user_id: str):
+    """Drop every cached principal for a user, whichever token it was cached under"""
+    _principal_generations[user_id] = _principal_generations.get(user_id, 0) + 1
+
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -28,10 +48,15 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: AsyncIOMotorClient = Depends(lambda: None)  # Will be injected properly
-) -> UserResponse:
+async def authenticate_token(token: str) -> UserResponse:
+    """Verify a JWT and load the user it was issued for"""
+    cached = principal_cache.get(token)
+    if cached is not None:
+        principal, generation = cached
+        if _principal_generations.get(principal.id, 0) == generation:
+            return principal
+        principal_cache.invalidate(token)
+    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -39,22 +64,34 @@ async def get_current_user(
     )
     
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
     
-    # Get database from app state (will be set up in main server)
-    from server import db
+    db = await get_database()
+    generation = _principal_generations.get(user_id, 0)
     
     user_doc = await db.users.find_one({"_id": ObjectId(user_id)})
     if user_doc is None:
         raise credentials_exception
     
     user = User(**user_doc)
-    return UserResponse.from_user(user)
+    principal = UserResponse.from_user(user)
+    
+    ttl = min(PRINCIPAL_CACHE_TTL, payload.get("exp", 0) - time.time())
+    if ttl > 0:
+        principal_cache.set(token, (principal, generation), ttl=ttl)
+    return principal
+
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncIOMotorClient = Depends(lambda: None)  # Will be injected properly
+) -> UserResponse:
+    return await authenticate_token(credentials.credentials)
 
 
 async def get_optional_current_user(
@@ -0,0 +1,143 @@
+from typing import Optional
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import monitoring
+from services.metrics import command_timing
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_NAME = "virtual_meeting_db"
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Keeps running counters for the driver's connection pools"""
+
+    def __init__(self):
+        self.pools_created = 0
+        self.pools_cleared = 0
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.checkout_failures = 0
+
+    @property
+    def open_connections(self) -> int:
+        return self.connections_created - self.connections_closed
+
+    @property
+    def checked_out(self) -> int:
+        return self.checkouts - self.checkins
+
+    def pool_created(self, event):
+        self.pools_created += 1
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self.pools_cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.connections_created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.connections_closed += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        self.checkouts += 1
+
+    def connection_checked_in(self, event):
+        self.checkins += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "pools_created": self.pools_created,
+            "pools_cleared": self.pools_cleared,
+            "connections_created": self.connections_created,
+            "connections_closed": self.connections_closed,
+            "open_connections": self.open_connections,
+            "checked_out": self.checked_out,
+            "checkouts": self.checkouts,
+            "checkout_failures": self.checkout_failures,
+        }
+
+
+def _int_env(name: str, default: Optional[int]) -> Optional[int]:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def client_options() -> dict:
+    """Pool, timeout and compression settings read from the environment"""
+    options = {
+        "maxPoolSize": _int_env("MONGO_MAX_POOL_SIZE", 100),
+        "minPoolSize": _int_env("MONGO_MIN_POOL_SIZE", 5),
+        "maxIdleTimeMS": _int_env("MONGO_MAX_IDLE_TIME_MS", 300000),
+        "connectTimeoutMS": _int_env("MONGO_CONNECT_TIMEOUT_MS", 10000),
+        "serverSelectionTimeoutMS": _int_env("MONGO_SERVER_SELECTION_TIMEOUT_MS", 10000),
+        "socketTimeoutMS": _int_env("MONGO_SOCKET_TIMEOUT_MS", None),
+        "waitQueueTimeoutMS": _int_env("MONGO_WAIT_QUEUE_TIMEOUT_MS", None),
+    }
+    compressors = os.environ.get("MONGO_COMPRESSORS")
+    if compressors:
+        options["compressors"] = compressors
+    return {key: value for key, value in options.items() if value is not None}
+
+
+pool_stats = PoolStatsListener()
+
+_client: Optional[AsyncIOMotorClient] = None
+_db: Optional[AsyncIOMotorDatabase] = None
+_options: dict = {}
+
+
+def connect() -> AsyncIOMotorDatabase:
+    """Create the application-wide client. Called once from the app lifespan."""
+    global _client, _db, _options
+    if _client is None:
+        _options = client_options()
+        _client = AsyncIOMotorClient(
+            os.environ["MONGO_URL"],
+            event_listeners=[pool_stats, command_timing],
+            **_options
+        )
+        _db = _client[os.environ.get("DB_NAME", DEFAULT_DB_NAME)]
+        logger.info("MongoDB client created with options %s", _options)
+    return _db
+
+
+def close():
+    global _client, _db
+    if _client is not None:
+        _client.close()
+        _client = None
+        _db = None
+
+
+async def get_database() -> AsyncIOMotorDatabase:
+    """FastAPI dependency returning the shared database handle"""
+    if _db is None:
+        raise RuntimeError("Database client is not initialised; is the app lifespan running?")
+    return _db
+
+
+def get_pool_stats() -> dict:
+    return {
+        "options": dict(_options),
+        "connected": _client is not None,
+        **pool_stats.snapshot(),
+    }
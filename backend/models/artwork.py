@@ -64,6 +64,10 @@ class ArtworkUpdate(BaseModel):
     is_public: Optional[bool] = None
 
 
+class ArtworkLikeQuery(BaseModel):
+    artwork_ids: List[str] = Field(..., max_length=500)
+
+
 class ArtworkResponse(BaseModel):
     id: str
     artist_id: str
@@ -83,14 +87,21 @@ class ArtworkResponse(BaseModel):
     is_public: bool = True
     created_at: datetime
     updated_at: datetime
+    cursor: Optional[str] = None  # Opaque keyset token for paging listings
 
     @classmethod
-    def from_artwork(cls, artwork: Artwork, artist_name: str):
+    def from_artwork(cls, artwork: Artwork, artist_name: str, cursor: Optional[str] = None):
         return cls(
             artist_name=artist_name,
+            cursor=cursor,
             **artwork.dict()
         )
 
+    @classmethod
+    def from_doc(cls, artwork_doc: dict, artist_name: str, cursor: Optional[str] = None):
+        """Build from a stored artwork document without re-validating it"""
+        return cls.model_construct(**artwork_doc, artist_name=artist_name, cursor=cursor)
+
 
 class SuiteInfo(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
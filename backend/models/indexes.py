@@ -0,0 +1,74 @@
+from dataclasses import dataclass, field
+from typing import List, Tuple
+from pymongo import IndexModel, ASCENDING, DESCENDING
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    collection: str
+    keys: Tuple[Tuple[str, int], ...]
+    name: str
+    unique: bool = False
+    sparse: bool = False
+    reason: str = field(default="", compare=False)
+
+    def to_model(self) -> IndexModel:
+        options = {"name": self.name}
+        if self.unique:
+            options["unique"] = True
+        if self.sparse:
+            options["sparse"] = True
+        return IndexModel(list(self.keys), **options)
+
+
+def _gallery_indexes() -> List[IndexSpec]:
+    # Keyset pagination of gallery listings, one per scope and sort order
+    return [
+        IndexSpec(
+            "artworks",
+            ((scope, ASCENDING), (sort_field, DESCENDING), ("id", DESCENDING)),
+            f"{scope}_{sort_field}_id",
+            reason=f"gallery listing by {scope} sorted by {sort_field}"
+        )
+        for scope in ("is_public", "suite_id")
+        for sort_field in ("created_at", "likes", "views")
+    ]
+
+
+# Every index the application relies on. Synced at startup by
+# services.index_manager; `python -m services.index_manager` diffs it against
+# a live database.
+INDEXES: List[IndexSpec] = [
+    # users
+    IndexSpec("users", (("email", ASCENDING),), "email", unique=True,
+              reason="login/register/invite lookups by email"),
+
+    # scenes
+    IndexSpec("scenes", (("owner", ASCENDING),), "owner",
+              reason="get_user_scenes owned scenes"),
+    IndexSpec("scenes", (("collaborators.user", ASCENDING), ("collaborators.status", ASCENDING)),
+              "collaborators_user_status", reason="get_user_scenes shared scenes"),
+
+    # scene_ops
+    IndexSpec("scene_ops", (("scene_id", ASCENDING), ("version", ASCENDING)), "scene_id_version", unique=True,
+              reason="one op per scene version; replaying ops since a snapshot"),
+
+    # messages
+    IndexSpec("messages", (("scene_id", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)),
+              "scene_id_timestamp_id", reason="keyset pagination of scene chat history"),
+
+    # media
+    IndexSpec("media", (("scene_id", ASCENDING),), "scene_id",
+              reason="scene media listing and cleanup on scene delete"),
+
+    # artworks
+    IndexSpec("artworks", (("id", ASCENDING),), "id", unique=True,
+              reason="every artwork lookup, update and counter flush"),
+    *_gallery_indexes(),
+
+    # artwork_likes
+    IndexSpec("artwork_likes", (("artwork_id", ASCENDING), ("user_id", ASCENDING)),
+              "artwork_id_user_id", unique=True, reason="one like per user per artwork"),
+    IndexSpec("artwork_likes", (("user_id", ASCENDING), ("artwork_id", ASCENDING)),
+              "user_id_artwork_id", reason="which of these artworks have I liked"),
+]
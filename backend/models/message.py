@@ -55,14 +55,29 @@ class MessageResponse(BaseModel):
     content: str
     type: str
     timestamp: datetime
+    cursor: Optional[str] = None  # Opaque keyset token for before/after paging
 
     @classmethod
-    def from_message(cls, message: Message, sender_details: dict):
+    def from_message(cls, message: Message, sender_details: dict, cursor: Optional[str] = None):
         return cls(
             id=str(message.id),
             scene_id=str(message.scene_id),
             sender=sender_details,
             content=message.content,
             type=message.type,
-            timestamp=message.timestamp
+            timestamp=message.timestamp,
+            cursor=cursor
+        )
+
+    @classmethod
+    def from_doc(cls, message_doc: dict, sender_details: dict, cursor: Optional[str] = None):
+        """Build from a stored message document without re-validating it"""
+        return cls.model_construct(
+            id=str(message_doc["_id"]),
+            scene_id=str(message_doc["scene_id"]),
+            sender=sender_details,
+            content=message_doc["content"],
+            type=message_doc.get("type", "text"),
+            timestamp=message_doc["timestamp"],
+            cursor=cursor
         )
\ No newline at end of file
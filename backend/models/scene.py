@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional, List, Dict, Any, Literal
 from datetime import datetime
 from bson import ObjectId
 
@@ -63,6 +63,8 @@ class Scene(BaseModel):
     owner: PyObjectId
     collaborators: List[Collaborator] = []
     is_public: bool = False
+    version: int = 0  # Head of the scene's op log; used for optimistic concurrency
+    snapshot_version: int = 0  # Version that `objects` reflects, see services.scene_log
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -80,6 +82,19 @@ class Scene(BaseModel):
             }
         }
 
+    @classmethod
+    def from_doc(cls, scene_doc: dict):
+        """Build from a stored scene document without re-validating it.
+
+        Scenes can hold thousands of objects; documents we wrote ourselves
+        don't need every one of them checked again on each read.
+        """
+        return cls.model_construct(**{
+            **scene_doc,
+            "objects": [SceneObject.model_construct(**obj) for obj in scene_doc.get("objects", [])],
+            "collaborators": [Collaborator.model_construct(**collab) for collab in scene_doc.get("collaborators", [])]
+        })
+
 
 class SceneCreate(BaseModel):
     name: str
@@ -106,6 +121,85 @@ class SceneUpdate(BaseModel):
     is_public: Optional[bool] = None
 
 
+class SceneObjectChanges(BaseModel):
+    type: Optional[str] = None
+    position: Optional[Dict[str, float]] = None
+    rotation: Optional[float] = None
+    scale: Optional[float] = None
+    z_index: Optional[int] = None
+
+
+class SceneObjectOp(BaseModel):
+    op: Literal["add", "update", "remove"]
+    id: Optional[str] = None  # Target object for update/remove
+    object: Optional[SceneObject] = None  # Full object for add
+    changes: Optional[SceneObjectChanges] = None  # Fields to change for update
+
+    @model_validator(mode="after")
+    def check_payload(self):
+        if self.op == "add" and self.object is None:
+            raise ValueError("add requires object")
+        if self.op in ("update", "remove") and not self.id:
+            raise ValueError(f"{self.op} requires id")
+        if self.op == "update" and (self.changes is None or not self.changes.dict(exclude_unset=True)):
+            raise ValueError("update requires changes")
+        return self
+
+
+class ScenePatch(BaseModel):
+    version: int  # The version the client's edits are based on
+    ops: List[SceneObjectOp]
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "version": 12,
+                "ops": [
+                    {"op": "update", "id": "obj_123", "changes": {"position": {"x": 180, "y": 240}}},
+                    {"op": "add", "object": {"id": "obj_456", "type": "plant", "position": {"x": 10, "y": 20}}},
+                    {"op": "remove", "id": "obj_789"}
+                ]
+            }
+        }
+
+
+class ScenePatchResponse(BaseModel):
+    version: int
+    objects: List[SceneObject]  # Added and updated objects as now stored
+    removed: List[str]
+
+
+class SceneOpEntry(BaseModel):
+    version: int
+    user_id: Optional[str] = None
+    removed: List[str] = []
+    updated: Dict[str, Dict[str, Any]] = {}
+    added: List[SceneObject] = []
+    replace: Optional[List[SceneObject]] = None  # Whole objects array replaced (PUT)
+    created_at: datetime
+
+    @classmethod
+    def from_entry(cls, entry: dict):
+        return cls(
+            version=entry["version"],
+            user_id=str(entry["user_id"]) if entry.get("user_id") else None,
+            removed=entry.get("removed", []),
+            updated=entry.get("updated", {}),
+            added=entry.get("added", []),
+            replace=entry.get("replace"),
+            created_at=entry["created_at"]
+        )
+
+
+class SceneSyncResponse(BaseModel):
+    version: int
+    # Set only when the client's version can't be served as a delta: apply
+    # `ops` on top of these objects instead of the client's own copy
+    snapshot_version: Optional[int] = None
+    objects: Optional[List[SceneObject]] = None
+    ops: List[SceneOpEntry]
+
+
 class SceneResponse(BaseModel):
     id: str
     name: str
@@ -115,12 +209,14 @@ class SceneResponse(BaseModel):
     owner: str
     collaborators: List[Dict[str, Any]]
     is_public: bool
+    version: int = 0
     created_at: datetime
     updated_at: datetime
 
     @classmethod
     def from_scene(cls, scene: Scene, owner_name: str = None, collaborator_details: List[Dict] = None):
-        return cls(
+        # The scene is already a model; its fields need no second validation
+        return cls.model_construct(
             id=str(scene.id),
             name=scene.name,
             description=scene.description or "",
@@ -129,6 +225,7 @@ class SceneResponse(BaseModel):
             owner=str(scene.owner),
             collaborators=collaborator_details or [],
             is_public=scene.is_public,
+            version=scene.version,
             created_at=scene.created_at,
             updated_at=scene.updated_at
         )
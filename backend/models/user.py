@@ -45,12 +45,18 @@ class User(BaseModel):
             }
         }
 
+    # These block for the full bcrypt cost; async handlers should go through
+    # services.passwords.password_hasher instead of calling them directly.
     @staticmethod
-    def hash_password(password: str) -> str:
-        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    def hash_password(password: str, rounds: int = 12) -> str:
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+    
+    @staticmethod
+    def check_password(password: str, hashed: str) -> bool:
+        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
     
     def verify_password(self, password: str) -> bool:
-        return bcrypt.checkpw(password.encode('utf-8'), self.password.encode('utf-8'))
+        return self.check_password(password, self.password)
 
 
 class UserCreate(BaseModel):
@@ -97,4 +103,8 @@ class UserResponse(BaseModel):
 
 class UserUpdate(BaseModel):
     name: Optional[str] = None
-    avatar: Optional[str] = None
\ No newline at end of file
+    avatar: Optional[str] = None
+
+
+class PresenceHeartbeat(BaseModel):
+    suite_id: Optional[str] = None  # Artist suite the user is currently in, if any
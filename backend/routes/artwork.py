@@ -1,25 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import List, Optional
 import os
-import uuid
-import aiofiles
 from datetime import datetime
 import json
+from enum import Enum
 
-from models.artwork import Artwork, ArtworkCreate, ArtworkUpdate, ArtworkResponse, SuiteInfo
+from models.artwork import Artwork, ArtworkCreate, ArtworkUpdate, ArtworkResponse, ArtworkLikeQuery, SuiteInfo
 from models.user import User
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError
+from database import get_database
+from services.uploads import UPLOAD_DIR, MAX_UPLOAD_SIZES, store_upload, release_upload
+from services.derivatives import derivative_pipeline
+from services.media_metadata import metadata_extractor
+from services.cache import TTLCache
+from services import suite_counts
+from services.counters import view_counter, like_counter
+from services.presence import presence
+from services.pagination import cursor_for, decode_cursor, keyset_filter
+from services.serialization import FastJSONResponse
 
 router = APIRouter()
 security = HTTPBearer()
 
-# Get database connection
-def get_database():
-    client = AsyncIOMotorClient(os.environ.get("MONGO_URL"))
-    return client[os.environ.get("DB_NAME", "virtual_meeting")]
-
-
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Get current user from JWT token"""
     from auth import get_current_user as auth_get_current_user
@@ -97,21 +101,103 @@ ARTIST_SUITES = {
 }
 
 
+class GallerySort(str, Enum):
+    newest = "newest"
+    most_liked = "most_liked"
+    most_viewed = "most_viewed"
+
+
+# Keyset orders for gallery listings; "id" breaks ties so pages never overlap
+GALLERY_SORTS = {
+    GallerySort.newest: [("created_at", -1), ("id", -1)],
+    GallerySort.most_liked: [("likes", -1), ("id", -1)],
+    GallerySort.most_viewed: [("views", -1), ("id", -1)],
+}
+
+# Only the fields a gallery listing renders
+LISTING_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "artist_id": 1,
+    "suite_id": 1,
+    "title": 1,
+    "description": 1,
+    "type": 1,
+    "file_url": 1,
+    "thumbnail_url": 1,
+    "mime_type": 1,
+    "file_size": 1,
+    "metadata.variants": 1,
+    "metadata.duration": 1,
+    "metadata.width": 1,
+    "metadata.height": 1,
+    "tags": 1,
+    "likes": 1,
+    "views": 1,
+    "is_public": 1,
+    "created_at": 1,
+    "updated_at": 1,
+}
+
+GALLERY_PAGE_SIZE = 50
+GALLERY_MAX_PAGE_SIZE = 200
+
+# First pages are what the 3D colony's walls request on every visit
+gallery_cache = TTLCache(
+    maxsize=128,
+    ttl=float(os.environ.get("GALLERY_CACHE_TTL", 15)),
+    name="gallery_first_pages"
+)
+
+
+async def list_artworks(
+    db: AsyncIOMotorClient,
+    query: dict,
+    sort: GallerySort,
+    limit: int,
+    after: Optional[str],
+    scope: str
+) -> List[ArtworkResponse]:
+    """One keyset page of artworks, projected to listing fields"""
+    cache_key = (scope, sort, limit)
+    if after is None:
+        cached = gallery_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    
+    sort_spec = GALLERY_SORTS[sort]
+    if after:
+        query = {**query, **keyset_filter(sort_spec, decode_cursor(after, len(sort_spec)))}
+    
+    cursor = db.artworks.find(query, LISTING_PROJECTION).sort(sort_spec).limit(limit)
+    
+    response_artworks = []
+    async for artwork_doc in cursor:
+        suite_info = ARTIST_SUITES.get(artwork_doc["suite_id"], {})
+        artist_name = suite_info.get("artist_name", "Unknown Artist")
+        response_artworks.append(
+            ArtworkResponse.from_doc(artwork_doc, artist_name, cursor_for(artwork_doc, sort_spec))
+        )
+    
+    if after is None:
+        gallery_cache.set(cache_key, response_artworks)
+    return response_artworks
+
+
 @router.get("/suites", response_model=List[SuiteInfo])
-async def get_all_suites():
+async def get_all_suites(db: AsyncIOMotorClient = Depends(get_database)):
     """Get all artist suite information"""
-    suites = []
-    db = get_database()
+    # Artwork counts for every suite in one read of the maintained counters
+    artwork_counts = await suite_counts.get_counts(db, ARTIST_SUITES.keys())
     
+    suites = []
     for suite_id, suite_data in ARTIST_SUITES.items():
-        # Get artwork count for this suite
-        artwork_count = await db.artworks.count_documents({"suite_id": suite_id})
-        
+        is_online, last_seen = presence.suite_status(suite_id)
         suite_info = SuiteInfo(
             **suite_data,
-            artwork_count=artwork_count,
-            is_online=False,  # TODO: Implement real online status
-            last_seen="Unknown"
+            artwork_count=artwork_counts[suite_id],
+            is_online=is_online,
+            last_seen=last_seen.isoformat() if last_seen else "Unknown"
         )
         suites.append(suite_info)
     
@@ -119,41 +205,37 @@ async def get_all_suites():
 
 
 @router.get("/suites/{suite_id}", response_model=SuiteInfo)
-async def get_suite_info(suite_id: str):
+async def get_suite_info(suite_id: str, db: AsyncIOMotorClient = Depends(get_database)):
     """Get specific suite information"""
     if suite_id not in ARTIST_SUITES:
         raise HTTPException(status_code=404, detail="Suite not found")
     
-    db = get_database()
-    artwork_count = await db.artworks.count_documents({"suite_id": suite_id})
+    artwork_count = await suite_counts.get_count(db, suite_id)
     
     suite_data = ARTIST_SUITES[suite_id]
+    is_online, last_seen = presence.suite_status(suite_id)
     return SuiteInfo(
         **suite_data,
         artwork_count=artwork_count,
-        is_online=False,
-        last_seen="Unknown"
+        is_online=is_online,
+        last_seen=last_seen.isoformat() if last_seen else "Unknown"
     )
 
 
 @router.get("/suites/{suite_id}/artworks", response_model=List[ArtworkResponse])
-async def get_suite_artworks(suite_id: str, current_user: User = Depends(get_current_user)):
-    """Get all artworks for a specific suite"""
+async def get_suite_artworks(
+    suite_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorClient = Depends(get_database),
+    sort: GallerySort = Query(GallerySort.newest, description="Listing order"),
+    limit: int = Query(GALLERY_PAGE_SIZE, ge=1, le=GALLERY_MAX_PAGE_SIZE, description="Number of artworks to retrieve"),
+    after: Optional[str] = Query(None, description="Cursor of an artwork; return the page that follows it")
+):
+    """Get a page of artworks for a specific suite"""
     if suite_id not in ARTIST_SUITES:
         raise HTTPException(status_code=404, detail="Suite not found")
     
-    db = get_database()
-    artworks = await db.artworks.find({"suite_id": suite_id}).to_list(length=None)
-    
-    response_artworks = []
-    for artwork_doc in artworks:
-        artwork = Artwork(**artwork_doc)
-        suite_info = ARTIST_SUITES[suite_id]
-        response_artworks.append(
-            ArtworkResponse.from_artwork(artwork, suite_info["artist_name"])
-        )
-    
-    return response_artworks
+    return FastJSONResponse(await list_artworks(db, {"suite_id": suite_id}, sort, limit, after, scope=suite_id))
 
 
 @router.post("/suites/{suite_id}/artworks", response_model=ArtworkResponse)
@@ -165,7 +247,8 @@ async def upload_artwork(
     artwork_type: str = Form(...),
     tags: str = Form("[]"),  # JSON string of tags
     is_public: bool = Form(True),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorClient = Depends(get_database)
 ):
     """Upload artwork to a specific suite"""
     if suite_id not in ARTIST_SUITES:
@@ -195,19 +278,10 @@ async def upload_artwork(
             detail=f"Invalid file type for {artwork_type}. Allowed: {allowed_types[artwork_type]}"
         )
     
-    # Create upload directory
-    upload_dir = "/app/uploads"
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    # Generate unique filename
+    # Store file by content hash, enforcing the size limit for this artwork type.
+    # Identical content uploaded again shares the existing file.
     file_extension = file.filename.split('.')[-1] if '.' in file.filename else ''
-    unique_filename = f"{uuid.uuid4()}.{file_extension}"
-    file_path = os.path.join(upload_dir, unique_filename)
-    
-    # Save file
-    async with aiofiles.open(file_path, 'wb') as f:
-        content = await file.read()
-        await f.write(content)
+    stored = await store_upload(db, file, file_extension, MAX_UPLOAD_SIZES[artwork_type])
     
     # Create artwork record
     artwork = Artwork(
@@ -216,16 +290,27 @@ async def upload_artwork(
         title=title,
         description=description,
         type=artwork_type,
-        file_url=f"/uploads/{unique_filename}",
+        file_url=stored.url,
         mime_type=file.content_type,
-        file_size=len(content),
+        file_size=stored.size,
+        metadata={"sha256": stored.sha256, "storage_key": stored.key},
         tags=tag_list,
         is_public=is_public
     )
     
-    # Save to database
-    db = get_database()
-    await db.artworks.insert_one(artwork.dict())
+    # Save to database; without a record nothing would ever release the blob
+    try:
+        await db.artworks.insert_one(artwork.dict())
+    except BaseException:
+        await release_upload(db, stored.key)
+        raise
+    await suite_counts.increment(db, suite_id)
+    
+    # Thumbnails and texture-sized variants are filled in later, off the request path
+    derivative_pipeline.schedule(db, artwork, stored.path, stored.sha256)
+    # Duration, sample rate and bitrate, or pixel dimensions, read from the file's headers
+    metadata_extractor.schedule(db, artwork, stored.path)
+    gallery_cache.clear()
     
     # Return response
     suite_info = ARTIST_SUITES[suite_id]
@@ -233,37 +318,32 @@ async def upload_artwork(
 
 
 @router.get("/artworks/{artwork_id}", response_model=ArtworkResponse)
-async def get_artwork(artwork_id: str):
+async def get_artwork(artwork_id: str, db: AsyncIOMotorClient = Depends(get_database)):
     """Get specific artwork by ID"""
-    db = get_database()
     artwork_doc = await db.artworks.find_one({"id": artwork_id})
     
     if not artwork_doc:
         raise HTTPException(status_code=404, detail="Artwork not found")
     
-    artwork = Artwork(**artwork_doc)
-    
     # Get artist name from suite info
-    suite_info = ARTIST_SUITES.get(artwork.suite_id, {})
+    suite_info = ARTIST_SUITES.get(artwork_doc["suite_id"], {})
     artist_name = suite_info.get("artist_name", "Unknown Artist")
     
-    # Increment views
-    await db.artworks.update_one(
-        {"id": artwork_id},
-        {"$inc": {"views": 1}}
-    )
+    # Increment views; buffered and written in batches by the view counter
+    view_counter.record(artwork_id)
+    artwork_doc["views"] = artwork_doc.get("views", 0) + view_counter.pending(artwork_id)
     
-    return ArtworkResponse.from_artwork(artwork, artist_name)
+    return FastJSONResponse(ArtworkResponse.from_doc(artwork_doc, artist_name))
 
 
 @router.put("/artworks/{artwork_id}", response_model=ArtworkResponse)
 async def update_artwork(
     artwork_id: str,
     artwork_update: ArtworkUpdate,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorClient = Depends(get_database)
 ):
     """Update artwork details"""
-    db = get_database()
     artwork_doc = await db.artworks.find_one({"id": artwork_id})
     
     if not artwork_doc:
@@ -283,6 +363,7 @@ async def update_artwork(
         {"id": artwork_id},
         {"$set": update_data}
     )
+    gallery_cache.clear()
     
     # Get updated artwork
     updated_doc = await db.artworks.find_one({"id": artwork_id})
@@ -297,10 +378,10 @@ async def update_artwork(
 @router.delete("/artworks/{artwork_id}")
 async def delete_artwork(
     artwork_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorClient = Depends(get_database)
 ):
     """Delete artwork"""
-    db = get_database()
     artwork_doc = await db.artworks.find_one({"id": artwork_id})
     
     if not artwork_doc:
@@ -312,49 +393,90 @@ async def delete_artwork(
     if artwork.artist_id != str(current_user.id):
         raise HTTPException(status_code=403, detail="Not authorized to delete this artwork")
     
-    # Delete file
-    file_path = f"/app{artwork.file_url}"
-    if os.path.exists(file_path):
-        os.remove(file_path)
+    # Release the stored file; shared content is removed with its last reference
+    storage_key = (artwork.metadata or {}).get("storage_key")
+    if storage_key:
+        if await release_upload(db, storage_key):
+            derivative_pipeline.remove(artwork.metadata["sha256"])
+    else:
+        file_path = os.path.join(UPLOAD_DIR, os.path.basename(artwork.file_url))
+        if os.path.exists(file_path):
+            os.remove(file_path)
     
     # Delete from database
-    await db.artworks.delete_one({"id": artwork_id})
+    result = await db.artworks.delete_one({"id": artwork_id})
+    if result.deleted_count:
+        await suite_counts.increment(db, artwork.suite_id, -1)
+        await db.artwork_likes.delete_many({"artwork_id": artwork_id})
+    gallery_cache.clear()
     
     return {"message": "Artwork deleted successfully"}
 
 
-@router.post("/artworks/{artwork_id}/like")
-async def like_artwork(artwork_id: str, current_user: User = Depends(get_current_user)):
-    """Like an artwork"""
-    db = get_database()
-    
-    # Check if artwork exists
-    artwork_doc = await db.artworks.find_one({"id": artwork_id})
-    if not artwork_doc:
-        raise HTTPException(status_code=404, detail="Artwork not found")
+@router.post("/artworks/liked")
+async def get_liked_artworks(
+    query: ArtworkLikeQuery,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorClient = Depends(get_database)
+):
+    """Which of the given artworks the current user has liked, in one query"""
+    liked = await db.artwork_likes.find(
+        {"user_id": str(current_user.id), "artwork_id": {"$in": query.artwork_ids}},
+        {"_id": 0, "artwork_id": 1}
+    ).to_list(length=len(query.artwork_ids))
     
-    # Increment likes
-    await db.artworks.update_one(
-        {"id": artwork_id},
-        {"$inc": {"likes": 1}}
+    return {"liked": [like["artwork_id"] for like in liked]}
+
+
+@router.post("/artworks/{artwork_id}/like")
+async def like_artwork(
+    artwork_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorClient = Depends(get_database)
+):
+    """Like an artwork. Liking again is a no-op."""
+    try:
+        result = await db.artwork_likes.update_one(
+            {"artwork_id": artwork_id, "user_id": str(current_user.id)},
+            {"$setOnInsert": {"created_at": datetime.utcnow()}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # A concurrent request from the same user inserted the like first
+        return {"message": "Artwork liked successfully", "liked": True}
+    
+    if result.upserted_id is not None:
+        # First like from this user; make sure the artwork exists before counting it
+        if not await db.artworks.find_one({"id": artwork_id}, {"_id": 1}):
+            await db.artwork_likes.delete_one({"_id": result.upserted_id})
+            raise HTTPException(status_code=404, detail="Artwork not found")
+        like_counter.record(artwork_id)
+    
+    return {"message": "Artwork liked successfully", "liked": True}
+
+
+@router.delete("/artworks/{artwork_id}/like")
+async def unlike_artwork(
+    artwork_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorClient = Depends(get_database)
+):
+    """Remove the current user's like from an artwork"""
+    result = await db.artwork_likes.delete_one(
+        {"artwork_id": artwork_id, "user_id": str(current_user.id)}
     )
+    if result.deleted_count:
+        like_counter.record(artwork_id, -1)
     
-    return {"message": "Artwork liked successfully"}
+    return {"message": "Artwork unliked successfully", "liked": False}
 
 
 @router.get("/public-gallery", response_model=List[ArtworkResponse])
-async def get_public_gallery():
-    """Get all public artworks across all suites"""
-    db = get_database()
-    artworks = await db.artworks.find({"is_public": True}).to_list(length=None)
-    
-    response_artworks = []
-    for artwork_doc in artworks:
-        artwork = Artwork(**artwork_doc)
-        suite_info = ARTIST_SUITES.get(artwork.suite_id, {})
-        artist_name = suite_info.get("artist_name", "Unknown Artist")
-        response_artworks.append(
-            ArtworkResponse.from_artwork(artwork, artist_name)
-        )
-    
-    return response_artworks
\ No newline at end of file
+async def get_public_gallery(
+    db: AsyncIOMotorClient = Depends(get_database),
+    sort: GallerySort = Query(GallerySort.newest, description="Listing order"),
+    limit: int = Query(GALLERY_PAGE_SIZE, ge=1, le=GALLERY_MAX_PAGE_SIZE, description="Number of artworks to retrieve"),
+    after: Optional[str] = Query(None, description="Cursor of an artwork; return the page that follows it")
+):
+    """Get a page of public artworks across all suites"""
+    return FastJSONResponse(await list_artworks(db, {"is_public": True}, sort, limit, after, scope="public"))
@@ -1,8 +1,13 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from fastapi.security import HTTPBearer
 from motor.motor_asyncio import AsyncIOMotorClient
-from models.user import User, UserCreate, UserLogin, UserResponse, UserUpdate
-from auth import create_access_token, get_current_user
+from models.user import User, UserCreate, UserLogin, UserResponse, UserUpdate, PresenceHeartbeat
+from database import get_database
+from auth import create_access_token, get_current_user, invalidate_user_principals
+from services.hydration import user_summary_cache
+from services.passwords import password_hasher
+from services.presence import presence
+from routes.artwork import ARTIST_SUITES
 from datetime import timedelta
 import os
 from bson import ObjectId
@@ -11,11 +16,6 @@ router = APIRouter(prefix="/auth", tags=["authentication"])
 security = HTTPBearer()
 
 
-async def get_database():
-    from server import db
-    return db
-
-
 @router.post("/register", response_model=dict)
 async def register_user(
     user_data: UserCreate,
@@ -30,7 +30,7 @@ async def register_user(
         )
     
     # Create new user
-    hashed_password = User.hash_password(user_data.password)
+    hashed_password = await password_hasher.hash(user_data.password)
     user = User(
         name=user_data.name,
         email=user_data.email,
@@ -42,6 +42,7 @@ async def register_user(
     user_dict = user.dict(by_alias=True)
     result = await db.users.insert_one(user_dict)
     user.id = result.inserted_id
+    presence.heartbeat(str(user.id))
     
     # Create access token
     access_token = create_access_token(
@@ -72,17 +73,24 @@ async def login_user(
     user = User(**user_doc)
     
     # Verify password
-    if not user.verify_password(user_credentials.password):
+    if not await password_hasher.verify(user_credentials.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
         )
     
-    # Update user online status
-    await db.users.update_one(
-        {"_id": user.id},
-        {"$set": {"is_online": True, "last_seen": user.last_seen}}
-    )
+    # Online status lives in the presence service; last_seen is persisted in batches
+    presence.heartbeat(str(user.id))
+    user.is_online = True
+    
+    # Upgrade the stored hash if the configured work factor has changed
+    if password_hasher.needs_rehash(user.password):
+        await db.users.update_one(
+            {"_id": user.id},
+            {"$set": {"password": await password_hasher.hash(user_credentials.password)}}
+        )
+        password_hasher.rehashed += 1
+    invalidate_user_principals(str(user.id))
     
     # Create access token
     access_token = create_access_token(
@@ -101,7 +109,19 @@ async def login_user(
 async def get_user_profile(
     current_user: UserResponse = Depends(get_current_user)
 ):
-    return current_user
+    return with_presence(current_user)
+
+
+@router.post("/heartbeat")
+async def heartbeat(
+    beat: PresenceHeartbeat = PresenceHeartbeat(),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Keep the current user online; clients call this more often than PRESENCE_TTL"""
+    if beat.suite_id is not None and beat.suite_id not in ARTIST_SUITES:
+        raise HTTPException(status_code=404, detail="Suite not found")
+    presence.heartbeat(current_user.id, beat.suite_id)
+    return {"is_online": True, "ttl": presence.ttl}
 
 
 @router.put("/profile", response_model=UserResponse)
@@ -117,22 +137,30 @@ async def update_user_profile(
             {"_id": ObjectId(current_user.id)},
             {"$set": update_data}
         )
+        user_summary_cache.invalidate(ObjectId(current_user.id))
+        invalidate_user_principals(current_user.id)
     
     # Return updated user
     updated_user_doc = await db.users.find_one({"_id": ObjectId(current_user.id)})
     updated_user = User(**updated_user_doc)
-    return UserResponse.from_user(updated_user)
+    return with_presence(UserResponse.from_user(updated_user))
 
 
 @router.post("/logout")
 async def logout_user(
-    current_user: UserResponse = Depends(get_current_user),
-    db: AsyncIOMotorClient = Depends(get_database)
+    current_user: UserResponse = Depends(get_current_user)
 ):
     # Update user offline status
-    await db.users.update_one(
-        {"_id": ObjectId(current_user.id)},
-        {"$set": {"is_online": False}}
-    )
+    presence.disconnect(current_user.id)
+    invalidate_user_principals(current_user.id)
     
-    return {"message": "Successfully logged out"}
\ No newline at end of file
+    return {"message": "Successfully logged out"}
+
+
+def with_presence(user: UserResponse) -> UserResponse:
+    """Overlay live online state on a user loaded from the database"""
+    last_seen = presence.last_seen(user.id)
+    return user.copy(update={
+        "is_online": presence.is_online(user.id),
+        "last_seen": max(last_seen, user.last_seen) if last_seen else user.last_seen
+    })
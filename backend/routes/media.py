@@ -0,0 +1,13 @@
+from fastapi import APIRouter, HTTPException, Request
+from services.media import resolve, media_response
+
+router = APIRouter(tags=["media"])
+
+
+@router.api_route("/uploads/{file_path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def serve_upload(file_path: str, request: Request):
+    """Uploaded files and their derivatives, with byte ranges and conditional requests"""
+    media = resolve(file_path)
+    if media is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return media_response(media, request.method, request.headers)
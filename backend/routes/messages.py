@@ -2,17 +2,23 @@ from fastapi import APIRouter, HTTPException, status, Depends, Query
 from motor.motor_asyncio import AsyncIOMotorClient
 from models.message import Message, MessageCreate, MessageResponse
 from models.user import UserResponse
+from database import get_database
 from auth import get_current_user
+from services.scene_hub import scene_hub
+from services.hydration import get_user_summaries
+from services.pagination import cursor_for, decode_cursor, keyset_filter
+from services.serialization import FastJSONResponse
 from bson import ObjectId
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
 router = APIRouter(prefix="/scenes", tags=["messages"])
 
-
-async def get_database():
-    from server import db
-    return db
+# Keyset order for history pages; backed by the (scene_id, timestamp, _id) index
+HISTORY_SORT_ASC = [("timestamp", 1), ("_id", 1)]
+HISTORY_SORT_DESC = [("timestamp", -1), ("_id", -1)]
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
 
 
 async def check_scene_access(scene_id: str, user_id: str, db: AsyncIOMotorClient):
@@ -44,35 +50,56 @@ async def get_scene_messages(
     scene_id: str,
     current_user: UserResponse = Depends(get_current_user),
     db: AsyncIOMotorClient = Depends(get_database),
-    limit: int = Query(50, description="Number of messages to retrieve"),
-    skip: int = Query(0, description="Number of messages to skip")
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, description=f"Number of messages to retrieve, at most {HISTORY_MAX_PAGE_SIZE}"),
+    skip: int = Query(0, ge=0, description="Number of messages to skip (ignored when a cursor is given)"),
+    before: Optional[str] = Query(None, description="Cursor of a message; return messages older than it"),
+    after: Optional[str] = Query(None, description="Cursor of a message; return messages newer than it")
 ):
     # Check scene access
     await check_scene_access(scene_id, current_user.id, db)
+    # Larger requests are served a full page rather than rejected
+    limit = min(limit, HISTORY_MAX_PAGE_SIZE)
+    
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+    
+    # Get messages. Cursors page along (scene_id, timestamp, _id) so each page
+    # is a bounded index range scan; skip is kept for older clients.
+    query = {"scene_id": ObjectId(scene_id)}
+    if after:
+        query.update(keyset_filter(HISTORY_SORT_ASC, decode_cursor(after, len(HISTORY_SORT_ASC))))
+        messages_cursor = db.messages.find(query).sort(HISTORY_SORT_ASC).limit(limit)
+    else:
+        if before:
+            query.update(keyset_filter(HISTORY_SORT_DESC, decode_cursor(before, len(HISTORY_SORT_DESC))))
+        messages_cursor = db.messages.find(query).sort(HISTORY_SORT_DESC)
+        if not before:
+            messages_cursor = messages_cursor.skip(skip)
+        messages_cursor = messages_cursor.limit(limit)
     
-    # Get messages
-    messages_cursor = db.messages.find(
-        {"scene_id": ObjectId(scene_id)}
-    ).sort("timestamp", -1).skip(skip).limit(limit)
+    message_docs = await messages_cursor.to_list(length=limit)
+    
+    # Get sender details, once per distinct sender
+    senders = await get_user_summaries(db, (message_doc["sender"] for message_doc in message_docs))
     
     messages = []
-    async for message_doc in messages_cursor:
-        message = Message(**message_doc)
-        
-        # Get sender details
-        sender_doc = await db.users.find_one({"_id": message.sender})
+    for message_doc in message_docs:
+        sender = senders.get(message_doc["sender"], {})
         sender_details = {
-            "id": str(message.sender),
-            "name": sender_doc["name"] if sender_doc else "Unknown User",
-            "email": sender_doc.get("email", ""),
-            "avatar": sender_doc.get("avatar")
+            "id": str(message_doc["sender"]),
+            "name": sender.get("name", "Unknown User"),
+            "email": sender.get("email", ""),
+            "avatar": sender.get("avatar")
         }
         
-        messages.append(MessageResponse.from_message(message, sender_details))
+        messages.append(
+            MessageResponse.from_doc(message_doc, sender_details, cursor_for(message_doc, HISTORY_SORT_ASC))
+        )
     
-    # Reverse to get chronological order
-    messages.reverse()
-    return messages
+    # Reverse newest-first pages to get chronological order
+    if not after:
+        messages.reverse()
+    return FastJSONResponse(messages)
 
 
 @router.post("/{scene_id}/messages", response_model=MessageResponse)
@@ -85,6 +112,16 @@ async def send_message(
     # Check scene access
     await check_scene_access(scene_id, current_user.id, db)
     
+    return await create_scene_message(db, scene_id, current_user, message_data)
+
+
+async def create_scene_message(
+    db: AsyncIOMotorClient,
+    scene_id: str,
+    current_user: UserResponse,
+    message_data: MessageCreate
+) -> MessageResponse:
+    """Persist a chat message and fan it out to the scene's websocket subscribers"""
     # Create message
     message = Message(
         scene_id=ObjectId(scene_id),
@@ -92,6 +129,8 @@ async def send_message(
         content=message_data.content,
         type=message_data.type
     )
+    # Mongo stores milliseconds; truncate so the returned cursor matches the stored key
+    message.timestamp = message.timestamp.replace(microsecond=message.timestamp.microsecond // 1000 * 1000)
     
     # Insert message
     message_dict = message.dict(by_alias=True)
@@ -106,6 +145,6 @@ async def send_message(
         "avatar": current_user.avatar
     }
     
-    # TODO: Emit real-time message via WebSocket
-    
-    return MessageResponse.from_message(message, sender_details)
\ No newline at end of file
+    response = MessageResponse.from_message(message, sender_details, cursor_for(message_dict, HISTORY_SORT_ASC))
+    scene_hub.publish(scene_id, "new-message", {"message": response})
+    return response
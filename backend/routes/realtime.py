@@ -0,0 +1,120 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, status
+from pydantic import ValidationError
+from bson import ObjectId
+from models.message import MessageCreate
+from models.scene import ScenePatch
+from database import get_database
+from auth import authenticate_token
+from routes.messages import check_scene_access, create_scene_message
+from routes.scenes import apply_scene_patch
+from services.scene_hub import scene_hub
+from services.presence import presence
+
+router = APIRouter(tags=["realtime"])
+
+# Application close codes mirroring the HTTP status of the failed check
+CLOSE_CODES = {
+    400: 4400,
+    401: 4401,
+    403: 4403,
+    404: 4404,
+}
+
+
+def _websocket_token(websocket: WebSocket) -> str:
+    """Browsers cannot set headers on websockets, so accept ?token= as well"""
+    token = websocket.query_params.get("token")
+    if token:
+        return token
+    authorization = websocket.headers.get("authorization", "")
+    scheme, _, credentials = authorization.partition(" ")
+    return credentials if scheme.lower() == "bearer" else ""
+
+
+def _can_edit(scene_doc: dict, user_id: str) -> bool:
+    user_obj_id = ObjectId(user_id)
+    return scene_doc["owner"] == user_obj_id or any(
+        collab["user"] == user_obj_id and "edit" in collab.get("permissions", []) and collab["status"] == "active"
+        for collab in scene_doc.get("collaborators", [])
+    )
+
+
+@router.websocket("/ws/scenes/{scene_id}")
+async def scene_socket(websocket: WebSocket, scene_id: str):
+    db = await get_database()
+    try:
+        current_user = await authenticate_token(_websocket_token(websocket))
+        scene_doc = await check_scene_access(scene_id, current_user.id, db)
+    except HTTPException as e:
+        # Accept first: a close before the handshake completes reaches the
+        # client as a bare HTTP 403, without the application close code
+        await websocket.accept()
+        await websocket.close(code=CLOSE_CODES.get(e.status_code, status.WS_1008_POLICY_VIOLATION))
+        return
+
+    await websocket.accept()
+    connection = await scene_hub.join(scene_id, websocket, current_user, _can_edit(scene_doc, current_user.id))
+    presence.heartbeat(current_user.id)
+    scene_hub.send_to(connection, "collaboration-update", {
+        "type": "presence",
+        "data": {"sceneId": scene_id, "users": scene_hub.members(scene_id)}
+    })
+
+    try:
+        while not connection.closed:
+            try:
+                frame = await websocket.receive_json()
+            except ValueError:
+                frame = None
+            data = (frame.get("data") or {}) if isinstance(frame, dict) else None
+            if not isinstance(data, dict):
+                scene_hub.send_to(connection, "error", {"detail": "Malformed frame"})
+                continue
+            event = frame.get("event")
+
+            # Any frame keeps the sender online; idle clients send "heartbeat"
+            presence.heartbeat(current_user.id)
+            if event == "heartbeat":
+                continue
+            elif event == "leave-scene":
+                break
+            elif event == "join-scene":
+                scene_hub.send_to(connection, "collaboration-update", {
+                    "type": "presence",
+                    "data": {"sceneId": scene_id, "users": scene_hub.members(scene_id)}
+                })
+            elif event == "chat-message":
+                try:
+                    message_data = MessageCreate(**(data.get("message") or {}))
+                except (ValidationError, TypeError):
+                    scene_hub.send_to(connection, "error", {"detail": "Invalid message"})
+                    continue
+                await create_scene_message(db, scene_id, current_user, message_data)
+            elif event == "object-update":
+                if not connection.can_edit:
+                    scene_hub.send_to(connection, "error", {"detail": "Edit access denied"})
+                    continue
+                # Same payload and checks as PATCH /scenes/{id}/objects
+                try:
+                    patch = ScenePatch(**data)
+                except (ValidationError, TypeError):
+                    scene_hub.send_to(connection, "error", {"detail": "Invalid patch"})
+                    continue
+                try:
+                    result = await apply_scene_patch(db, scene_id, patch, current_user, exclude=connection)
+                except HTTPException as e:
+                    scene_hub.send_to(connection, "error", {"status": e.status_code, "detail": e.detail})
+                    continue
+                scene_hub.send_to(connection, "scene-patched", result)
+            elif event == "user-status":
+                scene_hub.publish(scene_id, "collaboration-update", {
+                    "type": "user-status",
+                    "data": {"userId": current_user.id, "status": data.get("status")}
+                }, exclude=connection)
+            else:
+                scene_hub.send_to(connection, "error", {"detail": f"Unknown event: {event}"})
+    except (WebSocketDisconnect, RuntimeError):
+        # RuntimeError: the hub already closed this socket as a slow consumer
+        pass
+    finally:
+        await scene_hub.leave(connection)
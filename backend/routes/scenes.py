@@ -1,8 +1,19 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Query
 from motor.motor_asyncio import AsyncIOMotorClient
-from models.scene import Scene, SceneCreate, SceneUpdate, SceneResponse, SceneInvite, Collaborator
+from models.scene import (
+    Scene, SceneCreate, SceneUpdate, SceneResponse, SceneInvite, Collaborator,
+    ScenePatch, ScenePatchResponse, SceneOpEntry, SceneSyncResponse
+)
 from models.user import UserResponse
+from database import get_database
 from auth import get_current_user
+from services.hydration import hydrate_scenes
+from services.serialization import FastJSONResponse
+from services.scene_hub import scene_hub
+from services.scene_ops import PatchError, PatchPlan, plan_patch
+from services.scene_log import (
+    VersionConflict, append, entries_since, load_objects, materialize_scenes, pending_entries, scene_compactor
+)
 from bson import ObjectId
 from typing import List, Optional
 from datetime import datetime
@@ -10,11 +21,6 @@ from datetime import datetime
 router = APIRouter(prefix="/scenes", tags=["scenes"])
 
 
-async def get_database():
-    from server import db
-    return db
-
-
 @router.post("/", response_model=SceneResponse)
 async def create_scene(
     scene_data: SceneCreate,
@@ -46,34 +52,7 @@ async def get_user_scenes(
 ):
     # Get scenes owned by user
     query = {"owner": ObjectId(current_user.id)}
-    scenes_cursor = db.scenes.find(query)
-    scenes = []
-    
-    async for scene_doc in scenes_cursor:
-        scene = Scene(**scene_doc)
-        # Get owner details
-        owner_doc = await db.users.find_one({"_id": scene.owner})
-        owner_name = owner_doc["name"] if owner_doc else "Unknown"
-        
-        # Get collaborator details
-        collaborator_details = []
-        for collab in scene.collaborators:
-            user_doc = await db.users.find_one({"_id": collab.user})
-            if user_doc:
-                collaborator_details.append({
-                    "user": {
-                        "id": str(collab.user),
-                        "name": user_doc["name"],
-                        "email": user_doc["email"],
-                        "avatar": user_doc.get("avatar"),
-                        "is_online": user_doc.get("is_online", False)
-                    },
-                    "permissions": collab.permissions,
-                    "status": collab.status,
-                    "invited_at": collab.invited_at
-                })
-        
-        scenes.append(SceneResponse.from_scene(scene, owner_name, collaborator_details))
+    scenes = [Scene.from_doc(scene_doc) async for scene_doc in db.scenes.find(query)]
     
     # Also get scenes where user is a collaborator
     if include_shared:
@@ -81,32 +60,11 @@ async def get_user_scenes(
             "collaborators.user": ObjectId(current_user.id),
             "collaborators.status": "active"
         })
-        
-        async for scene_doc in shared_scenes_cursor:
-            scene = Scene(**scene_doc)
-            owner_doc = await db.users.find_one({"_id": scene.owner})
-            owner_name = owner_doc["name"] if owner_doc else "Unknown"
-            
-            collaborator_details = []
-            for collab in scene.collaborators:
-                user_doc = await db.users.find_one({"_id": collab.user})
-                if user_doc:
-                    collaborator_details.append({
-                        "user": {
-                            "id": str(collab.user),
-                            "name": user_doc["name"],
-                            "email": user_doc["email"],
-                            "avatar": user_doc.get("avatar"),
-                            "is_online": user_doc.get("is_online", False)
-                        },
-                        "permissions": collab.permissions,
-                        "status": collab.status,
-                        "invited_at": collab.invited_at
-                    })
-            
-            scenes.append(SceneResponse.from_scene(scene, owner_name, collaborator_details))
-    
-    return scenes
+        scenes.extend([Scene.from_doc(scene_doc) async for scene_doc in shared_scenes_cursor])
+    
+    # Apply unsnapshotted ops, then resolve owners and collaborators, one query each
+    await materialize_scenes(db, scenes)
+    return FastJSONResponse(await hydrate_scenes(db, scenes))
 
 
 @router.get("/{scene_id}", response_model=SceneResponse)
@@ -122,7 +80,7 @@ async def get_scene(
     if not scene_doc:
         raise HTTPException(status_code=404, detail="Scene not found")
     
-    scene = Scene(**scene_doc)
+    scene = Scene.from_doc(scene_doc)
     
     # Check if user has access
     user_id = ObjectId(current_user.id)
@@ -135,29 +93,9 @@ async def get_scene(
     if not has_access:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    # Get owner details
-    owner_doc = await db.users.find_one({"_id": scene.owner})
-    owner_name = owner_doc["name"] if owner_doc else "Unknown"
-    
-    # Get collaborator details
-    collaborator_details = []
-    for collab in scene.collaborators:
-        user_doc = await db.users.find_one({"_id": collab.user})
-        if user_doc:
-            collaborator_details.append({
-                "user": {
-                    "id": str(collab.user),
-                    "name": user_doc["name"],
-                    "email": user_doc["email"],
-                    "avatar": user_doc.get("avatar"),
-                    "is_online": user_doc.get("is_online", False)
-                },
-                "permissions": collab.permissions,
-                "status": collab.status,
-                "invited_at": collab.invited_at
-            })
-    
-    return SceneResponse.from_scene(scene, owner_name, collaborator_details)
+    await materialize_scenes(db, [scene])
+    responses = await hydrate_scenes(db, [scene])
+    return FastJSONResponse(responses[0])
 
 
 @router.put("/{scene_id}", response_model=SceneResponse)
@@ -191,6 +129,15 @@ async def update_scene(
     update_data = {k: v for k, v in scene_update.dict().items() if v is not None}
     update_data["updated_at"] = datetime.utcnow()
     
+    # A full objects array goes through the op log like any other edit
+    objects = update_data.pop("objects", None)
+    if objects is not None:
+        try:
+            await append(db, scene.id, scene.version, PatchPlan(replace=objects), user_id)
+        except VersionConflict as e:
+            raise _version_conflict(e.version)
+        scene_compactor.mark(scene.id, scene_compactor.threshold)
+    
     await db.scenes.update_one(
         {"_id": ObjectId(scene_id)},
         {"$set": update_data}
@@ -200,11 +147,138 @@ async def update_scene(
     updated_scene_doc = await db.scenes.find_one({"_id": ObjectId(scene_id)})
     updated_scene = Scene(**updated_scene_doc)
     
-    # Get owner details
-    owner_doc = await db.users.find_one({"_id": updated_scene.owner})
-    owner_name = owner_doc["name"] if owner_doc else "Unknown"
-    
-    return SceneResponse.from_scene(updated_scene, owner_name, [])
+    await materialize_scenes(db, [updated_scene])
+    responses = await hydrate_scenes(db, [updated_scene])
+    return responses[0]
+
+
+@router.patch("/{scene_id}/objects", response_model=ScenePatchResponse)
+async def patch_scene_objects(
+    scene_id: str,
+    patch: ScenePatch,
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncIOMotorClient = Depends(get_database)
+):
+    """Apply per-object add/update/remove ops against the version the client last saw"""
+    return await apply_scene_patch(db, scene_id, patch, current_user)
+
+
+async def apply_scene_patch(db, scene_id: str, patch: ScenePatch, current_user: UserResponse,
+                            exclude=None) -> ScenePatchResponse:
+    """Validate, version and log a patch, then publish it to the scene's sockets.
+
+    Shared by the REST endpoint and the websocket's object-update event, so
+    every edit lands in the op log; `exclude` skips the sending socket.
+    """
+    if not ObjectId.is_valid(scene_id):
+        raise HTTPException(status_code=400, detail="Invalid scene ID")
+
+    try:
+        plan = plan_patch(patch.ops)
+    except PatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # The objects array is never read in full here
+    scene_doc = await db.scenes.find_one(
+        {"_id": ObjectId(scene_id)},
+        {"owner": 1, "collaborators": 1, "version": 1, "snapshot_version": 1}
+    )
+    if not scene_doc:
+        raise HTTPException(status_code=404, detail="Scene not found")
+
+    user_id = ObjectId(current_user.id)
+    if not can_edit(scene_doc, user_id):
+        raise HTTPException(status_code=403, detail="Edit access denied")
+
+    head = scene_doc.get("version", 0)
+    if patch.version != head:
+        raise _version_conflict(head)
+
+    # Validate against the current state of just the objects this patch names
+    objects = await load_objects(db, scene_doc, plan.referenced_ids)
+    try:
+        plan.check(objects)
+    except PatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    plan.apply(objects)
+
+    try:
+        version = await append(db, scene_doc["_id"], head, plan, user_id)
+    except VersionConflict as e:
+        raise _version_conflict(e.version)
+    scene_compactor.mark(scene_doc["_id"], version - scene_doc.get("snapshot_version", 0))
+
+    response = ScenePatchResponse(
+        version=version,
+        objects=[objects[object_id] for object_id in plan.touched_ids],
+        removed=plan.removed
+    )
+    scene_hub.publish(scene_id, "scene-updated", {
+        "sceneId": scene_id,
+        "version": version,
+        "objects": response.objects,
+        "removed": response.removed,
+        "userId": current_user.id
+    }, exclude=exclude)
+    return response
+
+
+@router.get("/{scene_id}/sync", response_model=SceneSyncResponse)
+async def sync_scene(
+    scene_id: str,
+    since: Optional[int] = Query(None, ge=0, description="Version the client already has"),
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncIOMotorClient = Depends(get_database)
+):
+    """Ops since the client's version, or the latest snapshot plus the ops after it"""
+    if not ObjectId.is_valid(scene_id):
+        raise HTTPException(status_code=400, detail="Invalid scene ID")
+
+    scene_doc = await db.scenes.find_one(
+        {"_id": ObjectId(scene_id)},
+        {"owner": 1, "collaborators": 1, "is_public": 1, "version": 1, "snapshot_version": 1}
+    )
+    if not scene_doc:
+        raise HTTPException(status_code=404, detail="Scene not found")
+
+    user_id = ObjectId(current_user.id)
+    has_access = (
+        scene_doc["owner"] == user_id or
+        scene_doc.get("is_public", False) or
+        any(collab["user"] == user_id and collab.get("status") == "active"
+            for collab in scene_doc.get("collaborators", []))
+    )
+    if not has_access:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    head = scene_doc.get("version", 0)
+    if since is not None:
+        entries = await entries_since(db, scene_doc["_id"], since, head)
+        if entries is not None:
+            return SceneSyncResponse(version=head, ops=[SceneOpEntry.from_entry(entry) for entry in entries])
+
+    # Too far behind (or a fresh load): start from the snapshot
+    snapshot_doc = await db.scenes.find_one({"_id": scene_doc["_id"]}, {"objects": 1, "snapshot_version": 1})
+    snapshot_version = snapshot_doc.get("snapshot_version", 0)
+    entries = (await pending_entries(db, [(scene_doc["_id"], snapshot_version)])).get(scene_doc["_id"], [])
+    return SceneSyncResponse(
+        version=max([head] + [entry["version"] for entry in entries]),
+        snapshot_version=snapshot_version,
+        objects=snapshot_doc.get("objects", []),
+        ops=[SceneOpEntry.from_entry(entry) for entry in entries]
+    )
+
+
+def can_edit(scene_doc: dict, user_id: ObjectId) -> bool:
+    return (
+        scene_doc["owner"] == user_id or
+        any(collab["user"] == user_id and "edit" in collab.get("permissions", []) and collab.get("status") == "active"
+            for collab in scene_doc.get("collaborators", []))
+    )
+
+
+def _version_conflict(version: int) -> HTTPException:
+    return HTTPException(status_code=409, detail={"message": "Scene has changed", "version": version})
 
 
 @router.delete("/{scene_id}")
@@ -232,6 +306,7 @@ async def delete_scene(
     # Also delete related messages and media
     await db.messages.delete_many({"scene_id": ObjectId(scene_id)})
     await db.media.delete_many({"scene_id": ObjectId(scene_id)})
+    await db.scene_ops.delete_many({"scene_id": ObjectId(scene_id)})
     
     return {"message": "Scene deleted successfully"}
 
@@ -1,8 +1,9 @@
-from fastapi import FastAPI, APIRouter, HTTPException
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, APIRouter, HTTPException, Depends
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import PlainTextResponse
 from motor.motor_asyncio import AsyncIOMotorClient
+from contextlib import asynccontextmanager
 import os
 import logging
 from pathlib import Path
@@ -15,30 +16,59 @@ from datetime import datetime
 from routes.auth import router as auth_router
 from routes.scenes import router as scenes_router
 from routes.messages import router as messages_router
-from routes.artwork import router as artwork_router
+from routes.artwork import router as artwork_router, gallery_cache
+from routes.realtime import router as realtime_router
+from routes.media import router as media_router
+from services.scene_hub import scene_hub
+from services.hydration import user_summary_cache
+from auth import principal_cache
+from services.passwords import password_hasher
+from services.derivatives import derivative_pipeline
+from services.media_metadata import metadata_extractor
+from services import suite_counts
+from services.index_manager import sync_indexes
+from services.counters import view_counter, like_counter
+from services.uploads import UploadSizeLimitMiddleware
+from services.scene_log import scene_compactor
+from services.presence import presence
+from services import metrics
+import database
+from database import get_database
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ.get('DB_NAME', 'virtual_meeting_db')]
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled MongoDB client shared by every router
+    db = database.connect()
+    await sync_indexes(db)
+    await suite_counts.bootstrap(db)
+    view_counter.start(db)
+    like_counter.start(db)
+    scene_compactor.start(db)
+    presence.start(db)
+    metadata_extractor.start(db)
+    yield
+    await view_counter.stop()
+    await like_counter.stop()
+    await scene_compactor.stop()
+    await presence.stop()
+    await scene_hub.close_all()
+    await derivative_pipeline.shutdown()
+    await metadata_extractor.stop()
+    database.close()
+
 
 # Create the main app without a prefix
 app = FastAPI(
     title="Virtual Meeting Place API",
     description="API for collaborative virtual meeting spaces",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# Create uploads directory if it doesn't exist
-uploads_dir = ROOT_DIR / "uploads"
-uploads_dir.mkdir(exist_ok=True)
-
-# Serve uploaded files
-app.mount("/uploads", StaticFiles(directory=str(uploads_dir)), name="uploads")
-
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
@@ -57,20 +87,20 @@ async def root():
     return {"message": "Virtual Meeting Place API is running!"}
 
 @api_router.post("/status", response_model=StatusCheck)
-async def create_status_check(input: StatusCheckCreate):
+async def create_status_check(input: StatusCheckCreate, db: AsyncIOMotorClient = Depends(get_database)):
     status_dict = input.dict()
     status_obj = StatusCheck(**status_dict)
     _ = await db.status_checks.insert_one(status_obj.dict())
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
+async def get_status_checks(db: AsyncIOMotorClient = Depends(get_database)):
     status_checks = await db.status_checks.find().to_list(1000)
     return [StatusCheck(**status_check) for status_check in status_checks]
 
 # Health check endpoint
 @api_router.get("/health")
-async def health_check():
+async def health_check(db: AsyncIOMotorClient = Depends(get_database)):
     try:
         # Test database connection with a simple operation
         await db.users.find_one({})
@@ -78,12 +108,67 @@ async def health_check():
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Database connection failed: {str(e)}")
 
+# Connection pool statistics for sizing MONGO_MAX_POOL_SIZE / MONGO_MIN_POOL_SIZE
+@api_router.get("/health/pool")
+async def pool_stats():
+    return database.get_pool_stats()
+
+# Password hashing pool utilisation and queue depth
+@api_router.get("/health/password-hashing")
+async def password_hashing_stats():
+    return password_hasher.stats()
+
+# Background thumbnail/variant generation backlog
+@api_router.get("/health/derivatives")
+async def derivative_stats():
+    return derivative_pipeline.stats()
+
+# Media metadata extraction for new uploads and the backlog of older artworks
+@api_router.get("/health/media-metadata")
+async def media_metadata_stats():
+    return metadata_extractor.stats()
+
+# Buffered artwork view/like increments awaiting a bulk write
+@api_router.get("/health/counters")
+async def counter_stats():
+    return {"views": view_counter.stats(), "likes": like_counter.stats()}
+
+# Scene op log compaction progress
+@api_router.get("/health/scene-compaction")
+async def scene_compaction_stats():
+    return scene_compactor.stats()
+
+# Online users and batched last_seen writes
+@api_router.get("/health/presence")
+async def presence_stats():
+    return presence.stats()
+
+# Hit rates for the in-process caches, for tuning their sizes and TTLs
+@api_router.get("/health/caches")
+async def cache_stats():
+    return {
+        "user_summaries": user_summary_cache.stats(),
+        "principals": principal_cache.stats(),
+        "gallery_first_pages": gallery_cache.stats()
+    }
+
+# Prometheus scrape target: per-route latency, response sizes and MongoDB command timings
+@api_router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 # Include all routers
 app.include_router(api_router)
 app.include_router(auth_router, prefix="/api")
 app.include_router(scenes_router, prefix="/api")
 app.include_router(messages_router, prefix="/api")
 app.include_router(artwork_router, prefix="/api")
+app.include_router(realtime_router, prefix="/api")
+# Uploaded media from UPLOAD_DIR, where the upload routes store it
+app.include_router(media_router)
+
+# Inside CORS so browsers can read the 413
+app.add_middleware(UploadSizeLimitMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -93,13 +178,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so latency covers CORS handling and every other middleware
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
@@ -0,0 +1,129 @@
+from typing import Dict, Optional, Set
+from pymongo import UpdateOne
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Flush buffered views at least this often (seconds)...
+VIEW_FLUSH_INTERVAL = float(os.environ.get("VIEW_FLUSH_INTERVAL", 5))
+# ...or as soon as this many views are waiting. This is also the most views
+# a crash can lose, since anything beyond it forces a flush first.
+VIEW_FLUSH_MAX_PENDING = int(os.environ.get("VIEW_FLUSH_MAX_PENDING", 1000))
+
+# Same knobs for the likes counter materialised from the artwork_likes collection
+LIKE_FLUSH_INTERVAL = float(os.environ.get("LIKE_FLUSH_INTERVAL", 2))
+LIKE_FLUSH_MAX_PENDING = int(os.environ.get("LIKE_FLUSH_MAX_PENDING", 200))
+
+
+class CounterBuffer:
+    """Coalesces increments of one artwork counter field into periodic
+    unordered bulk writes.
+
+    A popular piece viewed a thousand times between flushes costs one
+    $inc of 1000 instead of a thousand single-document updates.
+    """
+
+    def __init__(self, field: str, flush_interval: float, max_pending: int):
+        self.field = field
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[str, int] = {}
+        self._pending_total = 0
+        self._db = None
+        self._loop_task: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._writes: Set[asyncio.Task] = set()
+        self.recorded = 0
+        self.flushes = 0
+        self.documents_written = 0
+        self.failed_flushes = 0
+
+    def start(self, db):
+        self._db = db
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the periodic flusher and write out everything still buffered"""
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            await asyncio.gather(self._loop_task, return_exceptions=True)
+            self._loop_task = None
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        # Writes already taken out of the buffer finish (or restore their counts) first
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+        await self.flush()
+
+    def record(self, artwork_id: str, count: int = 1):
+        if not count:
+            return
+        self._pending[artwork_id] = self._pending.get(artwork_id, 0) + count
+        self._pending_total += abs(count)
+        self.recorded += abs(count)
+        if self._pending_total >= self.max_pending and self._db is not None:
+            if self._flush_task is None or self._flush_task.done():
+                self._flush_task = asyncio.create_task(self.flush())
+
+    def pending(self, artwork_id: str) -> int:
+        return self._pending.get(artwork_id, 0)
+
+    async def flush(self) -> int:
+        if not self._pending or self._db is None:
+            return 0
+
+        batch, self._pending, self._pending_total = self._pending, {}, 0
+        operations = [
+            UpdateOne({"id": artwork_id}, {"$inc": {self.field: count}})
+            for artwork_id, count in batch.items()
+            if count
+        ]
+        if not operations:
+            return 0
+        # Shielded: once a batch has left the buffer, cancelling the flusher
+        # must neither drop it nor abandon a write that may already be applied
+        write = asyncio.create_task(self._write(batch, operations))
+        self._writes.add(write)
+        write.add_done_callback(self._writes.discard)
+        return await asyncio.shield(write)
+
+    async def _write(self, batch: Dict[str, int], operations: list) -> int:
+        try:
+            await self._db.artworks.bulk_write(operations, ordered=False)
+        except Exception:
+            self.failed_flushes += 1
+            logger.exception("Failed to flush %d buffered artwork %s counts", len(batch), self.field)
+            # Put the counts back so the next flush retries them
+            for artwork_id, count in batch.items():
+                self._pending[artwork_id] = self._pending.get(artwork_id, 0) + count
+                self._pending_total += abs(count)
+            return 0
+
+        self.flushes += 1
+        self.documents_written += len(operations)
+        return len(operations)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "field": self.field,
+            "pending": self._pending_total,
+            "pending_artworks": len(self._pending),
+            "recorded": self.recorded,
+            "flushes": self.flushes,
+            "documents_written": self.documents_written,
+            "failed_flushes": self.failed_flushes,
+            "flush_interval": self.flush_interval,
+            "max_pending": self.max_pending,
+        }
+
+
+view_counter = CounterBuffer("views", VIEW_FLUSH_INTERVAL, VIEW_FLUSH_MAX_PENDING)
+like_counter = CounterBuffer("likes", LIKE_FLUSH_INTERVAL, LIKE_FLUSH_MAX_PENDING)
@@ -0,0 +1,150 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Set
+import asyncio
+import glob
+import logging
+import multiprocessing
+import os
+import uuid
+
+from services import uploads
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels for each derived variant
+VARIANT_SIZES = {
+    "thumb": 256,
+    "medium": 1024,
+    "texture": 2048,
+}
+VARIANT_FORMAT = "webp"
+VARIANT_QUALITY = int(os.environ.get("DERIVATIVE_QUALITY", 80))
+DERIVATIVE_WORKERS = int(os.environ.get("DERIVATIVE_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+
+IMAGE_MIME_TYPES = {"image/jpeg", "image/png", "image/webp"}
+VISUAL_ARTWORK_TYPES = {"painting", "photo", "sculpture"}
+
+
+def derivatives_dir() -> str:
+    return os.path.join(uploads.UPLOAD_DIR, "derivatives")
+
+
+def render_variants(source_path: str, output_dir: str, stem: str, quality: int) -> Dict[str, dict]:
+    """Resize an image into every variant size. Runs inside a worker process."""
+    from PIL import Image, ImageOps
+
+    os.makedirs(output_dir, exist_ok=True)
+    variants = {}
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+        # Largest first, so each smaller variant resamples the previous one
+        for name, size in sorted(VARIANT_SIZES.items(), key=lambda item: -item[1]):
+            filename = f"{stem}_{name}.{VARIANT_FORMAT}"
+            path = os.path.join(output_dir, filename)
+            image.thumbnail((size, size), Image.LANCZOS)
+            if not os.path.exists(path):
+                # Variants are served as immutable, so readers must never see
+                # a half-written one; the same blob may also be rendered twice
+                temp_path = f"{path}.{uuid.uuid4().hex}.part"
+                try:
+                    image.save(temp_path, VARIANT_FORMAT.upper(), quality=quality, method=4)
+                    os.replace(temp_path, path)
+                except BaseException:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+                    raise
+            variants[name] = {
+                "filename": filename,
+                "width": image.width,
+                "height": image.height,
+                "size": os.path.getsize(path),
+            }
+    return variants
+
+
+def _worker_context():
+    # Forking a process that already runs Motor's and the executors' threads
+    # can copy a held lock into the child; start workers from a clean process
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+class DerivativePipeline:
+    """Generates image variants for new uploads off the request path.
+
+    Work runs on a process pool so resizing never competes with the event
+    loop; the artwork document is patched when the variants are ready.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.completed = 0
+        self.failed = 0
+
+    @staticmethod
+    def wants(artwork) -> bool:
+        return artwork.type in VISUAL_ARTWORK_TYPES and artwork.mime_type in IMAGE_MIME_TYPES
+
+    def schedule(self, db, artwork, source_path: str, sha256: str):
+        if not self.wants(artwork):
+            return
+        task = asyncio.create_task(self._generate(db, artwork.id, source_path, sha256))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _generate(self, db, artwork_id: str, source_path: str, sha256: str):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_worker_context())
+
+        output_dir = os.path.join(derivatives_dir(), sha256[:2])
+        try:
+            variants = await asyncio.get_running_loop().run_in_executor(
+                self._executor, render_variants, source_path, output_dir, sha256, VARIANT_QUALITY
+            )
+        except Exception:
+            self.failed += 1
+            logger.exception("Derivative generation failed for artwork %s", artwork_id)
+            return
+
+        url_prefix = f"/uploads/derivatives/{sha256[:2]}"
+        for variant in variants.values():
+            variant["url"] = f"{url_prefix}/{variant.pop('filename')}"
+
+        await db.artworks.update_one(
+            {"id": artwork_id},
+            {"$set": {"thumbnail_url": variants["thumb"]["url"], "metadata.variants": variants}}
+        )
+        self.completed += 1
+
+    @staticmethod
+    def remove(sha256: str):
+        """Delete the variants derived from a blob once the blob itself is gone"""
+        pattern = os.path.join(derivatives_dir(), sha256[:2], f"{sha256}_*.{VARIANT_FORMAT}")
+        for path in glob.glob(pattern):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": len(self._tasks),
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+    async def shutdown(self):
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+derivative_pipeline = DerivativePipeline(DERIVATIVE_WORKERS)
@@ -0,0 +1,95 @@
+from typing import Dict, Iterable, List
+from bson import ObjectId
+from models.scene import Scene, SceneResponse
+from services.cache import TTLCache
+from services.presence import presence
+import os
+
+# Fields needed to render owners and collaborators on scene responses
+SCENE_USER_PROJECTION = {"name": 1, "email": 1, "avatar": 1}
+
+# Profile fields that rarely change; safe to serve from a process-wide cache
+USER_SUMMARY_PROJECTION = {"name": 1, "email": 1, "avatar": 1}
+
+user_summary_cache = TTLCache(
+    maxsize=int(os.environ.get("USER_SUMMARY_CACHE_SIZE", 5000)),
+    ttl=float(os.environ.get("USER_SUMMARY_CACHE_TTL", 300)),
+    name="user_summaries"
+)
+
+
+async def fetch_users_by_id(db, user_ids: Iterable[ObjectId]) -> Dict[ObjectId, dict]:
+    """Resolve a set of user ids with a single $in query"""
+    unique_ids = list({user_id for user_id in user_ids if user_id is not None})
+    if not unique_ids:
+        return {}
+
+    cursor = db.users.find({"_id": {"$in": unique_ids}}, SCENE_USER_PROJECTION)
+    return {user_doc["_id"]: user_doc async for user_doc in cursor}
+
+
+async def get_user_summaries(db, user_ids: Iterable[ObjectId]) -> Dict[ObjectId, dict]:
+    """Name, email and avatar per user, served from cache with one $in query for misses"""
+    summaries = {}
+    missing = []
+    for user_id in set(user_ids):
+        summary = user_summary_cache.get(user_id)
+        if summary is None:
+            missing.append(user_id)
+        else:
+            summaries[user_id] = summary
+
+    if missing:
+        cursor = db.users.find({"_id": {"$in": missing}}, USER_SUMMARY_PROJECTION)
+        async for user_doc in cursor:
+            summary = {
+                "name": user_doc["name"],
+                "email": user_doc.get("email", ""),
+                "avatar": user_doc.get("avatar")
+            }
+            user_summary_cache.set(user_doc["_id"], summary)
+            summaries[user_doc["_id"]] = summary
+    return summaries
+
+
+def collect_scene_user_ids(scenes: Iterable[Scene]) -> List[ObjectId]:
+    """Gather every owner and collaborator id referenced by the scenes"""
+    user_ids = []
+    for scene in scenes:
+        user_ids.append(scene.owner)
+        user_ids.extend(collab.user for collab in scene.collaborators)
+    return user_ids
+
+
+def build_collaborator_details(scene: Scene, users: Dict[ObjectId, dict]) -> List[dict]:
+    collaborator_details = []
+    for collab in scene.collaborators:
+        user_doc = users.get(collab.user)
+        if user_doc:
+            collaborator_details.append({
+                "user": {
+                    "id": str(collab.user),
+                    "name": user_doc["name"],
+                    "email": user_doc["email"],
+                    "avatar": user_doc.get("avatar"),
+                    "is_online": presence.is_online(str(collab.user))
+                },
+                "permissions": collab.permissions,
+                "status": collab.status,
+                "invited_at": collab.invited_at
+            })
+    return collaborator_details
+
+
+async def hydrate_scenes(db, scenes: List[Scene]) -> List[SceneResponse]:
+    """Build scene responses, resolving all referenced users in one query"""
+    users = await fetch_users_by_id(db, collect_scene_user_ids(scenes))
+
+    responses = []
+    for scene in scenes:
+        owner_doc = users.get(scene.owner)
+        owner_name = owner_doc["name"] if owner_doc else "Unknown"
+        responses.append(
+            SceneResponse.from_scene(scene, owner_name, build_collaborator_details(scene, users))
+        )
+    return responses
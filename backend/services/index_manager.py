@@ -0,0 +1,109 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List
+from pymongo.errors import OperationFailure
+from models.indexes import INDEXES, IndexSpec
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class IndexDiff:
+    missing: List[IndexSpec] = field(default_factory=list)
+    # Same name in the database but different keys or options
+    changed: List[IndexSpec] = field(default_factory=list)
+    # In the database but not declared anywhere (collection, name)
+    extra: List[tuple] = field(default_factory=list)
+
+    @property
+    def in_sync(self) -> bool:
+        return not (self.missing or self.changed or self.extra)
+
+
+def _by_collection(specs: List[IndexSpec]) -> Dict[str, List[IndexSpec]]:
+    grouped = defaultdict(list)
+    for spec in specs:
+        grouped[spec.collection].append(spec)
+    return grouped
+
+
+def _matches(spec: IndexSpec, live: dict) -> bool:
+    return (
+        list(spec.keys) == [(key, int(direction)) for key, direction in live["key"].items()]
+        and spec.unique == bool(live.get("unique", False))
+        and spec.sparse == bool(live.get("sparse", False))
+    )
+
+
+async def diff_indexes(db, specs: List[IndexSpec] = INDEXES) -> IndexDiff:
+    diff = IndexDiff()
+    for collection, declared in _by_collection(specs).items():
+        live = {index["name"]: index async for index in db[collection].list_indexes()}
+        for spec in declared:
+            if spec.name not in live:
+                diff.missing.append(spec)
+            elif not _matches(spec, live[spec.name]):
+                diff.changed.append(spec)
+        declared_names = {spec.name for spec in declared} | {"_id_"}
+        diff.extra.extend((collection, name) for name in live if name not in declared_names)
+    return diff
+
+
+async def sync_indexes(db, specs: List[IndexSpec] = INDEXES) -> IndexDiff:
+    """Create every declared index that is missing. Safe to run on each startup.
+
+    Indexes that changed definition or are no longer declared are reported,
+    never dropped; that is left to an operator via the CLI.
+    """
+    diff = await diff_indexes(db, specs)
+    for collection, specs_to_create in _by_collection(diff.missing).items():
+        for spec in specs_to_create:
+            try:
+                await db[collection].create_indexes([spec.to_model()])
+                logger.info("Created index %s.%s", collection, spec.name)
+            except OperationFailure as e:
+                # e.g. a unique index over existing duplicates; keep the app up
+                logger.error("Could not create index %s.%s: %s", collection, spec.name, e)
+    for spec in diff.changed:
+        logger.warning("Index %s.%s differs from its declaration", spec.collection, spec.name)
+    return diff
+
+
+if __name__ == "__main__":
+    # python -m services.index_manager [--apply] [--drop-changed]   (run from backend/)
+    import argparse
+    import asyncio
+    from pathlib import Path
+    from dotenv import load_dotenv
+    import database
+
+    parser = argparse.ArgumentParser(description="Diff declared MongoDB indexes against the live database")
+    parser.add_argument("--apply", action="store_true", help="create missing indexes")
+    parser.add_argument("--drop-changed", action="store_true",
+                        help="with --apply, drop and recreate indexes whose definition changed")
+    args = parser.parse_args()
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+
+    async def main():
+        db = database.connect()
+        try:
+            diff = await diff_indexes(db)
+            for spec in diff.missing:
+                print(f"+ {spec.collection}.{spec.name} {list(spec.keys)}  # {spec.reason}")
+            for spec in diff.changed:
+                print(f"~ {spec.collection}.{spec.name} {list(spec.keys)}")
+            for collection, name in diff.extra:
+                print(f"? {collection}.{name} (not declared)")
+            if diff.in_sync:
+                print("Indexes match the registry")
+            if args.apply:
+                if args.drop_changed:
+                    for spec in diff.changed:
+                        await db[spec.collection].drop_index(spec.name)
+                        diff.missing.append(spec)
+                await sync_indexes(db, diff.missing)
+        finally:
+            database.close()
+
+    asyncio.run(main())
@@ -0,0 +1,203 @@
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional, Tuple
+from starlette.datastructures import Headers
+from starlette.responses import Response
+import anyio
+import mimetypes
+import os
+import re
+import stat
+
+from services import uploads
+
+# Bytes read per chunk when streaming a file or a range of it
+MEDIA_CHUNK_SIZE = int(os.environ.get("MEDIA_CHUNK_SIZE", 256 * 1024))
+
+# Blobs and derivatives are named after the SHA-256 of their content, so a
+# URL never changes meaning and browsers may keep it forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+_CONTENT_HASHED = re.compile(r"^(?P<sha256>[0-9a-f]{64})(?:_[a-z0-9]+)?(?:\.[A-Za-z0-9]+)?$")
+
+mimetypes.add_type("audio/ogg", ".ogg")
+mimetypes.add_type("audio/wav", ".wav")
+mimetypes.add_type("model/gltf+json", ".gltf")
+mimetypes.add_type("model/obj", ".obj")
+
+
+@dataclass
+class MediaFile:
+    path: str
+    size: int
+    mtime: float
+    etag: str
+    content_type: str
+    immutable: bool
+
+    @property
+    def last_modified(self) -> str:
+        return formatdate(self.mtime, usegmt=True)
+
+
+def resolve(relative_path: str) -> Optional[MediaFile]:
+    """Stat a file under UPLOAD_DIR; None for anything missing, not a regular file or outside the directory"""
+    root = os.path.realpath(uploads.UPLOAD_DIR)
+    path = os.path.realpath(os.path.join(root, relative_path))
+    # Uploads still being written live next to their final name as *.part
+    if not path.startswith(root + os.sep) or path.endswith(".part"):
+        return None
+    try:
+        info = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    if not stat.S_ISREG(info.st_mode):
+        return None
+
+    match = _CONTENT_HASHED.match(os.path.basename(path))
+    if match:
+        etag = f'"{match.group(0)}"'
+    else:
+        etag = f'"{info.st_mtime_ns:x}-{info.st_size:x}"'
+    return MediaFile(
+        path=path,
+        size=info.st_size,
+        mtime=info.st_mtime,
+        etag=etag,
+        content_type=mimetypes.guess_type(path)[0] or "application/octet-stream",
+        immutable=match is not None,
+    )
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison: W/"x" matches "x"
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def not_modified(media: MediaFile, headers: Headers) -> bool:
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, media.etag)
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(media.mtime) <= since
+    return False
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """The inclusive (start, end) of a single bytes range, or None to send the whole file.
+
+    Multi-range requests are answered with the whole file, which RFC 9110
+    allows; media players only ever ask for one range.
+    """
+    if not header:
+        return None
+    unit, _, ranges = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+    first, dash, last = ranges.strip().partition("-")
+    if not dash:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            # Suffix range: the final N bytes
+            suffix = int(last)
+            if suffix == 0:
+                raise RangeNotSatisfiable()
+            start, end = max(0, size - suffix), size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    if start < 0 or start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+def _range_applies(media: MediaFile, headers: Headers) -> bool:
+    # If-Range: only honour the range if the client's copy is still current
+    if_range = headers.get("if-range")
+    if if_range is None:
+        return True
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return if_range == media.etag
+    return if_range == media.last_modified
+
+
+class MediaResponse(Response):
+    """Streams a file, or one byte range of it, straight from disk.
+
+    A full-file GET is handed to the server with the ASGI pathsend
+    extension when the server offers it, so servers that implement it can
+    use sendfile. Otherwise, and for ranges, only the requested bytes are
+    read, a chunk at a time, off the event loop.
+    """
+
+    def __init__(self, media: MediaFile, status_code: int = 200, byte_range: Optional[Tuple[int, int]] = None,
+                 send_body: bool = True):
+        super().__init__(status_code=status_code, media_type=media.content_type)
+        self.media = media
+        self.byte_range = byte_range
+        self.send_body = send_body
+        start, end = byte_range or (0, media.size - 1)
+        self.headers["content-length"] = str(end - start + 1)
+        if byte_range is not None:
+            self.headers["content-range"] = f"bytes {start}-{end}/{media.size}"
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if not self.send_body:
+            await send({"type": "http.response.body", "body": b""})
+            return
+        if self.byte_range is None and "http.response.pathsend" in scope.get("extensions", {}):
+            await send({"type": "http.response.pathsend", "path": self.media.path})
+            return
+
+        start, end = self.byte_range or (0, self.media.size - 1)
+        remaining = end - start + 1
+        async with await anyio.open_file(self.media.path, mode="rb") as f:
+            if start:
+                await f.seek(start)
+            while remaining > 0:
+                # A short read means the file shrank underneath us; end the response rather than hang
+                chunk = await f.read(min(MEDIA_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+
+def media_response(media: MediaFile, method: str, headers: Headers) -> Response:
+    """Pick 304, 416, 206 or 200 for a GET or HEAD of `media`"""
+    validators = {
+        "etag": media.etag,
+        "last-modified": media.last_modified,
+        "cache-control": IMMUTABLE_CACHE_CONTROL if media.immutable else REVALIDATE_CACHE_CONTROL,
+        "accept-ranges": "bytes",
+    }
+    if not_modified(media, headers):
+        return Response(status_code=304, headers=validators)
+
+    byte_range = None
+    if _range_applies(media, headers):
+        try:
+            byte_range = parse_range(headers.get("range"), media.size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**validators, "content-range": f"bytes */{media.size}"})
+
+    response = MediaResponse(media, 206 if byte_range else 200, byte_range, send_body=method != "HEAD")
+    response.headers.update(validators)
+    return response
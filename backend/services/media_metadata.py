@@ -0,0 +1,424 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import BinaryIO, Dict, List, Optional, Set
+from pymongo import UpdateOne
+import asyncio
+import logging
+import os
+import struct
+
+from services import media
+
+logger = logging.getLogger(__name__)
+
+# Probing only reads headers (and the last page of an Ogg file), so a few
+# threads are plenty; they keep file I/O off the event loop
+METADATA_WORKERS = int(os.environ.get("METADATA_WORKERS", 4))
+# Artworks probed per bulk write while working through the backlog
+METADATA_BACKFILL_BATCH = int(os.environ.get("METADATA_BACKFILL_BATCH", 200))
+
+# Most bytes read from either end of a file
+HEADER_READ_SIZE = 64 * 1024
+
+WAV_MIME_TYPES = {"audio/wav", "audio/x-wav", "audio/wave", "audio/vnd.wave"}
+OGG_MIME_TYPES = {"audio/ogg", "application/ogg"}
+MP3_MIME_TYPES = {"audio/mpeg", "audio/mp3"}
+IMAGE_MIME_TYPES = {"image/jpeg", "image/png", "image/webp", "image/gif"}
+PROBED_MIME_TYPES = WAV_MIME_TYPES | OGG_MIME_TYPES | MP3_MIME_TYPES | IMAGE_MIME_TYPES
+
+
+class UnsupportedMedia(ValueError):
+    pass
+
+
+# --- WAV -------------------------------------------------------------------
+
+WAV_CODECS = {1: "pcm", 3: "pcm_float", 6: "alaw", 7: "mulaw", 0xFFFE: "pcm"}
+
+
+def probe_wav(f: BinaryIO, size: int) -> dict:
+    riff, _, wave = struct.unpack("<4sI4s", f.read(12))
+    if riff not in (b"RIFF", b"RF64") or wave != b"WAVE":
+        raise UnsupportedMedia("not a RIFF/WAVE file")
+
+    fmt = None
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        chunk_id, chunk_size = struct.unpack("<4sI", header)
+        if chunk_id == b"fmt ":
+            fmt = struct.unpack("<HHIIHH", f.read(16))
+            f.seek(chunk_size - 16 + (chunk_size & 1), os.SEEK_CUR)
+        elif chunk_id == b"data":
+            if fmt is None:
+                break
+            # Streamed or RF64 files leave the size at 0xFFFFFFFF; trust the file instead
+            data_size = min(chunk_size, size - f.tell())
+            audio_format, channels, sample_rate, byte_rate, _, bits = fmt
+            if not byte_rate:
+                raise UnsupportedMedia("WAV with a zero byte rate")
+            return {
+                "codec": WAV_CODECS.get(audio_format, f"wav_{audio_format}"),
+                "duration": round(data_size / byte_rate, 3),
+                "sample_rate": sample_rate,
+                "channels": channels,
+                "bits_per_sample": bits,
+                "bitrate": byte_rate * 8,
+            }
+        else:
+            f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+    raise UnsupportedMedia("WAV without fmt and data chunks")
+
+
+# --- Ogg (Vorbis, Opus) ----------------------------------------------------
+
+def _first_packet(page: bytes) -> bytes:
+    # 27-byte page header, then one lacing value per segment
+    if len(page) < 27 or len(page) < 27 + page[26]:
+        raise UnsupportedMedia("truncated Ogg page")
+    return page[27 + page[26]:]
+
+
+def probe_ogg(f: BinaryIO, size: int) -> dict:
+    head = f.read(HEADER_READ_SIZE)
+    if not head.startswith(b"OggS"):
+        raise UnsupportedMedia("not an Ogg stream")
+    serial = struct.unpack_from("<I", head, 14)[0]
+    packet = _first_packet(head)
+
+    if packet.startswith(b"\x01vorbis"):
+        channels, sample_rate, _, nominal_bitrate = struct.unpack_from("<BIiI", packet, 11)
+        codec, clock_rate, pre_skip = "vorbis", sample_rate, 0
+    elif packet.startswith(b"OpusHead"):
+        channels, pre_skip, sample_rate = struct.unpack_from("<BHI", packet, 9)
+        # Opus granule positions always count 48 kHz samples
+        codec, clock_rate, nominal_bitrate = "opus", 48000, 0
+    else:
+        raise UnsupportedMedia("Ogg stream is neither Vorbis nor Opus")
+
+    # The granule position of the stream's last page is its length in samples
+    f.seek(max(0, size - HEADER_READ_SIZE))
+    tail = f.read(HEADER_READ_SIZE)
+    granule = None
+    offset = tail.rfind(b"OggS")
+    while offset != -1:
+        if offset + 27 <= len(tail) and struct.unpack_from("<I", tail, offset + 14)[0] == serial:
+            position = struct.unpack_from("<q", tail, offset + 6)[0]
+            if position >= 0:
+                granule = position
+                break
+        offset = tail.rfind(b"OggS", 0, offset)
+
+    result = {"codec": codec, "sample_rate": sample_rate, "channels": channels}
+    if granule is not None and clock_rate:
+        duration = max(0, granule - pre_skip) / clock_rate
+        result["duration"] = round(duration, 3)
+        if duration:
+            result["bitrate"] = int(size * 8 / duration)
+    if "bitrate" not in result and nominal_bitrate > 0:
+        result["bitrate"] = nominal_bitrate
+    return result
+
+
+# --- MP3 -------------------------------------------------------------------
+
+# Kbit/s by (MPEG-1?, layer) and bitrate index
+_MP3_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Hz by version bits (3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5) and sample rate index
+_MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _mp3_frame(header: bytes) -> Optional[dict]:
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = (header[1] >> 3) & 3
+    layer = 4 - ((header[1] >> 1) & 3)
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 3
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    mpeg1 = version == 3
+    bitrate = _MP3_BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+    padding = (header[2] >> 1) & 1
+    if layer == 1:
+        samples, length = 384, (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if mpeg1 or layer == 2 else 576
+        length = samples // 8 * bitrate // sample_rate + padding
+    mono = header[3] >> 6 == 3
+    return {
+        "mpeg1": mpeg1, "layer": layer, "bitrate": bitrate, "sample_rate": sample_rate,
+        "samples": samples, "length": length, "channels": 1 if mono else 2,
+        # Where a Xing/Info header would sit: after the side information
+        "xing_offset": 4 + ((17 if mono else 32) if mpeg1 else (9 if mono else 17)),
+    }
+
+
+def probe_mp3(f: BinaryIO, size: int) -> dict:
+    head = f.read(HEADER_READ_SIZE)
+    base = 0
+    if head.startswith(b"ID3") and len(head) >= 10:
+        # Syncsafe tag size, plus the 10-byte header and an optional footer
+        tag_size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+        base = 10 + tag_size + (10 if head[5] & 0x10 else 0)
+        f.seek(base)
+        head = f.read(HEADER_READ_SIZE)
+
+    # The first header that is followed by another valid header where its length says it should be
+    start = 0
+    while True:
+        start = head.find(b"\xff", start)
+        if start == -1 or start + 4 > len(head):
+            raise UnsupportedMedia("no MPEG audio frames found")
+        frame = _mp3_frame(head[start:start + 4])
+        if frame is not None:
+            following = start + frame["length"]
+            if following + 4 > len(head) or _mp3_frame(head[following:following + 4]) is not None:
+                break
+        start += 1
+
+    audio_start = base + start
+    audio_end = size
+    f.seek(max(0, size - 128))
+    if f.read(3) == b"TAG":
+        audio_end -= 128
+    audio_bytes = max(0, audio_end - audio_start)
+
+    frames = None
+    vbr = head[start + frame["xing_offset"]:start + frame["xing_offset"] + 16]
+    if vbr[:4] in (b"Xing", b"Info"):
+        flags = struct.unpack_from(">I", vbr, 4)[0]
+        if flags & 1:
+            frames = struct.unpack_from(">I", vbr, 8)[0]
+        if flags & 2:
+            audio_bytes = struct.unpack_from(">I", vbr, 12 if flags & 1 else 8)[0]
+    elif head[start + 36:start + 40] == b"VBRI":
+        audio_bytes, frames = struct.unpack_from(">II", head, start + 46)
+
+    if frames:
+        duration = frames * frame["samples"] / frame["sample_rate"]
+        bitrate = int(audio_bytes * 8 / duration) if duration else frame["bitrate"]
+    else:
+        # Constant bitrate: every frame has the first one's bitrate
+        bitrate = frame["bitrate"]
+        duration = audio_bytes * 8 / bitrate
+
+    return {
+        "codec": "mp3" if frame["layer"] == 3 else f"mp{frame['layer']}",
+        "duration": round(duration, 3),
+        "sample_rate": frame["sample_rate"],
+        "channels": frame["channels"],
+        "bitrate": bitrate,
+    }
+
+
+# --- Images ----------------------------------------------------------------
+
+def probe_image(path: str) -> dict:
+    """Dimensions as displayed, read from the header without decoding pixels"""
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+            # EXIF orientations 5-8 are rotated a quarter turn when shown
+            if image.getexif().get(0x0112) in (5, 6, 7, 8):
+                width, height = height, width
+            return {"width": width, "height": height, "format": (image.format or "").lower()}
+    except UnidentifiedImageError as exc:
+        raise UnsupportedMedia(str(exc))
+
+
+def _probe_file(path: str, mime_type: str) -> dict:
+    if mime_type in IMAGE_MIME_TYPES:
+        return probe_image(path)
+
+    probes = {**dict.fromkeys(WAV_MIME_TYPES, probe_wav), **dict.fromkeys(OGG_MIME_TYPES, probe_ogg),
+              **dict.fromkeys(MP3_MIME_TYPES, probe_mp3)}
+    probe = probes.get(mime_type)
+    if probe is None:
+        raise UnsupportedMedia(f"no probe for {mime_type}")
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        return probe(f, size)
+
+
+def extract_metadata(path: str, mime_type: str) -> dict:
+    """Technical metadata of one file. Blocking; run it on an executor.
+
+    Raises OSError if the file can't be read and UnsupportedMedia for
+    anything it can't parse, however malformed.
+    """
+    try:
+        return _probe_file(path, mime_type)
+    except (UnsupportedMedia, OSError):
+        raise
+    except struct.error as exc:
+        raise UnsupportedMedia("truncated header") from exc
+    except Exception as exc:
+        # Truncated or hostile headers surface as IndexError, ZeroDivisionError,
+        # Pillow's DecompressionBombError and the like
+        raise UnsupportedMedia(f"unparseable {mime_type}: {type(exc).__name__}") from exc
+
+
+def local_path(file_url: str) -> Optional[str]:
+    """Path of an /uploads/... URL inside UPLOAD_DIR, if the file exists"""
+    prefix = "/uploads/"
+    if not file_url or not file_url.startswith(prefix):
+        return None
+    found = media.resolve(file_url[len(prefix):])
+    return found.path if found is not None else None
+
+
+def metadata_updates(artwork_id: str, fields: dict) -> List[UpdateOne]:
+    """Merge `fields` into an artwork's metadata.
+
+    Older artworks may have metadata null, where a dotted $set fails, so
+    there is one update for each case and exactly one of them matches.
+    """
+    return [
+        UpdateOne({"id": artwork_id, "metadata": {"$type": "object"}},
+                  {"$set": {f"metadata.{key}": value for key, value in fields.items()}}),
+        UpdateOne({"id": artwork_id, "metadata": {"$not": {"$type": "object"}}},
+                  {"$set": {"metadata": fields}}),
+    ]
+
+
+class MetadataExtractor:
+    """Fills Artwork.metadata with duration, sample rate, bitrate and dimensions.
+
+    New uploads are probed right after they are stored. Artworks that
+    predate the extractor are worked through once at startup, in batches,
+    each written back with a single unordered bulk write. Every probed
+    artwork gets metadata.probed_at, including ones that could not be
+    parsed (their metadata.probe_error says why), so nothing is retried
+    on every restart.
+    """
+
+    def __init__(self, workers: int, batch_size: int):
+        self.workers = workers
+        self.batch_size = batch_size
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._backfill_task: Optional[asyncio.Task] = None
+        self.probed = 0
+        self.failed = 0
+        self.backfilled = 0
+
+    @staticmethod
+    def wants(artwork) -> bool:
+        return artwork.mime_type in PROBED_MIME_TYPES
+
+    def start(self, db):
+        """Work through the backlog in the background"""
+        if self._backfill_task is None:
+            self._backfill_task = asyncio.create_task(self._backfill_logged(db))
+
+    async def stop(self):
+        if self._backfill_task is not None:
+            self._backfill_task.cancel()
+            await asyncio.gather(self._backfill_task, return_exceptions=True)
+            self._backfill_task = None
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def schedule(self, db, artwork, path: str):
+        if not self.wants(artwork):
+            return
+        task = asyncio.create_task(self._probe_one(db, artwork.id, path, artwork.mime_type))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def probe(self, path: Optional[str], mime_type: str) -> Dict[str, object]:
+        """The metadata fields for one file, including the probe bookkeeping"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="metadata")
+
+        fields: Dict[str, object] = {"probed_at": datetime.utcnow()}
+        if path is None:
+            fields["probe_error"] = "file not found"
+            self.failed += 1
+            return fields
+        try:
+            extracted = await asyncio.get_running_loop().run_in_executor(
+                self._executor, extract_metadata, path, mime_type
+            )
+        except Exception as exc:
+            # Recorded rather than raised: one bad file must not stop a backfill batch
+            if not isinstance(exc, (UnsupportedMedia, OSError)):
+                logger.exception("Unexpected error probing %s", path)
+            fields["probe_error"] = str(exc) or type(exc).__name__
+            self.failed += 1
+            return fields
+        fields.update(extracted)
+        self.probed += 1
+        return fields
+
+    async def _probe_one(self, db, artwork_id: str, path: str, mime_type: str):
+        try:
+            fields = await self.probe(path, mime_type)
+            await db.artworks.bulk_write(metadata_updates(artwork_id, fields), ordered=False)
+        except Exception:
+            logger.exception("Metadata extraction failed for artwork %s", artwork_id)
+
+    async def backfill(self, db) -> int:
+        """Probe every artwork that has never been probed; returns how many were"""
+        query = {"metadata.probed_at": {"$exists": False}, "mime_type": {"$in": sorted(PROBED_MIME_TYPES)}}
+        projection = {"_id": 0, "id": 1, "file_url": 1, "mime_type": 1}
+        done = 0
+        batch = []
+        # One pass over a single cursor; updating probed_at doesn't move documents within it
+        async for doc in db.artworks.find(query, projection).batch_size(self.batch_size):
+            batch.append(doc)
+            if len(batch) >= self.batch_size:
+                done += await self._backfill_batch(db, batch)
+                batch = []
+        if batch:
+            done += await self._backfill_batch(db, batch)
+        return done
+
+    async def _backfill_batch(self, db, docs) -> int:
+        results = await asyncio.gather(*(
+            self.probe(local_path(doc.get("file_url")), doc["mime_type"]) for doc in docs
+        ))
+        await db.artworks.bulk_write(
+            [update for doc, fields in zip(docs, results) for update in metadata_updates(doc["id"], fields)],
+            ordered=False
+        )
+        self.backfilled += len(docs)
+        return len(docs)
+
+    async def _backfill_logged(self, db):
+        try:
+            count = await self.backfill(db)
+        except Exception:
+            logger.exception("Metadata backfill stopped early")
+            return
+        if count:
+            logger.info("Extracted media metadata for %d existing artworks", count)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": len(self._tasks),
+            "backfill_running": self._backfill_task is not None and not self._backfill_task.done(),
+            "probed": self.probed,
+            "failed": self.failed,
+            "backfilled": self.backfilled,
+        }
+
+
+metadata_extractor = MetadataExtractor(METADATA_WORKERS, METADATA_BACKFILL_BATCH)
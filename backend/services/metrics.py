@@ -0,0 +1,250 @@
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+from pymongo import monitoring
+from services import query_profiler
+import threading
+import time
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_registry: List["Metric"] = []
+
+
+class Metric:
+    """Base for counters, gauges and histograms.
+
+    Every thread writes to its own shard of values, so recording never
+    takes a lock and never races with the driver's executor threads.
+    Shards are summed when the metrics are scraped; a scrape that runs
+    while another thread records may miss that one observation.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional[List["Metric"]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        (_registry if registry is None else registry).append(self)
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            self._shards.append(values)
+            return values
+
+    def samples(self) -> List[Tuple[str, Tuple[Tuple[str, str], ...], float]]:
+        raise NotImplementedError
+
+    def _labels(self, values: Tuple[str, ...], *extra: Tuple[str, str]):
+        return tuple(zip(self.labelnames, values)) + extra
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def value(self, labels: Tuple[str, ...] = ()) -> float:
+        return sum(shard.get(labels, 0) for shard in list(self._shards))
+
+    def samples(self):
+        totals: Dict[Tuple[str, ...], float] = {}
+        for shard in list(self._shards):
+            for labels, value in list(shard.items()):
+                totals[labels] = totals.get(labels, 0) + value
+        return [(self.name, self._labels(labels), value) for labels, value in sorted(totals.items())]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels: Tuple[str, ...] = (), amount: float = 1):
+        self.inc(labels, -amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS,
+                 registry: Optional[List[Metric]] = None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, labels: Tuple[str, ...] = ()):
+        shard = self._shard()
+        row = shard.get(labels)
+        if row is None:
+            # One slot per bucket, one for +Inf, then the running sum
+            row = shard[labels] = [0] * (len(self.buckets) + 2)
+        row[bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def samples(self):
+        merged: Dict[Tuple[str, ...], list] = {}
+        for shard in list(self._shards):
+            for labels, row in list(shard.items()):
+                total = merged.setdefault(labels, [0] * len(row))
+                for i, value in enumerate(list(row)):
+                    total[i] += value
+
+        samples = []
+        for labels, row in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip([*map(_format_value, self.buckets), "+Inf"], row):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", self._labels(labels, ("le", bound)), cumulative))
+            samples.append((f"{self.name}_sum", self._labels(labels), row[-1]))
+            samples.append((f"{self.name}_count", self._labels(labels), cumulative))
+        return samples
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render(registry: Optional[List[Metric]] = None) -> str:
+    """Every registered metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in _registry if registry is None else registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels)
+            lines.append(f"{name}{{{label_text}}} {_format_value(value)}" if label_text else f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+http_requests = Counter(
+    "http_requests_total", "HTTP requests by route template and status code", ("method", "route", "status"))
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Time from request start to the last body chunk", ("method", "route"))
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled")
+http_response_size = Histogram(
+    "http_response_size_bytes", "Response body size", ("method", "route"), buckets=SIZE_BUCKETS)
+http_request_db_commands = Histogram(
+    "http_request_mongo_commands", "MongoDB commands issued while handling one request", ("method", "route"),
+    buckets=COUNT_BUCKETS)
+mongo_command_duration = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command round trips by collection", ("command", "collection"))
+mongo_command_failures = Counter(
+    "mongo_command_failures_total", "MongoDB commands that returned an error", ("command", "collection"))
+
+
+class CommandTimingListener(monitoring.CommandListener):
+    """Times every MongoDB command and charges it to the current request"""
+
+    def __init__(self):
+        self._collections: Dict[tuple, str] = {}
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        collection = target if isinstance(target, str) else ""
+        self._collections[(event.connection_id, event.request_id)] = collection
+        tally = query_profiler.current_tally()
+        if tally is not None and tally.shapes is not None:
+            spec = query_profiler.command_spec(event.command_name, event.command)
+            tally.note_shape(query_profiler.query_shape(event.command_name, collection, spec))
+
+    def _finished(self, event) -> Tuple[str, str]:
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        seconds = event.duration_micros / 1_000_000
+        labels = (event.command_name, collection)
+        mongo_command_duration.observe(seconds, labels)
+        tally = query_profiler.current_tally()
+        if tally is not None:
+            tally.commands += 1
+            tally.seconds += seconds
+        return labels
+
+    def succeeded(self, event):
+        self._finished(event)
+
+    def failed(self, event):
+        mongo_command_failures.inc(self._finished(event))
+
+
+command_timing = CommandTimingListener()
+
+
+class MetricsMiddleware:
+    """Records latency, status, response size and database work per route.
+
+    Routes are labelled by their path template (/api/scenes/{scene_id}),
+    not the concrete URL, so label cardinality stays fixed. Requests that
+    match no route share the "unmatched" label.
+
+    With profiling on, responses also carry X-DB-Queries / X-DB-Time and
+    requests over the query budget are logged (see services.query_profiler).
+    """
+
+    def __init__(self, app, profile: Optional[bool] = None):
+        self.app = app
+        self.profile = query_profiler.DB_PROFILE if profile is None else profile
+        self._routes: Optional[dict] = None
+
+    def _route_path(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._routes is None:
+            self._routes = {
+                getattr(route, "endpoint", None) or getattr(route, "app", None): route.path
+                for route in scope["app"].routes
+            }
+        return self._routes.get(endpoint, "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.profile:
+                    message["headers"] = [*message.get("headers", []), *query_profiler.debug_headers(tally)]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        tally, token = query_profiler.begin(self.profile)
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec()
+            query_profiler.end(token)
+            labels = (scope["method"], self._route_path(scope))
+            if self.profile:
+                query_profiler.review(*labels, tally)
+            http_requests.inc((*labels, str(status)))
+            http_request_duration.observe(elapsed, labels)
+            http_response_size.observe(size, labels)
+            http_request_db_commands.observe(tally.commands, labels)
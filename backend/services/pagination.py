@@ -0,0 +1,56 @@
+from typing import Any, List, Sequence, Tuple
+from bson import json_util
+from fastapi import HTTPException
+import base64
+import binascii
+
+# A sort specification as passed to cursor.sort(): [(field, 1 | -1), ...]
+SortSpec = Sequence[Tuple[str, int]]
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Pack the sort-key values of a document into an opaque, URL-safe token"""
+    raw = json_util.dumps(list(values)).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, expected_length: int) -> List[Any]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json_util.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != expected_length:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def cursor_for(doc: dict, sort: SortSpec) -> str:
+    return encode_cursor([_get_path(doc, field) for field, _ in sort])
+
+
+def keyset_filter(sort: SortSpec, values: Sequence[Any]) -> dict:
+    """Filter matching documents strictly after `values` in `sort` order.
+
+    For sort keys (a, b, c) this expands to
+    a > va OR (a = va AND b > vb) OR (a = va AND b = vb AND c > vc),
+    with the comparison flipped for descending keys, which Mongo answers
+    as bounded ranges on a matching compound index.
+    """
+    branches = []
+    for i, (field, direction) in enumerate(sort):
+        branch = {prefix_field: values[j] for j, (prefix_field, _) in enumerate(sort[:i])}
+        branch[field] = {"$gt" if direction > 0 else "$lt": values[i]}
+        branches.append(branch)
+    return branches[0] if len(branches) == 1 else {"$or": branches}
+
+
+def reverse_sort(sort: SortSpec) -> List[Tuple[str, int]]:
+    return [(field, -direction) for field, direction in sort]
+
+
+def _get_path(doc: dict, path: str):
+    value = doc
+    for part in path.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
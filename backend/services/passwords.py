@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+from models.user import User
+import asyncio
+import os
+import time
+
+# bcrypt work factor for new hashes. Existing hashes at a different cost are
+# upgraded transparently on the next successful login.
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+
+# bcrypt releases the GIL, so a small thread pool gives real parallelism
+# without blocking the event loop.
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+# Requests waiting beyond this are rejected with 503 instead of piling up
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", 64))
+
+
+class PasswordHasher:
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots = asyncio.Semaphore(workers)
+        self.pending = 0
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.total_seconds = 0.0
+
+    async def _run(self, func, *args):
+        if self.max_pending and self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server busy, please retry"
+            )
+
+        self.pending += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.pending -= 1
+
+        self.active += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.total_seconds += time.perf_counter() - started
+            self.active -= 1
+            self.completed += 1
+            self._slots.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(User.hash_password, password, BCRYPT_ROUNDS)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(User.check_password, password, hashed)
+
+    @staticmethod
+    def needs_rehash(hashed: str) -> bool:
+        """True when a stored hash was made with a different work factor than configured"""
+        parts = hashed.split("$")
+        try:
+            return int(parts[2]) != BCRYPT_ROUNDS
+        except (IndexError, ValueError):
+            return True
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "rounds": BCRYPT_ROUNDS,
+            "active": self.active,
+            "queue_depth": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "avg_ms": round(self.total_seconds * 1000 / self.completed, 2) if self.completed else 0.0,
+        }
+
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
@@ -0,0 +1,150 @@
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+from bson import ObjectId
+from pymongo import UpdateOne
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# A user counts as online for this long after their last heartbeat (seconds)
+PRESENCE_TTL = float(os.environ.get("PRESENCE_TTL", 60))
+# last_seen is written to the users collection in batches this often (seconds)
+PRESENCE_FLUSH_INTERVAL = float(os.environ.get("PRESENCE_FLUSH_INTERVAL", 30))
+
+
+class PresenceService:
+    """Online state kept in memory, fed by heartbeats.
+
+    Reads never touch MongoDB. The only writes are periodic unordered bulk
+    updates of users.last_seen, one per user active since the last flush,
+    however many heartbeats they sent.
+    """
+
+    def __init__(self, ttl: float, flush_interval: float):
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self._expires: Dict[str, float] = {}  # user id -> monotonic deadline
+        self._last_seen: Dict[str, datetime] = {}
+        self._suites: Dict[str, str] = {}  # user id -> suite they last reported being in
+        self._suite_seen: Dict[str, datetime] = {}
+        self._dirty: Dict[str, datetime] = {}  # last_seen values not yet persisted
+        self._db = None
+        self._loop_task: Optional[asyncio.Task] = None
+        self.heartbeats = 0
+        self.flushes = 0
+        self.documents_written = 0
+        self.failed_flushes = 0
+
+    def start(self, db):
+        self._db = db
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            # A flush cut short puts its batch back before the final one runs
+            await asyncio.gather(self._loop_task, return_exceptions=True)
+            self._loop_task = None
+        await self.flush()
+
+    def heartbeat(self, user_id: str, suite_id: Optional[str] = None):
+        now = datetime.utcnow()
+        self._expires[user_id] = time.monotonic() + self.ttl
+        self._last_seen[user_id] = now
+        self._dirty[user_id] = now
+        if suite_id is not None:
+            self._suites[user_id] = suite_id
+            self._suite_seen[suite_id] = now
+        elif user_id in self._suites:
+            self._suite_seen[self._suites[user_id]] = now
+        self.heartbeats += 1
+
+    def disconnect(self, user_id: str):
+        """Go offline now rather than when the TTL runs out (logout)"""
+        if self._expires.pop(user_id, None) is not None:
+            self._dirty[user_id] = self._last_seen[user_id] = datetime.utcnow()
+        self._suites.pop(user_id, None)
+
+    def is_online(self, user_id: str) -> bool:
+        deadline = self._expires.get(user_id)
+        return deadline is not None and deadline > time.monotonic()
+
+    def online(self, user_ids: Iterable[str]) -> Dict[str, bool]:
+        return {user_id: self.is_online(user_id) for user_id in user_ids}
+
+    def last_seen(self, user_id: str) -> Optional[datetime]:
+        """Last activity seen by this process; None if the user hasn't been seen since startup"""
+        return self._last_seen.get(user_id)
+
+    def suite_status(self, suite_id: str) -> Tuple[bool, Optional[datetime]]:
+        """Whether anyone online is in a suite, and when someone last was"""
+        occupied = any(
+            suite == suite_id and self.is_online(user_id)
+            for user_id, suite in self._suites.items()
+        )
+        return occupied, self._suite_seen.get(suite_id)
+
+    def _expire(self):
+        now = time.monotonic()
+        for user_id in [user_id for user_id, deadline in self._expires.items() if deadline <= now]:
+            del self._expires[user_id]
+            self._suites.pop(user_id, None)
+
+    async def flush(self) -> int:
+        self._expire()
+        # Offline users whose last_seen is already in MongoDB need no memory
+        for user_id in [user_id for user_id in self._last_seen
+                        if user_id not in self._expires and user_id not in self._dirty]:
+            del self._last_seen[user_id]
+        if not self._dirty or self._db is None:
+            return 0
+
+        batch, self._dirty = self._dirty, {}
+        operations = [
+            UpdateOne({"_id": ObjectId(user_id)}, {"$max": {"last_seen": seen}})
+            for user_id, seen in batch.items()
+            if ObjectId.is_valid(user_id)
+        ]
+        if not operations:
+            return 0
+        try:
+            await self._db.users.bulk_write(operations, ordered=False)
+        except BaseException as exc:
+            # Keep the newer of the failed value and anything recorded since;
+            # rewriting a batch that did land is harmless under $max
+            for user_id, seen in batch.items():
+                self._dirty[user_id] = max(seen, self._dirty.get(user_id, seen))
+            if not isinstance(exc, Exception):
+                raise
+            self.failed_flushes += 1
+            logger.exception("Failed to flush last_seen for %d users", len(batch))
+            return 0
+
+        self.flushes += 1
+        self.documents_written += len(operations)
+        return len(operations)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "online": sum(1 for user_id in list(self._expires) if self.is_online(user_id)),
+            "tracked": len(self._last_seen),
+            "pending_writes": len(self._dirty),
+            "heartbeats": self.heartbeats,
+            "flushes": self.flushes,
+            "documents_written": self.documents_written,
+            "failed_flushes": self.failed_flushes,
+            "ttl": self.ttl,
+            "flush_interval": self.flush_interval,
+        }
+
+
+presence = PresenceService(PRESENCE_TTL, PRESENCE_FLUSH_INTERVAL)
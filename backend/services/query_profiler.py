@@ -0,0 +1,117 @@
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: count query shapes per request, add X-DB-Queries / X-DB-Time
+# response headers and warn about requests that go over budget
+DB_PROFILE = os.environ.get("DB_PROFILE", "").lower() in ("1", "true", "yes")
+# Warn when one request issues more MongoDB commands than this...
+DB_QUERY_BUDGET = int(os.environ.get("DB_QUERY_BUDGET", 25))
+# ...or repeats the same query shape this many times (the N+1 signature)
+DB_REPEATED_QUERY_LIMIT = int(os.environ.get("DB_REPEATED_QUERY_LIMIT", 5))
+
+# Where each command keeps the document that decides its shape
+_SPEC_FIELDS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+    "aggregate": "pipeline",
+}
+_STATEMENT_FIELDS = {"update": ("updates", "q"), "delete": ("deletes", "q")}
+
+
+class RequestTally:
+    """Database work done on behalf of one HTTP request.
+
+    `shapes` is only kept while profiling, since building a shape means
+    walking every filter.
+    """
+
+    __slots__ = ("commands", "seconds", "shapes")
+
+    def __init__(self, profile: bool = False):
+        self.commands = 0
+        self.seconds = 0.0
+        self.shapes: Optional[Dict[str, int]] = {} if profile else None
+
+    def note_shape(self, shape: str):
+        self.shapes[shape] = self.shapes.get(shape, 0) + 1
+
+    def repeated(self, limit: int = DB_REPEATED_QUERY_LIMIT) -> List[Tuple[str, int]]:
+        """Query shapes issued at least `limit` times, most repeated first"""
+        if not self.shapes:
+            return []
+        return sorted(
+            ((shape, count) for shape, count in self.shapes.items() if count >= limit),
+            key=lambda item: -item[1]
+        )
+
+
+# Motor runs each driver call on an executor thread inside a copy of the
+# calling task's context, so the command listener sees the tally of the
+# request that issued the command
+_current_tally: ContextVar[Optional[RequestTally]] = ContextVar("request_tally", default=None)
+
+
+def current_tally() -> Optional[RequestTally]:
+    return _current_tally.get()
+
+
+def begin(profile: bool = DB_PROFILE):
+    """Start charging database work in this context to a new tally; returns (tally, reset token)"""
+    tally = RequestTally(profile)
+    return tally, _current_tally.set(tally)
+
+
+def end(token):
+    _current_tally.reset(token)
+
+
+def _strip(value: Any) -> Any:
+    # Keep field names and operators, drop the values
+    if isinstance(value, dict):
+        return {key: _strip(item) for key, item in value.items()}
+    if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+        return [_strip(item) for item in value]
+    return "?"
+
+
+def query_shape(command_name: str, collection: str, spec: Any = None) -> str:
+    """A query with its values blanked out, e.g. find users {'_id': '?'}"""
+    if spec is None:
+        return f"{command_name} {collection}"
+    return f"{command_name} {collection} {_strip(spec)}"
+
+
+def command_spec(command_name: str, command: dict) -> Any:
+    """The filter or pipeline of a raw command document, as seen by a CommandListener"""
+    if command_name in _SPEC_FIELDS:
+        return command.get(_SPEC_FIELDS[command_name])
+    if command_name in _STATEMENT_FIELDS:
+        field, key = _STATEMENT_FIELDS[command_name]
+        return [statement.get(key) for statement in command.get(field, [])]
+    return None
+
+
+def debug_headers(tally: RequestTally) -> List[Tuple[bytes, bytes]]:
+    return [
+        (b"x-db-queries", str(tally.commands).encode()),
+        (b"x-db-time", f"{tally.seconds * 1000:.2f}ms".encode()),
+    ]
+
+
+def review(method: str, route: str, tally: RequestTally) -> bool:
+    """Log a warning if a request went over the query budget or looks like N+1; returns whether it did"""
+    repeated = tally.repeated()
+    if tally.commands <= DB_QUERY_BUDGET and not repeated:
+        return False
+    logger.warning(
+        "%s %s issued %d MongoDB commands in %.1fms (budget %d)%s",
+        method, route, tally.commands, tally.seconds * 1000, DB_QUERY_BUDGET,
+        "".join(f"\n  {count}x {shape}" for shape, count in repeated)
+    )
+    return True
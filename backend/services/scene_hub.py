@@ -0,0 +1,155 @@
+from typing import Dict, Optional, Set
+from fastapi import WebSocket
+from fastapi.encoders import jsonable_encoder
+import asyncio
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Close code sent to clients that cannot keep up with their scene's traffic
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class SceneConnection:
+    """One subscriber socket with its own bounded outbound queue"""
+
+    __slots__ = ("scene_id", "websocket", "user", "can_edit", "queue", "sender_task", "closed")
+
+    def __init__(self, scene_id: str, websocket: WebSocket, user, can_edit: bool, queue_size: int):
+        self.scene_id = scene_id
+        self.websocket = websocket
+        self.user = user
+        self.can_edit = can_edit
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.sender_task: Optional[asyncio.Task] = None
+        self.closed = False
+
+
+class SceneHub:
+    """Per-scene rooms that fan events out to every connected socket.
+
+    Each event is serialised once and pushed onto the subscribers' queues
+    without awaiting, so a slow socket never holds up the publisher. A
+    subscriber whose queue is full, or whose send stalls past the timeout,
+    is evicted and closed.
+    """
+
+    def __init__(self, queue_size: int = 64, send_timeout: float = 10.0):
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.rooms: Dict[str, Set[SceneConnection]] = {}
+        self.published = 0
+        self.evictions = 0
+
+    async def join(self, scene_id: str, websocket: WebSocket, user, can_edit: bool = False) -> SceneConnection:
+        connection = SceneConnection(scene_id, websocket, user, can_edit, self.queue_size)
+        connection.sender_task = asyncio.create_task(self._sender(connection))
+        self.rooms.setdefault(scene_id, set()).add(connection)
+        self.publish(scene_id, "user-joined", {"user": self._user_summary(user)}, exclude=connection)
+        return connection
+
+    async def leave(self, connection: SceneConnection):
+        if self._discard(connection):
+            self.publish(connection.scene_id, "user-left", {"userId": connection.user.id})
+        if connection.sender_task and connection.sender_task is not asyncio.current_task():
+            connection.sender_task.cancel()
+
+    def publish(self, scene_id: str, event: str, data, exclude: Optional[SceneConnection] = None) -> int:
+        """Queue an event for every subscriber of a scene; returns the number reached"""
+        room = self.rooms.get(scene_id)
+        if not room:
+            return 0
+
+        payload = json.dumps({"event": event, "data": jsonable_encoder(data)})
+        delivered = 0
+        for connection in list(room):
+            if connection is exclude:
+                continue
+            try:
+                connection.queue.put_nowait(payload)
+                delivered += 1
+            except asyncio.QueueFull:
+                self._evict(connection, "send queue full")
+        self.published += 1
+        return delivered
+
+    def send_to(self, connection: SceneConnection, event: str, data):
+        try:
+            connection.queue.put_nowait(json.dumps({"event": event, "data": jsonable_encoder(data)}))
+        except asyncio.QueueFull:
+            self._evict(connection, "send queue full")
+
+    def members(self, scene_id: str) -> list:
+        unique = {}
+        for connection in self.rooms.get(scene_id, ()):
+            unique[connection.user.id] = self._user_summary(connection.user)
+        return list(unique.values())
+
+    def stats(self) -> dict:
+        return {
+            "rooms": len(self.rooms),
+            "connections": sum(len(room) for room in self.rooms.values()),
+            "published": self.published,
+            "evictions": self.evictions,
+        }
+
+    async def close_all(self):
+        for room in list(self.rooms.values()):
+            for connection in list(room):
+                self._discard(connection)
+                if connection.sender_task:
+                    connection.sender_task.cancel()
+                await self._close_socket(connection, 1001)
+
+    async def _sender(self, connection: SceneConnection):
+        try:
+            while True:
+                payload = await connection.queue.get()
+                await asyncio.wait_for(connection.websocket.send_text(payload), self.send_timeout)
+        except asyncio.CancelledError:
+            pass
+        except asyncio.TimeoutError:
+            self._evict(connection, "send timed out")
+        except Exception:
+            # Socket already gone; the receive loop will call leave()
+            self._discard(connection)
+
+    def _evict(self, connection: SceneConnection, reason: str):
+        if not self._discard(connection):
+            return
+        self.evictions += 1
+        logger.warning("Evicting slow websocket consumer for scene %s: %s", connection.scene_id, reason)
+        if connection.sender_task and connection.sender_task is not asyncio.current_task():
+            connection.sender_task.cancel()
+        asyncio.create_task(self._close_socket(connection, SLOW_CONSUMER_CLOSE_CODE))
+        self.publish(connection.scene_id, "user-left", {"userId": connection.user.id})
+
+    def _discard(self, connection: SceneConnection) -> bool:
+        if connection.closed:
+            return False
+        connection.closed = True
+        room = self.rooms.get(connection.scene_id)
+        if room is not None:
+            room.discard(connection)
+            if not room:
+                del self.rooms[connection.scene_id]
+        return True
+
+    @staticmethod
+    async def _close_socket(connection: SceneConnection, code: int):
+        try:
+            await connection.websocket.close(code=code)
+        except Exception:
+            pass
+
+    @staticmethod
+    def _user_summary(user) -> dict:
+        return {"id": user.id, "name": user.name, "avatar": user.avatar}
+
+
+scene_hub = SceneHub(
+    queue_size=int(os.environ.get("SCENE_HUB_QUEUE_SIZE", 64)),
+    send_timeout=float(os.environ.get("SCENE_HUB_SEND_TIMEOUT", 10)),
+)
@@ -0,0 +1,237 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from models.scene import SceneObject
+from services.scene_ops import PatchPlan
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Object edits are appended to the scene_ops collection, one document per
+# version: {"scene_id", "version", "removed", "updated", "added", ["replace"]}.
+# scenes.objects is a snapshot as of scenes.snapshot_version; scenes.version
+# is the head of the log. Readers apply the (few) ops between the two.
+
+# Compact a scene as soon as this many ops sit on top of its snapshot...
+SCENE_COMPACT_THRESHOLD = int(os.environ.get("SCENE_COMPACT_THRESHOLD", 200))
+# ...and sweep every scene edited since the last pass this often (seconds)
+SCENE_COMPACT_INTERVAL = float(os.environ.get("SCENE_COMPACT_INTERVAL", 30))
+# Ops kept behind the snapshot so reconnecting clients can still fetch a delta
+SCENE_OPS_RETAIN = int(os.environ.get("SCENE_OPS_RETAIN", 1000))
+
+
+class VersionConflict(Exception):
+    def __init__(self, version: int):
+        super().__init__(f"Scene is at version {version}")
+        self.version = version
+
+
+def _snapshot_filter(snapshot_version: int) -> dict:
+    # Scenes stored before the op log have no snapshot_version; that means 0
+    if snapshot_version == 0:
+        return {"$or": [{"snapshot_version": 0}, {"snapshot_version": {"$exists": False}}]}
+    return {"snapshot_version": snapshot_version}
+
+
+async def head_version(db, scene_id: ObjectId, known: int = 0) -> int:
+    """Latest version in the log, repairing scenes.version if an append died half way"""
+    latest = await db.scene_ops.find_one({"scene_id": scene_id}, {"version": 1}, sort=[("version", -1)])
+    version = max(known, latest["version"] if latest else 0)
+    if version > known:
+        await db.scenes.update_one({"_id": scene_id}, {"$max": {"version": version}})
+    return version
+
+
+async def append(db, scene_id: ObjectId, base_version: int, plan: PatchPlan, user_id: ObjectId) -> int:
+    """Record `plan` as the version after `base_version`.
+
+    The unique (scene_id, version) index makes this the concurrency check:
+    of two writers starting from the same version exactly one gets in.
+    """
+    version = base_version + 1
+    now = datetime.utcnow()
+    try:
+        await db.scene_ops.insert_one({
+            "scene_id": scene_id,
+            "version": version,
+            **plan.to_entry(),
+            "user_id": user_id,
+            "created_at": now
+        })
+    except DuplicateKeyError:
+        raise VersionConflict(await head_version(db, scene_id, version))
+    await db.scenes.update_one({"_id": scene_id}, {"$max": {"version": version}, "$set": {"updated_at": now}})
+    return version
+
+
+async def pending_entries(db, scenes: Iterable[tuple]) -> Dict[ObjectId, List[dict]]:
+    """Ops above each snapshot, fetched for many (scene_id, snapshot_version) pairs at once"""
+    clauses = [{"scene_id": scene_id, "version": {"$gt": after}} for scene_id, after in scenes]
+    entries = {}
+    if not clauses:
+        return entries
+    query = clauses[0] if len(clauses) == 1 else {"$or": clauses}
+    async for entry in db.scene_ops.find(query).sort("version", 1):
+        entries.setdefault(entry["scene_id"], []).append(entry)
+    return entries
+
+
+def replay(objects: List[dict], entries: List[dict]) -> Dict[str, dict]:
+    state = {obj["id"]: obj for obj in objects}
+    for entry in entries:
+        PatchPlan.from_entry(entry).apply(state)
+    return state
+
+
+async def materialize_scenes(db, scenes: list) -> list:
+    """Bring each Scene's objects up to its head version in one log query"""
+    stale = [scene for scene in scenes if scene.version > scene.snapshot_version]
+    entries = await pending_entries(db, [(scene.id, scene.snapshot_version) for scene in stale])
+    for scene in stale:
+        if scene.id in entries:
+            state = replay([obj.dict() for obj in scene.objects], entries[scene.id])
+            scene.objects = [SceneObject.model_construct(**obj) for obj in state.values()]
+    return scenes
+
+
+async def load_objects(db, scene_doc: dict, object_ids: List[str]) -> Dict[str, dict]:
+    """Current state of just the given objects, without reading the whole array"""
+    pipeline = [
+        {"$match": {"_id": scene_doc["_id"]}},
+        {"$project": {"objects": {"$filter": {
+            "input": "$objects",
+            "as": "obj",
+            "cond": {"$in": ["$$obj.id", object_ids]}
+        }}}}
+    ]
+    objects = []
+    async for doc in db.scenes.aggregate(pipeline):
+        objects = doc.get("objects", [])
+
+    snapshot_version = scene_doc.get("snapshot_version", 0)
+    entries = await pending_entries(db, [(scene_doc["_id"], snapshot_version)])
+    state = replay(objects, entries.get(scene_doc["_id"], []))
+    return {object_id: state[object_id] for object_id in object_ids if object_id in state}
+
+
+async def entries_since(db, scene_id: ObjectId, since: int, head: int) -> Optional[List[dict]]:
+    """Every op in (since, head], or None when the log no longer covers that range"""
+    if since > head:
+        return None
+    entries = [
+        entry async for entry in
+        db.scene_ops.find({"scene_id": scene_id, "version": {"$gt": since, "$lte": head}}).sort("version", 1)
+    ]
+    if len(entries) != head - since:
+        return None
+    return entries
+
+
+async def compact(db, scene_id: ObjectId) -> int:
+    """Fold pending ops into scenes.objects; returns the number of ops folded"""
+    scene_doc = await db.scenes.find_one({"_id": scene_id}, {"objects": 1, "snapshot_version": 1})
+    if not scene_doc:
+        return 0
+    snapshot_version = scene_doc.get("snapshot_version", 0)
+    entries = (await pending_entries(db, [(scene_id, snapshot_version)])).get(scene_id, [])
+    if not entries:
+        return 0
+
+    state = replay(scene_doc.get("objects", []), entries)
+    new_snapshot = entries[-1]["version"]
+    result = await db.scenes.update_one(
+        {"_id": scene_id, **_snapshot_filter(snapshot_version)},
+        {"$set": {"objects": list(state.values()), "snapshot_version": new_snapshot}}
+    )
+    if result.modified_count == 0:
+        # Another compactor got there first
+        return 0
+    await db.scene_ops.delete_many({"scene_id": scene_id, "version": {"$lte": new_snapshot - SCENE_OPS_RETAIN}})
+    return len(entries)
+
+
+class SceneCompactor:
+    """Compacts scenes edited on this instance in the background.
+
+    Appends only mark a scene dirty; a periodic sweep (or an immediate one
+    once a scene passes the threshold) rewrites its snapshot.
+    """
+
+    def __init__(self, interval: float, threshold: int):
+        self.interval = interval
+        self.threshold = threshold
+        self._dirty: Set[ObjectId] = set()
+        self._db = None
+        self._loop_task: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.compactions = 0
+        self.ops_folded = 0
+        self.failed = 0
+
+    def start(self, db):
+        self._db = db
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            await asyncio.gather(self._loop_task, return_exceptions=True)
+            self._loop_task = None
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.sweep()
+
+    def mark(self, scene_id: ObjectId, pending: int):
+        """Note an append; `pending` is how many ops now sit above the snapshot"""
+        self._dirty.add(scene_id)
+        if pending >= self.threshold and self._db is not None:
+            task = asyncio.create_task(self.compact(scene_id))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def compact(self, scene_id: ObjectId) -> int:
+        self._dirty.discard(scene_id)
+        try:
+            folded = await compact(self._db, scene_id)
+        except asyncio.CancelledError:
+            # Interrupted by stop(); leave it for the final sweep
+            self._dirty.add(scene_id)
+            raise
+        except Exception:
+            self.failed += 1
+            self._dirty.add(scene_id)
+            logger.exception("Failed to compact scene %s", scene_id)
+            return 0
+        if folded:
+            self.compactions += 1
+            self.ops_folded += folded
+        return folded
+
+    async def sweep(self):
+        if self._db is None:
+            return
+        for scene_id in list(self._dirty):
+            await self.compact(scene_id)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.sweep()
+
+    def stats(self) -> dict:
+        return {
+            "dirty_scenes": len(self._dirty),
+            "compactions": self.compactions,
+            "ops_folded": self.ops_folded,
+            "failed": self.failed,
+            "interval": self.interval,
+            "threshold": self.threshold,
+            "retain": SCENE_OPS_RETAIN,
+        }
+
+
+scene_compactor = SceneCompactor(SCENE_COMPACT_INTERVAL, SCENE_COMPACT_THRESHOLD)
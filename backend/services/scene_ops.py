@@ -0,0 +1,94 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from models.scene import SceneObjectOp
+
+
+class PatchError(ValueError):
+    pass
+
+
+@dataclass
+class PatchPlan:
+    removed: List[str] = field(default_factory=list)
+    updated: Dict[str, dict] = field(default_factory=dict)  # id -> merged field changes
+    added: List[dict] = field(default_factory=list)
+    # Full replacement of the objects array (legacy PUT); applied before anything else
+    replace: Optional[List[dict]] = None
+
+    @property
+    def touched_ids(self) -> List[str]:
+        return list(self.updated) + [obj["id"] for obj in self.added]
+
+    @property
+    def referenced_ids(self) -> List[str]:
+        return list(dict.fromkeys(self.removed + self.touched_ids))
+
+    def check(self, objects: Dict[str, dict]):
+        """Raise PatchError unless every op applies cleanly to `objects`"""
+        for object_id in self.removed + list(self.updated):
+            if object_id not in objects:
+                raise PatchError(f"Object {object_id} not found")
+        for obj in self.added:
+            if obj["id"] in objects and obj["id"] not in self.removed:
+                raise PatchError(f"Object {obj['id']} already exists")
+
+    def apply(self, objects: Dict[str, dict]) -> Dict[str, dict]:
+        """Apply to an id -> object mapping in place, in remove -> update -> add order.
+
+        Ops that target an id missing from `objects` are skipped, so a plan
+        can be replayed over a partial view of the scene.
+        """
+        if self.replace is not None:
+            objects.clear()
+            objects.update((obj["id"], dict(obj)) for obj in self.replace)
+        for object_id in self.removed:
+            objects.pop(object_id, None)
+        for object_id, changes in self.updated.items():
+            if object_id in objects:
+                objects[object_id] = {**objects[object_id], **changes}
+        for obj in self.added:
+            objects[obj["id"]] = dict(obj)
+        return objects
+
+    def to_entry(self) -> dict:
+        entry = {"removed": self.removed, "updated": self.updated, "added": self.added}
+        if self.replace is not None:
+            entry["replace"] = self.replace
+        return entry
+
+    @classmethod
+    def from_entry(cls, entry: dict) -> "PatchPlan":
+        return cls(
+            removed=entry.get("removed", []),
+            updated=entry.get("updated", {}),
+            added=entry.get("added", []),
+            replace=entry.get("replace")
+        )
+
+
+def plan_patch(ops: List[SceneObjectOp]) -> PatchPlan:
+    """Fold a list of ops into at most one remove, update and add per object"""
+    plan = PatchPlan()
+    added_ids = set()
+    for op in ops:
+        if op.op == "add":
+            object_id = op.object.id
+            if object_id in added_ids:
+                raise PatchError(f"Object {object_id} is added twice")
+            added_ids.add(object_id)
+            plan.added.append(op.object.dict())
+        elif op.op == "update":
+            if op.id in added_ids:
+                raise PatchError(f"Object {op.id} is updated in the patch that adds it")
+            plan.updated.setdefault(op.id, {}).update(op.changes.dict(exclude_unset=True))
+        else:
+            if op.id in added_ids or op.id in plan.updated:
+                raise PatchError(f"Object {op.id} is removed in the same patch that changes it")
+            if op.id not in plan.removed:
+                plan.removed.append(op.id)
+
+    # Removing and re-adding an id is allowed (replace); updating a removed one is not
+    for object_id in plan.updated:
+        if object_id in plan.removed:
+            raise PatchError(f"Object {object_id} is removed in the same patch that changes it")
+    return plan
@@ -0,0 +1,32 @@
+from typing import Any
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+import orjson
+
+
+def _default(value: Any):
+    # Response models built with model_construct hold plain, already
+    # JSON-shaped values, so their field dict can be emitted as is
+    if isinstance(value, BaseModel):
+        return value.__dict__
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    """Renders trusted payloads straight to JSON with orjson.
+
+    Returning a Response from a handler skips FastAPI's response_model
+    validation and jsonable_encoder pass, so only use this for data built
+    from our own documents via the models' from_doc constructors.
+    Datetimes and ObjectIds are emitted natively.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
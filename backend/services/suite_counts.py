@@ -0,0 +1,96 @@
+from typing import Dict, Iterable
+from pymongo import UpdateOne
+import logging
+
+logger = logging.getLogger(__name__)
+
+# One document per suite: {"_id": suite_id, "artwork_count": n}. Kept in step
+# with the artworks collection by $inc on upload/delete so reads never count.
+
+
+async def increment(db, suite_id: str, amount: int = 1):
+    await db.suite_stats.update_one(
+        {"_id": suite_id},
+        {"$inc": {"artwork_count": amount}},
+        upsert=True
+    )
+
+
+async def get_counts(db, suite_ids: Iterable[str]) -> Dict[str, int]:
+    suite_ids = list(suite_ids)
+    counts = dict.fromkeys(suite_ids, 0)
+    async for doc in db.suite_stats.find({"_id": {"$in": suite_ids}}):
+        counts[doc["_id"]] = max(doc.get("artwork_count", 0), 0)
+    return counts
+
+
+async def get_count(db, suite_id: str) -> int:
+    doc = await db.suite_stats.find_one({"_id": suite_id})
+    return max(doc.get("artwork_count", 0), 0) if doc else 0
+
+
+async def count_from_artworks(db) -> Dict[str, int]:
+    """Recount every suite's artworks in a single $group pass"""
+    pipeline = [{"$group": {"_id": "$suite_id", "artwork_count": {"$sum": 1}}}]
+    return {doc["_id"]: doc["artwork_count"] async for doc in db.artworks.aggregate(pipeline)}
+
+
+async def verify(db) -> Dict[str, dict]:
+    """Suites whose maintained counter disagrees with the artworks collection"""
+    actual = await count_from_artworks(db)
+    stored = {doc["_id"]: doc.get("artwork_count", 0) async for doc in db.suite_stats.find({})}
+    return {
+        suite_id: {"stored": stored.get(suite_id, 0), "actual": actual.get(suite_id, 0)}
+        for suite_id in set(actual) | set(stored)
+        if stored.get(suite_id, 0) != actual.get(suite_id, 0)
+    }
+
+
+async def rebuild(db) -> Dict[str, int]:
+    """Overwrite the maintained counters with freshly aggregated values"""
+    actual = await count_from_artworks(db)
+    stored_ids = [doc["_id"] async for doc in db.suite_stats.find({}, {"_id": 1})]
+    operations = [
+        UpdateOne({"_id": suite_id}, {"$set": {"artwork_count": actual.get(suite_id, 0)}}, upsert=True)
+        for suite_id in set(actual) | set(stored_ids)
+    ]
+    if operations:
+        await db.suite_stats.bulk_write(operations, ordered=False)
+    return actual
+
+
+async def bootstrap(db):
+    """Seed the counters from existing artworks the first time the app starts"""
+    if await db.suite_stats.find_one({}) is None:
+        counts = await rebuild(db)
+        logger.info("Initialised suite artwork counters: %s", counts)
+
+
+if __name__ == "__main__":
+    # python -m services.suite_counts [--rebuild]   (run from backend/)
+    import argparse
+    import asyncio
+    from pathlib import Path
+    from dotenv import load_dotenv
+    import database
+
+    parser = argparse.ArgumentParser(description="Verify or rebuild per-suite artwork counters")
+    parser.add_argument("--rebuild", action="store_true", help="overwrite counters with aggregated values")
+    args = parser.parse_args()
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+
+    async def main():
+        db = database.connect()
+        try:
+            mismatches = await verify(db)
+            for suite_id, counts in sorted(mismatches.items()):
+                print(f"{suite_id}: stored={counts['stored']} actual={counts['actual']}")
+            if not mismatches:
+                print("All suite counters match")
+            elif args.rebuild:
+                await rebuild(db)
+                print("Counters rebuilt")
+        finally:
+            database.close()
+
+    asyncio.run(main())
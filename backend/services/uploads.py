@@ -0,0 +1,233 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from pymongo import ReturnDocument
+import aiofiles
+import aiofiles.os
+import hashlib
+import os
+import re
+import uuid
+
+UPLOAD_DIR = os.environ.get("UPLOAD_DIR", "/app/uploads")
+
+# Read/write granularity; peak memory per upload stays around one chunk
+UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+
+MB = 1024 * 1024
+
+# Per artwork type size limits in bytes
+MAX_UPLOAD_SIZES = {
+    "painting": int(os.environ.get("MAX_UPLOAD_MB_PAINTING", 50)) * MB,
+    "photo": int(os.environ.get("MAX_UPLOAD_MB_PHOTO", 50)) * MB,
+    "music": int(os.environ.get("MAX_UPLOAD_MB_MUSIC", 300)) * MB,
+    "writing": int(os.environ.get("MAX_UPLOAD_MB_WRITING", 20)) * MB,
+    "sculpture": int(os.environ.get("MAX_UPLOAD_MB_SCULPTURE", 500)) * MB,
+}
+
+# Largest request body an upload route accepts: the biggest per-type limit
+# plus room for the other form fields and the multipart framing
+MAX_UPLOAD_REQUEST_SIZE = max(MAX_UPLOAD_SIZES.values()) + MB
+UPLOAD_PATH = re.compile(r"^/api/suites/[^/]+/artworks$")
+
+
+@dataclass
+class StoredUpload:
+    path: str
+    size: int
+    sha256: str
+    key: Optional[str] = None  # Content-addressed storage key, see store_upload()
+    deduplicated: bool = False
+
+    @property
+    def url(self) -> str:
+        return f"/uploads/{self.key}"
+
+
+async def stream_upload(file: UploadFile, dest_path: str, max_bytes: int,
+                        expected_sha256: Optional[str] = None) -> StoredUpload:
+    """Copy an upload to disk chunk by chunk, hashing as it goes.
+
+    The body is written to a temporary name and only renamed into place once
+    it is complete (and, if `expected_sha256` is given, matches it), so an
+    aborted, oversized or altered upload never leaves a file at `dest_path`.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large(max_bytes)
+
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    temp_path = f"{dest_path}.{uuid.uuid4().hex}.part"
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        async with aiofiles.open(temp_path, "wb") as f:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _too_large(max_bytes)
+                digest.update(chunk)
+                await f.write(chunk)
+        if expected_sha256 is not None and digest.hexdigest() != expected_sha256:
+            # The spooled body changed between passes; never file it under the wrong hash
+            raise HTTPException(status_code=400, detail="Upload changed while being stored")
+        await aiofiles.os.replace(temp_path, dest_path)
+    except BaseException:
+        try:
+            await aiofiles.os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+    return StoredUpload(path=dest_path, size=size, sha256=digest.hexdigest())
+
+
+async def hash_upload(file: UploadFile, max_bytes: int):
+    """Return (size, sha256) of an upload without writing it anywhere"""
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large(max_bytes)
+
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise _too_large(max_bytes)
+        digest.update(chunk)
+    await file.seek(0)
+    return size, digest.hexdigest()
+
+
+def storage_key(sha256: str, extension: str) -> str:
+    """Relative path of a blob: uploads are sharded by the first byte of their hash"""
+    extension = re.sub(r"[^A-Za-z0-9]", "", extension or "").lower()[:10]
+    filename = f"{sha256}.{extension}" if extension else sha256
+    return f"{sha256[:2]}/{filename}"
+
+
+async def store_upload(db, file: UploadFile, extension: str, max_bytes: int) -> StoredUpload:
+    """Store an upload content-addressed, sharing the file between identical uploads.
+
+    The body is hashed first straight from the request's spooled temp file.
+    When a blob with that hash is already on disk only its reference count is
+    bumped and nothing is written. Otherwise the body is streamed into place
+    first and the blob record created after, so a failed or oversized upload
+    never leaves a record behind.
+    """
+    size, sha256 = await hash_upload(file, max_bytes)
+    key = storage_key(sha256, extension)
+    path = os.path.join(UPLOAD_DIR, key)
+
+    blob = await db.upload_blobs.find_one_and_update(
+        {"_id": key, "refcount": {"$gt": 0}},
+        {"$inc": {"refcount": 1}},
+        return_document=ReturnDocument.AFTER
+    )
+    if blob is not None and await aiofiles.os.path.exists(path):
+        return StoredUpload(path=path, size=size, sha256=sha256, key=key, deduplicated=True)
+
+    try:
+        stored = await stream_upload(file, path, max_bytes, expected_sha256=sha256)
+    except BaseException:
+        if blob is not None:
+            await release_upload(db, key)
+        raise
+    stored.key = key
+    if blob is not None:
+        return stored
+
+    await db.upload_blobs.update_one(
+        {"_id": key},
+        {
+            "$inc": {"refcount": 1},
+            "$setOnInsert": {"sha256": sha256, "size": size, "created_at": datetime.utcnow()}
+        },
+        upsert=True
+    )
+    # A release of the previous record for this key may have unlinked the
+    # file between our write and the upsert; the new record needs it back
+    if not await aiofiles.os.path.exists(path):
+        await file.seek(0)
+        await stream_upload(file, path, max_bytes, expected_sha256=sha256)
+    return stored
+
+
+async def release_upload(db, key: str) -> bool:
+    """Drop one reference to a blob; the file is removed with the last one"""
+    blob = await db.upload_blobs.find_one_and_update(
+        {"_id": key},
+        {"$inc": {"refcount": -1}},
+        return_document=ReturnDocument.AFTER
+    )
+    if blob is None or blob["refcount"] > 0:
+        return False
+
+    result = await db.upload_blobs.delete_one({"_id": key, "refcount": {"$lte": 0}})
+    if not result.deleted_count:
+        return False
+    # The same content may have been uploaded again since the delete; its new
+    # record owns the file now (store_upload restores the file if this loses)
+    if await db.upload_blobs.find_one({"_id": key}, {"_id": 1}) is None:
+        try:
+            await aiofiles.os.remove(os.path.join(UPLOAD_DIR, key))
+        except FileNotFoundError:
+            pass
+        return True
+    return False
+
+
+class UploadSizeLimitMiddleware:
+    """Refuses oversized upload bodies before they are spooled.
+
+    Starlette reads and spools the whole multipart body before an upload
+    handler runs, so the per-type limit checked while streaming to disk
+    only keeps the final file in bounds. Here a Content-Length over
+    MAX_UPLOAD_REQUEST_SIZE is answered with 413 without reading the body,
+    and a body sent without one is cut off once it passes the limit.
+    """
+
+    def __init__(self, app, max_bytes: Optional[int] = None):
+        self.app = app
+        self.max_bytes = MAX_UPLOAD_REQUEST_SIZE if max_bytes is None else max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not UPLOAD_PATH.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            exc = _too_large(self.max_bytes)
+            response = JSONResponse({"detail": exc.detail}, status_code=exc.status_code,
+                                    headers={"connection": "close"})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside form parsing; FastAPI passes HTTPException through as the response
+                    raise _too_large(self.max_bytes)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File too large. Maximum size is {max_bytes // MB} MB"
+    )
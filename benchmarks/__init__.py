@@ -0,0 +1,9 @@
+import os
+import sys
+from pathlib import Path
+
+# Benchmarks import backend modules the same way the app does (backend/ on sys.path)
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
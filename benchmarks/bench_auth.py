@@ -0,0 +1,42 @@
+"""JWT issue/verify, principal lookup and bcrypt at the configured cost"""
+from bson import ObjectId
+from jose import jwt
+from mongomock_motor import AsyncMongoMockClient
+
+import database
+from auth import ALGORITHM, SECRET_KEY, authenticate_token, create_access_token, invalidate_user_principals
+from benchmarks.harness import Case
+from services.passwords import BCRYPT_ROUNDS, password_hasher
+
+USER_ID = ObjectId()
+TOKEN = create_access_token({"sub": str(USER_ID)})
+PASSWORD = "correct horse battery staple"
+stored_hash = {}
+
+
+async def seed_user():
+    database._db = AsyncMongoMockClient()["bench_auth"]
+    await database._db.users.insert_one({
+        "_id": USER_ID, "name": "Ann", "email": "ann@example.com", "password": "x"
+    })
+
+
+async def hash_password():
+    stored_hash["value"] = await password_hasher.hash(PASSWORD)
+
+
+def cases():
+    return [
+        Case("auth.jwt_encode", lambda: create_access_token({"sub": str(USER_ID)}), iterations=2000),
+        Case("auth.jwt_decode", lambda: jwt.decode(TOKEN, SECRET_KEY, algorithms=[ALGORITHM]), iterations=2000),
+        Case("auth.authenticate_token.cached", lambda: authenticate_token(TOKEN),
+             prepare=seed_user, iterations=2000, is_async=True),
+        # Invalidating before each call forces decode + users lookup + cache fill
+        Case("auth.authenticate_token.uncached", lambda _: authenticate_token(TOKEN),
+             setup=lambda: invalidate_user_principals(str(USER_ID)),
+             prepare=seed_user, iterations=500, is_async=True),
+        Case(f"auth.bcrypt_hash.rounds_{BCRYPT_ROUNDS}", lambda: password_hasher.hash(PASSWORD),
+             iterations=10, is_async=True),
+        Case(f"auth.bcrypt_verify.rounds_{BCRYPT_ROUNDS}", lambda: password_hasher.verify(PASSWORD, stored_hash["value"]),
+             prepare=hash_password, iterations=10, is_async=True),
+    ]
@@ -0,0 +1,99 @@
+"""Validation and JSON serialization for every pydantic model in backend/models"""
+import inspect
+from datetime import datetime
+
+from bson import ObjectId
+from pydantic import BaseModel
+
+from benchmarks.harness import Case
+from models import artwork, message, scene, user
+
+MODEL_MODULES = [artwork, message, scene, user]
+
+NOW = datetime(2024, 1, 1, 12, 0, 0, 123000)
+SCENE_OBJECT = {"id": "obj_1", "type": "desk", "position": {"x": 150.0, "y": 200.0}, "rotation": 0, "scale": 1, "z_index": 1}
+OBJECT_COUNT = 200
+
+# A representative payload per model, sized like production documents
+SAMPLES = {
+    "Artwork": {
+        "artist_id": "a", "suite_id": "suite-1", "title": "Pacific Dreams", "description": "x" * 120,
+        "type": "painting", "file_url": "/uploads/ab/ab.png", "mime_type": "image/png", "file_size": 2048000,
+        "metadata": {"variants": {"thumb": {"url": "/t.webp", "width": 256, "height": 256}}},
+        "tags": ["painting", "nature"], "likes": 3, "views": 40, "created_at": NOW, "updated_at": NOW,
+    },
+    "ArtworkResponse": {
+        "id": "a1", "artist_id": "a", "artist_name": "Ann", "suite_id": "suite-1", "title": "Pacific Dreams",
+        "type": "painting", "file_url": "/uploads/ab/ab.png", "mime_type": "image/png", "file_size": 2048000,
+        "metadata": {"variants": {"thumb": {"url": "/t.webp", "width": 256, "height": 256}}},
+        "tags": ["painting"], "created_at": NOW, "updated_at": NOW, "cursor": "abc",
+    },
+    "ArtworkCreate": {"title": "Forest Symphony", "description": "Ambient", "type": "music", "tags": ["music"]},
+    "ArtworkUpdate": {"title": "New title", "tags": ["a", "b"]},
+    "ArtworkLikeQuery": {"artwork_ids": [str(i) for i in range(50)]},
+    "SuiteInfo": {
+        "suite_name": "Suite", "room_number": "201", "artist_name": "Ann", "initials": "AN",
+        "room_key": "ROOM-201-AN", "door_color": "#FFD700", "personal_color": "#FFF8DC",
+        "last_seen": "Unknown", "artwork_count": 12,
+    },
+    "Message": {"_id": ObjectId(), "scene_id": ObjectId(), "sender": ObjectId(), "content": "Hello everyone!", "timestamp": NOW},
+    "MessageCreate": {"content": "Hello everyone!", "type": "text"},
+    "MessageResponse": {
+        "id": str(ObjectId()), "scene_id": str(ObjectId()), "content": "Hello everyone!", "type": "text",
+        "sender": {"id": str(ObjectId()), "name": "Ann", "email": "ann@example.com", "avatar": None},
+        "timestamp": NOW, "cursor": "abc",
+    },
+    "SceneObject": SCENE_OBJECT,
+    "Collaborator": {"user": ObjectId(), "permissions": ["view", "edit"], "invited_at": NOW, "status": "active"},
+    "Scene": {
+        "_id": ObjectId(), "name": "Office", "owner": ObjectId(),
+        "objects": [{**SCENE_OBJECT, "id": f"obj_{i}"} for i in range(OBJECT_COUNT)],
+        "collaborators": [{"user": ObjectId(), "status": "active", "invited_at": NOW} for _ in range(5)],
+        "version": 4, "snapshot_version": 4, "created_at": NOW, "updated_at": NOW,
+    },
+    "SceneCreate": {"name": "My Virtual Office", "description": "Cozy"},
+    "SceneUpdate": {"name": "Renamed", "objects": [{**SCENE_OBJECT, "id": f"obj_{i}"} for i in range(OBJECT_COUNT)]},
+    "SceneObjectChanges": {"position": {"x": 1.0, "y": 2.0}, "rotation": 90},
+    "SceneObjectOp": {"op": "update", "id": "obj_1", "changes": {"position": {"x": 1.0, "y": 2.0}}},
+    "ScenePatch": {"version": 4, "ops": [{"op": "update", "id": f"obj_{i}", "changes": {"rotation": i}} for i in range(20)]},
+    "ScenePatchResponse": {"version": 5, "objects": [SCENE_OBJECT] * 20, "removed": []},
+    "SceneOpEntry": {"version": 5, "user_id": str(ObjectId()), "updated": {"obj_1": {"rotation": 90}}, "created_at": NOW},
+    "SceneSyncResponse": {"version": 5, "ops": [{"version": 5, "added": [SCENE_OBJECT], "created_at": NOW}] * 10},
+    "SceneResponse": {
+        "id": str(ObjectId()), "name": "Office", "description": "", "background": "modern-office",
+        "objects": [{**SCENE_OBJECT, "id": f"obj_{i}"} for i in range(OBJECT_COUNT)],
+        "owner": str(ObjectId()), "collaborators": [], "is_public": False, "version": 4,
+        "created_at": NOW, "updated_at": NOW,
+    },
+    "SceneInvite": {"email": "colleague@example.com"},
+    "User": {"_id": ObjectId(), "name": "Ann", "email": "ann@example.com", "password": "$2b$12$" + "x" * 53,
+             "created_at": NOW, "last_seen": NOW},
+    "UserCreate": {"name": "Ann", "email": "ann@example.com", "password": "secret123"},
+    "UserLogin": {"email": "ann@example.com", "password": "secret123"},
+    "UserResponse": {"id": str(ObjectId()), "name": "Ann", "email": "ann@example.com", "created_at": NOW,
+                     "last_seen": NOW, "is_online": True},
+    "UserUpdate": {"name": "Ann B"},
+    "PresenceHeartbeat": {"suite_id": "suite-1"},
+}
+
+
+def models():
+    """Every BaseModel defined (not just imported) in the models package"""
+    found = {}
+    for module in MODEL_MODULES:
+        for name, obj in inspect.getmembers(module, inspect.isclass):
+            if issubclass(obj, BaseModel) and obj.__module__ == module.__name__:
+                found[name] = obj
+    return found
+
+
+def cases():
+    result = []
+    for name, model in sorted(models().items()):
+        if name not in SAMPLES:
+            raise KeyError(f"No benchmark sample for models.{name}; add one to SAMPLES")
+        sample = SAMPLES[name]
+        instance = model(**sample)
+        result.append(Case(f"models.{name}.validate", lambda model=model, sample=sample: model(**sample), iterations=1000))
+        result.append(Case(f"models.{name}.dump_json", instance.model_dump_json, iterations=1000))
+    return result
@@ -0,0 +1,203 @@
+"""Every HTTP route handler, called directly against a seeded in-memory Mongo.
+
+Handlers are awaited as plain coroutines with their dependencies passed in,
+so routing, request parsing and (for handlers that return models) FastAPI's
+response validation are not part of these numbers. mongomock is much slower
+than a real server per command; compare these between commits, not against
+production latencies.
+"""
+import io
+import itertools
+import tempfile
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+from starlette.datastructures import Headers, UploadFile
+
+import database
+from benchmarks.harness import Case
+from benchmarks.profiled_db import ProfiledDatabase
+from models.artwork import Artwork, ArtworkLikeQuery, ArtworkUpdate
+from models.message import MessageCreate
+from models.scene import Scene, SceneObject, Collaborator, SceneCreate, SceneUpdate, SceneInvite, ScenePatch
+from models.user import User, UserCreate, UserLogin, UserResponse, UserUpdate, PresenceHeartbeat
+from routes import artwork as artwork_routes, auth as auth_routes, messages as message_routes, scenes as scene_routes
+import server
+from services import suite_counts, uploads
+from services.index_manager import sync_indexes
+from services.passwords import password_hasher
+
+PASSWORD = "correct horse battery staple"
+SCENES = 20
+OBJECTS_PER_SCENE = 200
+COLLABORATORS = 5
+MESSAGES = 500
+ARTWORKS = 300
+_ids = itertools.count()
+
+
+class World:
+    """A colony's worth of users, scenes, messages and artworks"""
+
+    def __init__(self):
+        self.db = None
+        self.owner = None
+        self.scene_ids = []
+        self.artwork_ids = []
+
+    async def seed(self):
+        self.db = ProfiledDatabase(AsyncMongoMockClient()["bench_routes"])
+        database._db = self.db
+        uploads.UPLOAD_DIR = tempfile.mkdtemp(prefix="bench-uploads-")
+        artwork_routes.gallery_cache.clear()
+        await sync_indexes(self.db)
+
+        start = datetime(2024, 1, 1)
+        owner = User(name="Owner", email="owner@example.com", password=await password_hasher.hash(PASSWORD))
+        collaborators = [User(name=f"User {i}", email=f"user{i}@example.com", password="x") for i in range(COLLABORATORS)]
+        await self.db.users.insert_many([user.dict(by_alias=True) for user in [owner, *collaborators]])
+        self.owner = UserResponse.from_user(owner)
+
+        scenes = [
+            Scene(
+                name=f"Scene {i}", owner=owner.id,
+                objects=[SceneObject(id=f"obj_{j}", type="desk", position={"x": j, "y": j}) for j in range(OBJECTS_PER_SCENE)],
+                collaborators=[Collaborator(user=user.id, status="active") for user in collaborators]
+            )
+            for i in range(SCENES)
+        ]
+        await self.db.scenes.insert_many([scene.dict(by_alias=True) for scene in scenes])
+        self.scene_ids = [str(scene.id) for scene in scenes]
+
+        await self.db.messages.insert_many([
+            {"_id": ObjectId(), "scene_id": scenes[0].id, "sender": (owner if i % 2 else collaborators[0]).id,
+             "content": f"message {i}", "type": "text", "timestamp": start + timedelta(seconds=i)}
+            for i in range(MESSAGES)
+        ])
+
+        artworks = [
+            Artwork(artist_id=self.owner.id, suite_id=f"suite-{i % 5 + 1}", title=f"Artwork {i}", type="painting",
+                    file_url=f"/uploads/{i}.png", mime_type="image/png", file_size=1000, likes=i % 7, views=i,
+                    created_at=start + timedelta(minutes=i))
+            for i in range(ARTWORKS)
+        ]
+        await self.db.artworks.insert_many([artwork.dict() for artwork in artworks])
+        self.artwork_ids = [artwork.id for artwork in artworks]
+        await suite_counts.rebuild(self.db)
+
+    def scene_id(self) -> str:
+        return self.scene_ids[0]
+
+    async def scene_version(self) -> int:
+        doc = await self.db.scenes.find_one({"_id": ObjectId(self.scene_id())}, {"version": 1})
+        return doc.get("version", 0)
+
+    async def new_scene(self) -> str:
+        result = await self.db.scenes.insert_one(Scene(name="Scratch", owner=ObjectId(self.owner.id)).dict(by_alias=True))
+        return str(result.inserted_id)
+
+    async def new_user_email(self) -> str:
+        email = f"invitee{next(_ids)}@example.com"
+        await self.db.users.insert_one(User(name="Invitee", email=email, password="x").dict(by_alias=True))
+        return email
+
+    async def new_artwork(self) -> str:
+        artwork = Artwork(artist_id=self.owner.id, suite_id="suite-1", title="Scratch", type="painting",
+                          file_url="/uploads/scratch.png", mime_type="image/png", file_size=1)
+        await self.db.artworks.insert_one(artwork.dict())
+        return artwork.id
+
+    async def unliked_artwork(self) -> str:
+        artwork_id = self.artwork_ids[next(_ids) % ARTWORKS]
+        await self.db.artwork_likes.delete_one({"artwork_id": artwork_id, "user_id": self.owner.id})
+        return artwork_id
+
+    async def liked_artwork(self) -> str:
+        artwork_id = self.artwork_ids[next(_ids) % ARTWORKS]
+        await self.db.artwork_likes.update_one(
+            {"artwork_id": artwork_id, "user_id": self.owner.id},
+            {"$setOnInsert": {"created_at": datetime.utcnow()}}, upsert=True
+        )
+        return artwork_id
+
+
+def upload_file() -> UploadFile:
+    body = f"ID3 bench upload {next(_ids)}".encode() * 512
+    return UploadFile(io.BytesIO(body), size=len(body), filename="track.mp3",
+                      headers=Headers({"content-type": "audio/mpeg"}))
+
+
+def cases():
+    w = World()
+
+    def route(name, fn, setup=None, iterations=200):
+        return Case(f"routes.{name}", fn, setup=setup, prepare=w.seed, iterations=iterations, is_async=True)
+
+    def clear_gallery_cache():
+        artwork_routes.gallery_cache.clear()
+
+    async def patch_for_current_version():
+        return ScenePatch(version=await w.scene_version(), ops=[
+            {"op": "update", "id": f"obj_{next(_ids) % OBJECTS_PER_SCENE}", "changes": {"rotation": 90}}
+        ])
+
+    # bcrypt dominates these two, so fewer iterations
+    return [
+        route("auth.register_user", lambda data: auth_routes.register_user(data, db=w.db),
+              setup=lambda: UserCreate(name="New", email=f"new{next(_ids)}@example.com", password=PASSWORD), iterations=10),
+        route("auth.login_user", lambda: auth_routes.login_user(UserLogin(email="owner@example.com", password=PASSWORD), db=w.db),
+              iterations=10),
+        route("auth.get_user_profile", lambda: auth_routes.get_user_profile(current_user=w.owner)),
+        route("auth.heartbeat", lambda: auth_routes.heartbeat(PresenceHeartbeat(suite_id="suite-1"), current_user=w.owner)),
+        route("auth.update_user_profile", lambda: auth_routes.update_user_profile(UserUpdate(name="Owner"), current_user=w.owner, db=w.db)),
+        route("auth.logout_user", lambda: auth_routes.logout_user(current_user=w.owner)),
+
+        route("scenes.create_scene", lambda: scene_routes.create_scene(SceneCreate(name="New"), current_user=w.owner, db=w.db)),
+        route("scenes.get_user_scenes", lambda: scene_routes.get_user_scenes(current_user=w.owner, db=w.db, include_shared=True),
+              iterations=50),
+        route("scenes.get_scene", lambda: scene_routes.get_scene(w.scene_id(), current_user=w.owner, db=w.db)),
+        route("scenes.update_scene", lambda: scene_routes.update_scene(w.scene_id(), SceneUpdate(name="Renamed"), current_user=w.owner, db=w.db)),
+        route("scenes.patch_scene_objects", lambda patch: scene_routes.patch_scene_objects(w.scene_id(), patch, current_user=w.owner, db=w.db),
+              setup=patch_for_current_version),
+        route("scenes.sync_scene", lambda: scene_routes.sync_scene(w.scene_id(), since=None, current_user=w.owner, db=w.db)),
+        route("scenes.delete_scene", lambda scene_id: scene_routes.delete_scene(scene_id, current_user=w.owner, db=w.db),
+              setup=w.new_scene),
+        route("scenes.invite_user_to_scene",
+              lambda email: scene_routes.invite_user_to_scene(w.scene_ids[1], SceneInvite(email=email), current_user=w.owner, db=w.db),
+              setup=w.new_user_email),
+
+        route("messages.get_scene_messages", lambda: message_routes.get_scene_messages(
+            w.scene_id(), current_user=w.owner, db=w.db, limit=50, skip=0, before=None, after=None)),
+        route("messages.send_message", lambda: message_routes.send_message(
+            w.scene_id(), MessageCreate(content="hello"), current_user=w.owner, db=w.db)),
+
+        route("artwork.get_all_suites", lambda: artwork_routes.get_all_suites(db=w.db)),
+        route("artwork.get_suite_info", lambda: artwork_routes.get_suite_info("suite-1", db=w.db)),
+        route("artwork.get_suite_artworks.uncached", lambda _: artwork_routes.get_suite_artworks(
+            "suite-1", current_user=w.owner, db=w.db, sort=artwork_routes.GallerySort.newest, limit=50, after=None),
+            setup=clear_gallery_cache),
+        route("artwork.get_public_gallery.uncached", lambda _: artwork_routes.get_public_gallery(
+            db=w.db, sort=artwork_routes.GallerySort.most_liked, limit=50, after=None),
+            setup=clear_gallery_cache),
+        route("artwork.get_public_gallery.cached", lambda: artwork_routes.get_public_gallery(
+            db=w.db, sort=artwork_routes.GallerySort.newest, limit=50, after=None)),
+        route("artwork.upload_artwork", lambda file: artwork_routes.upload_artwork(
+            "suite-2", file=file, title="Track", description=None, artwork_type="music", tags='["ambient"]',
+            is_public=True, current_user=w.owner, db=w.db), setup=upload_file, iterations=100),
+        route("artwork.get_artwork", lambda: artwork_routes.get_artwork(w.artwork_ids[0], db=w.db)),
+        route("artwork.update_artwork", lambda: artwork_routes.update_artwork(
+            w.artwork_ids[1], ArtworkUpdate(title="Retitled"), current_user=w.owner, db=w.db)),
+        route("artwork.delete_artwork", lambda artwork_id: artwork_routes.delete_artwork(artwork_id, current_user=w.owner, db=w.db),
+              setup=w.new_artwork),
+        route("artwork.get_liked_artworks", lambda: artwork_routes.get_liked_artworks(
+            ArtworkLikeQuery(artwork_ids=w.artwork_ids[:100]), current_user=w.owner, db=w.db)),
+        route("artwork.like_artwork", lambda artwork_id: artwork_routes.like_artwork(artwork_id, current_user=w.owner, db=w.db),
+              setup=w.unliked_artwork),
+        route("artwork.unlike_artwork", lambda artwork_id: artwork_routes.unlike_artwork(artwork_id, current_user=w.owner, db=w.db),
+              setup=w.liked_artwork),
+
+        route("server.create_status_check", lambda: server.create_status_check(
+            server.StatusCheckCreate(client_name="bench"), db=w.db)),
+        route("server.get_status_checks", lambda: server.get_status_checks(db=w.db), iterations=50),
+    ]
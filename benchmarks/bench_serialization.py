@@ -0,0 +1,114 @@
+"""Per-document cost of building and serializing read responses.
+
+Compares the validated path (Model(**doc) -> Response.from_x -> FastAPI's
+response_model validation -> json.dumps) with the trusted path
+(Response.from_doc -> orjson) on a large gallery page and a large scene.
+
+    python benchmarks/bench_serialization.py [--artworks 200] [--objects 2000]
+"""
+import argparse
+import json
+import sys
+import timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import benchmarks  # noqa: E402,F401  (puts backend/ on sys.path)
+
+from bson import ObjectId  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from benchmarks.harness import Case  # noqa: E402
+from models.artwork import Artwork, ArtworkResponse  # noqa: E402
+from models.scene import Scene, SceneObject, Collaborator, SceneResponse  # noqa: E402
+from services.serialization import dumps  # noqa: E402
+
+
+def artwork_docs(count: int) -> List[dict]:
+    start = datetime(2024, 1, 1)
+    docs = []
+    for i in range(count):
+        doc = Artwork(
+            artist_id=str(ObjectId()), suite_id="suite-1", title=f"Artwork {i}", description="x" * 120,
+            type="painting", file_url=f"/uploads/{i}.png", mime_type="image/png", file_size=2_000_000,
+            metadata={"variants": {name: {"url": f"/uploads/{i}_{name}.webp", "width": 256, "height": 256}
+                                   for name in ("thumb", "medium", "texture")}},
+            tags=["painting", "nature"], likes=i, views=i * 10, created_at=start + timedelta(minutes=i)
+        ).dict()
+        docs.append(doc)
+    return docs
+
+
+def scene_doc(object_count: int) -> dict:
+    return Scene(
+        name="Office", owner=ObjectId(),
+        objects=[SceneObject(id=f"obj_{i}", type="desk", position={"x": i, "y": i / 2}, z_index=i % 5)
+                 for i in range(object_count)],
+        collaborators=[Collaborator(user=ObjectId(), status="active") for _ in range(10)]
+    ).dict(by_alias=True)
+
+
+def fastapi_serialize(adapter: TypeAdapter, content) -> bytes:
+    # What FastAPI does with a response_model: dump, re-validate, dump to JSON types, encode
+    if isinstance(content, list):
+        prepared = [item.model_dump() for item in content]
+    else:
+        prepared = content.model_dump()
+    value = adapter.validate_python(prepared)
+    return json.dumps(adapter.dump_python(value, mode="json")).encode()
+
+
+def comparisons(artwork_count: int, object_count: int):
+    artworks = artwork_docs(artwork_count)
+    gallery_adapter = TypeAdapter(List[ArtworkResponse])
+    scene = scene_doc(object_count)
+    scene_adapter = TypeAdapter(SceneResponse)
+
+    yield (
+        f"gallery page ({artwork_count} artworks)", artwork_count,
+        lambda: fastapi_serialize(gallery_adapter, [
+            ArtworkResponse.from_artwork(Artwork(**doc), "Ann") for doc in artworks
+        ]),
+        lambda: dumps([ArtworkResponse.from_doc(doc, "Ann") for doc in artworks])
+    )
+    yield (
+        f"scene ({object_count} objects)", object_count,
+        lambda: fastapi_serialize(scene_adapter, SceneResponse.from_scene(Scene(**scene), "Ann", [])),
+        lambda: dumps(SceneResponse.from_scene(Scene.from_doc(scene), "Ann", []))
+    )
+
+
+def cases():
+    """The same comparisons as whole-payload cases for benchmarks.run"""
+    result = []
+    for name, _, before, after in comparisons(200, 2000):
+        key = name.split(" ")[0]
+        result.append(Case(f"serialization.{key}.validated", before, iterations=20))
+        result.append(Case(f"serialization.{key}.trusted", after, iterations=20))
+    return result
+
+
+def measure(fn, repeat: int) -> float:
+    number = 5
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--artworks", type=int, default=200)
+    parser.add_argument("--objects", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'payload':32} {'validated':>14} {'trusted':>14} {'speedup':>8}")
+    for name, documents, before, after in comparisons(args.artworks, args.objects):
+        slow = measure(before, args.repeat) / documents * 1e6
+        fast = measure(after, args.repeat) / documents * 1e6
+        print(f"{name:32} {slow:10.2f} us/doc {fast:10.2f} us/doc {slow / fast:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
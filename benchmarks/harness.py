@@ -0,0 +1,127 @@
+import asyncio
+import gc
+import statistics
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, List, Optional
+
+from services import query_profiler
+
+
+@dataclass
+class Case:
+    """One measured operation.
+
+    `prepare` runs once on the benchmark's event loop before anything is
+    timed (seeding a database, say). `setup` runs before every iteration,
+    untimed, and its return value is passed to `fn`. Async cases run all
+    of their iterations on that same loop.
+    """
+    name: str
+    fn: Callable[..., Any]
+    setup: Optional[Callable[[], Any]] = None
+    prepare: Optional[Callable[[], Awaitable[Any]]] = None
+    iterations: int = 200
+    is_async: bool = False
+
+
+@dataclass
+class Result:
+    name: str
+    iterations: int
+    mean_us: float
+    p50_us: float
+    p95_us: float
+    p99_us: float
+    max_us: float
+    ops_per_sec: float
+    # tracemalloc, averaged per call: peak bytes above the starting point and bytes still held afterwards
+    alloc_peak_bytes: int
+    alloc_retained_bytes: int
+    # MongoDB commands per call (cases run against a ProfiledDatabase) and the
+    # most times any single query shape was repeated within one call
+    db_queries: float = 0.0
+    db_max_repeats: int = 0
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(name: str, timings_ns: List[int], peaks: List[int], retained: List[int],
+              tallies: List[query_profiler.RequestTally] = ()) -> Result:
+    values = sorted(t / 1000 for t in timings_ns)
+    mean = statistics.fmean(values)
+    return Result(
+        name=name,
+        iterations=len(values),
+        mean_us=round(mean, 3),
+        p50_us=round(percentile(values, 0.50), 3),
+        p95_us=round(percentile(values, 0.95), 3),
+        p99_us=round(percentile(values, 0.99), 3),
+        max_us=round(values[-1], 3),
+        ops_per_sec=round(1e6 / mean, 1) if mean else 0.0,
+        alloc_peak_bytes=int(statistics.fmean(peaks)) if peaks else 0,
+        alloc_retained_bytes=int(statistics.fmean(retained)) if retained else 0,
+        db_queries=round(statistics.fmean(t.commands for t in tallies), 2) if tallies else 0.0,
+        db_max_repeats=max((count for t in tallies for count in t.shapes.values()), default=0),
+    )
+
+
+async def _once(case: Case, track_memory: bool = False):
+    """Run one iteration; returns (nanoseconds, peak bytes, retained bytes, query tally) for `fn` alone"""
+    args = ()
+    if case.setup is not None:
+        prepared = case.setup()
+        if asyncio.iscoroutine(prepared):
+            prepared = await prepared
+        args = (prepared,)
+
+    tally, token = query_profiler.begin(profile=True)
+    if track_memory:
+        gc.collect()
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+    try:
+        start = time.perf_counter_ns()
+        result = case.fn(*args)
+        if case.is_async:
+            await result
+        elapsed = time.perf_counter_ns() - start
+    finally:
+        query_profiler.end(token)
+    if not track_memory:
+        return elapsed, 0, 0, tally
+    after, peak = tracemalloc.get_traced_memory()
+    return elapsed, peak - before, max(0, after - before), tally
+
+
+async def _run_case(case: Case, iterations: int, alloc_iterations: int) -> Result:
+    if case.prepare is not None:
+        await case.prepare()
+
+    # Warm up caches, imports and lazily created pools
+    for _ in range(min(5, iterations)):
+        await _once(case)
+
+    gc.collect()
+    runs = [await _once(case) for _ in range(iterations)]
+
+    # Allocation pass kept separate; tracemalloc slows everything down
+    tracemalloc.start()
+    try:
+        samples = [await _once(case, track_memory=True) for _ in range(alloc_iterations)]
+    finally:
+        tracemalloc.stop()
+
+    return summarize(case.name, [r[0] for r in runs], [s[1] for s in samples], [s[2] for s in samples],
+                     [r[3] for r in runs])
+
+
+def run_case(case: Case, scale: float = 1.0, alloc_iterations: int = 20) -> Result:
+    iterations = max(1, int(case.iterations * scale))
+    return asyncio.run(_run_case(case, iterations, min(alloc_iterations, iterations)))
@@ -0,0 +1,440 @@
+"""Replay artist-colony sessions against the backend and report per-endpoint latency.
+
+Each virtual user repeatedly runs a session: log in, list scenes, browse the
+suites and galleries, open their own scene and the shared commons chat, then
+perform a weighted mix of actions (poll or post chat, drag objects with
+PUT /scenes/{id}, upload artworks, browse galleries, heartbeat) with think
+time between requests, and log out.
+
+The database is always a seeded in-memory mongomock, never a real server.
+By default the app runs in this process behind httpx's ASGI transport, so
+client and server share one event loop. For numbers closer to one real
+worker, start the app on its own and point the driver at it:
+
+    python -m benchmarks.load --serve --port 8001 --users 50
+    python -m benchmarks.load --url http://127.0.0.1:8001 --users 50 --duration 60
+
+Both sides must be given the same --users so the seeded accounts exist.
+Every login pays for a bcrypt verify; set BCRYPT_ROUNDS on the server side
+to take that out of the picture.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import benchmarks  # noqa: F401  (puts backend/ on sys.path)
+
+import httpx
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+import database
+from benchmarks.harness import percentile
+from benchmarks.profiled_db import ProfiledDatabase
+from models.artwork import Artwork
+from models.scene import Scene, SceneObject, Collaborator
+from models.user import User
+from routes.artwork import ARTIST_SUITES
+from services import query_profiler
+from services.passwords import password_hasher
+
+PASSWORD = "colony-load-test"
+COMMONS = "Commons"
+SUITE_IDS = list(ARTIST_SUITES)
+SORTS = ["newest", "most_liked", "most_viewed"]
+DEFAULT_MIX = "poll=8,chat=2,drag=5,gallery=2,heartbeat=1,upload=1"
+
+
+def artist_email(index: int) -> str:
+    return f"artist{index}@example.com"
+
+
+# --- Seeding ---------------------------------------------------------------
+
+async def seed(db, users: int, objects: int, messages: int, artworks: int):
+    """Artists with a scene each, a commons scene everyone shares, chat history and a gallery"""
+    start = datetime.utcnow() - timedelta(days=30)
+    password = await password_hasher.hash(PASSWORD)
+    artists = [User(name=f"Artist {i}", email=artist_email(i), password=password) for i in range(users)]
+    await db.users.insert_many([artist.dict(by_alias=True) for artist in artists])
+
+    def furniture():
+        return [SceneObject(id=f"obj_{j}", type="easel", position={"x": j * 10, "y": j * 5}) for j in range(objects)]
+
+    scenes = [Scene(name=f"Studio {i}", owner=artist.id, objects=furniture()) for i, artist in enumerate(artists)]
+    commons = Scene(
+        name=COMMONS, owner=artists[0].id, objects=furniture(),
+        collaborators=[Collaborator(user=artist.id, status="active") for artist in artists[1:]]
+    )
+    await db.scenes.insert_many([scene.dict(by_alias=True) for scene in [*scenes, commons]])
+
+    if messages:
+        await db.messages.insert_many([
+            {"_id": ObjectId(), "scene_id": commons.id, "sender": artists[i % users].id,
+             "content": f"message {i}", "type": "text", "timestamp": start + timedelta(minutes=i)}
+            for i in range(messages)
+        ])
+    if artworks:
+        await db.artworks.insert_many([
+            Artwork(artist_id=str(artists[i % users].id), suite_id=SUITE_IDS[i % len(SUITE_IDS)],
+                    title=f"Piece {i}", type="painting", file_url=f"/uploads/seed-{i}.png",
+                    mime_type="image/png", file_size=100_000, likes=i % 13, views=i * 3,
+                    created_at=start + timedelta(hours=i)).dict()
+            for i in range(artworks)
+        ])
+
+
+def install_stand_in(app, args):
+    """Point the app at a fresh mongomock database, seeded before the app's own startup runs"""
+    import tempfile
+    from services import uploads
+
+    database._client = AsyncMongoMockClient()
+    database._db = ProfiledDatabase(database._client[database.DEFAULT_DB_NAME])
+    # Read by the metrics middleware when the app first handles a request
+    query_profiler.DB_PROFILE = args.db_profile
+    uploads.UPLOAD_DIR = tempfile.mkdtemp(prefix="colony-uploads-")
+    app_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def seeded_lifespan(app):
+        await seed(database._db, args.users, args.objects, args.messages, args.artworks)
+        async with app_lifespan(app) as state:
+            yield state
+
+    app.router.lifespan_context = seeded_lifespan
+    return seeded_lifespan
+
+
+# --- Think time and action mix ---------------------------------------------
+
+def think_time(spec: str) -> Callable[[random.Random], float]:
+    """Parse "exp:MEAN", "uniform:LOW:HIGH", "const:SECONDS" or a bare number of seconds"""
+    kind, _, rest = spec.partition(":")
+    try:
+        if not rest:
+            value = float(kind)
+            return lambda rng: value
+        params = [float(p) for p in rest.split(":")]
+        if kind == "exp":
+            return lambda rng: rng.expovariate(1 / params[0]) if params[0] > 0 else 0.0
+        if kind == "uniform":
+            return lambda rng: rng.uniform(params[0], params[1])
+        if kind == "const":
+            return lambda rng: params[0]
+    except (ValueError, IndexError):
+        pass
+    raise argparse.ArgumentTypeError(f"Invalid think time {spec!r}")
+
+
+def action_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ACTIONS:
+            raise argparse.ArgumentTypeError(f"Unknown action {name!r}; choose from {', '.join(ACTIONS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+# --- Recording -------------------------------------------------------------
+
+@dataclass
+class Stats:
+    latencies: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    queries: Dict[str, List[int]] = field(default_factory=lambda: defaultdict(list))
+    errors: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    error_samples: Dict[str, str] = field(default_factory=dict)
+    sessions: int = 0
+    bytes_received: int = 0
+
+    def record(self, label: str, seconds: float, error: Optional[str], size: int = 0, queries: Optional[str] = None):
+        self.latencies[label].append(seconds * 1000)
+        if queries is not None:
+            self.queries[label].append(int(queries))
+        self.bytes_received += size
+        if error is not None:
+            self.errors[label] += 1
+            self.error_samples.setdefault(label, error)
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for label in sorted(self.latencies):
+            values = sorted(self.latencies[label])
+            endpoints[label] = {
+                "requests": len(values),
+                "errors": self.errors.get(label, 0),
+                "rps": round(len(values) / elapsed, 2),
+                "mean_ms": round(statistics.fmean(values), 2),
+                "p50_ms": round(percentile(values, 0.50), 2),
+                "p95_ms": round(percentile(values, 0.95), 2),
+                "p99_ms": round(percentile(values, 0.99), 2),
+                "max_ms": round(values[-1], 2),
+                "db_queries": round(statistics.fmean(self.queries[label]), 2) if self.queries.get(label) else None,
+            }
+        total = sum(len(v) for v in self.latencies.values())
+        errors = sum(self.errors.values())
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "sessions": self.sessions,
+            "requests": total,
+            "errors": errors,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "rps": round(total / elapsed, 2) if elapsed else 0.0,
+            "bytes_received": self.bytes_received,
+            "endpoints": endpoints,
+            "error_samples": dict(self.error_samples),
+        }
+
+
+# --- Sessions --------------------------------------------------------------
+
+class Artist:
+    """One virtual user; state carried between requests of a session"""
+
+    def __init__(self, index: int, client: httpx.AsyncClient, stats: Stats, args):
+        self.index = index
+        self.client = client
+        self.stats = stats
+        self.args = args
+        self.rng = random.Random(args.seed * 100_003 + index)
+        self.headers = {}
+        self.studio = None
+        self.commons_id = None
+        self.cursor = None
+
+    async def request(self, label: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=self.headers, **kwargs)
+        except Exception as exc:
+            self.stats.record(label, time.perf_counter() - started, f"{type(exc).__name__}: {exc}")
+            return None
+        error = None if response.status_code < 400 else f"{response.status_code} {response.text[:200]}"
+        self.stats.record(label, time.perf_counter() - started, error, len(response.content),
+                          response.headers.get("x-db-queries"))
+        return response if error is None else None
+
+    async def think(self):
+        delay = self.args.think(self.rng)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def session(self):
+        self.headers = {}
+        response = await self.request("POST /api/auth/login", "POST", "/api/auth/login",
+                                      json={"email": artist_email(self.index), "password": PASSWORD})
+        if response is None:
+            return
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        self.stats.sessions += 1
+
+        await self.think()
+        response = await self.request("GET /api/scenes/", "GET", "/api/scenes/")
+        if response is None:
+            return
+        scenes = response.json()
+        studio_id = next((s["id"] for s in scenes if s["name"] != COMMONS), None)
+        self.commons_id = next((s["id"] for s in scenes if s["name"] == COMMONS), None)
+
+        await self.think()
+        await self.request("GET /api/suites", "GET", "/api/suites")
+        await self.gallery()
+
+        if studio_id is not None:
+            await self.think()
+            response = await self.request("GET /api/scenes/{id}", "GET", f"/api/scenes/{studio_id}")
+            self.studio = response.json() if response is not None else None
+        if self.commons_id is not None:
+            await self.think()
+            await self.poll(initial=True)
+
+        actions, weights = zip(*self.args.mix.items())
+        for _ in range(self.args.actions):
+            await self.think()
+            await ACTIONS[self.rng.choices(actions, weights)[0]](self)
+
+        await self.request("POST /api/auth/logout", "POST", "/api/auth/logout")
+
+    async def poll(self, initial: bool = False):
+        if self.commons_id is None:
+            return
+        params = {"limit": 50}
+        if self.cursor and not initial:
+            params["after"] = self.cursor
+        response = await self.request("GET /api/scenes/{id}/messages", "GET",
+                                      f"/api/scenes/{self.commons_id}/messages", params=params)
+        if response is not None:
+            page = response.json()
+            if page:
+                self.cursor = max((m for m in page if m.get("cursor")), key=lambda m: m["timestamp"],
+                                  default={"cursor": self.cursor})["cursor"]
+
+    async def chat(self):
+        if self.commons_id is None:
+            return
+        await self.request("POST /api/scenes/{id}/messages", "POST", f"/api/scenes/{self.commons_id}/messages",
+                           json={"content": f"artist {self.index} says hi #{self.rng.randrange(10**6)}"})
+
+    async def drag(self):
+        if not self.studio or not self.studio.get("objects"):
+            return
+        dragged = self.rng.choice(self.studio["objects"])
+        dragged["position"] = {"x": self.rng.uniform(0, 1000), "y": self.rng.uniform(0, 800)}
+        response = await self.request("PUT /api/scenes/{id}", "PUT", f"/api/scenes/{self.studio['id']}",
+                                      json={"objects": self.studio["objects"]})
+        if response is not None:
+            self.studio = response.json()
+
+    async def gallery(self):
+        sort = self.rng.choice(SORTS)
+        if self.rng.random() < 0.5:
+            await self.request("GET /api/public-gallery", "GET", "/api/public-gallery", params={"sort": sort})
+        else:
+            suite = self.rng.choice(SUITE_IDS)
+            await self.request("GET /api/suites/{id}/artworks", "GET", f"/api/suites/{suite}/artworks",
+                               params={"sort": sort})
+
+    async def heartbeat(self):
+        await self.request("POST /api/auth/heartbeat", "POST", "/api/auth/heartbeat",
+                           json={"suite_id": self.rng.choice(SUITE_IDS)})
+
+    async def upload(self):
+        body = b"ID3" + self.rng.randbytes(self.args.upload_kb * 1024)
+        await self.request(
+            "POST /api/suites/{id}/artworks", "POST", f"/api/suites/{self.rng.choice(SUITE_IDS)}/artworks",
+            data={"title": f"Jam {self.rng.randrange(10**6)}", "artwork_type": "music", "tags": '["live"]'},
+            files={"file": ("jam.mp3", body, "audio/mpeg")}
+        )
+
+    async def run(self, deadline: float, ramp_delay: float):
+        await asyncio.sleep(ramp_delay)
+        while time.monotonic() < deadline:
+            await self.session()
+
+
+ACTIONS = {
+    "poll": Artist.poll,
+    "chat": Artist.chat,
+    "drag": Artist.drag,
+    "gallery": Artist.gallery,
+    "heartbeat": Artist.heartbeat,
+    "upload": Artist.upload,
+}
+
+
+# --- Driver ----------------------------------------------------------------
+
+async def drive(client: httpx.AsyncClient, args) -> dict:
+    stats = Stats()
+    started = time.monotonic()
+    deadline = started + args.ramp_up + args.duration
+    artists = [Artist(i, client, stats, args) for i in range(args.users)]
+    tasks = [
+        asyncio.create_task(artist.run(deadline, args.ramp_up * i / max(1, args.users)))
+        for i, artist in enumerate(artists)
+    ]
+    # Sessions in flight at the deadline are allowed to finish
+    await asyncio.gather(*tasks)
+    return stats.report(time.monotonic() - started)
+
+
+async def run_in_process(args) -> dict:
+    import server
+
+    lifespan = install_stand_in(server.app, args)
+    async with lifespan(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://colony", timeout=args.timeout) as client:
+            return await drive(client, args)
+
+
+async def run_remote(args) -> dict:
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        return await drive(client, args)
+
+
+def serve(args):
+    import uvicorn
+    import server
+
+    install_stand_in(server.app, args)
+    uvicorn.run(server.app, host=args.host, port=args.port, log_level="warning")
+
+
+def print_report(report: dict):
+    print(f"\n{report['sessions']} sessions, {report['requests']} requests in {report['elapsed_s']}s: "
+          f"{report['rps']} req/s, error rate {report['error_rate']:.2%}")
+    print(f"\n{'endpoint':36} {'reqs':>7} {'errs':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'max ms':>9} {'queries':>8}")
+    for label, row in report["endpoints"].items():
+        print(f"{label:36} {row['requests']:7d} {row['errors']:6d} {row['rps']:8.1f} "
+              f"{row['p50_ms']:9.1f} {row['p95_ms']:9.1f} {row['p99_ms']:9.1f} {row['max_ms']:9.1f} "
+              f"{'-' if row['db_queries'] is None else row['db_queries']:>8}")
+    for label, sample in report["error_samples"].items():
+        print(f"  first error on {label}: {sample}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual artists")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to keep starting sessions after ramp-up")
+    parser.add_argument("--ramp-up", type=float, default=5, help="seconds over which users start")
+    parser.add_argument("--think", type=think_time, default=think_time("exp:1.0"),
+                        help="pause between requests: exp:MEAN, uniform:LOW:HIGH, const:S or S (default exp:1.0)")
+    parser.add_argument("--actions", type=int, default=20, help="actions per session before logging out")
+    parser.add_argument("--mix", type=action_mix, default=action_mix(DEFAULT_MIX),
+                        help=f"weighted action mix (default {DEFAULT_MIX})")
+    parser.add_argument("--upload-kb", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--db-profile", action="store_true",
+                        help="profile queries in the app: report queries per request, warn over DB_QUERY_BUDGET")
+    parser.add_argument("--json", type=Path, help="also write the report here")
+    # Seeded data, used in-process and by --serve
+    parser.add_argument("--objects", type=int, default=50, help="objects per scene")
+    parser.add_argument("--messages", type=int, default=500, help="chat history in the commons")
+    parser.add_argument("--artworks", type=int, default=500)
+    # Modes
+    parser.add_argument("--url", help="drive an app already running at this URL (see --serve)")
+    parser.add_argument("--serve", action="store_true", help="run the app on a seeded stand-in database")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+
+    if args.users < 1:
+        parser.error("--users must be at least 1")
+    if args.serve:
+        serve(args)
+        return
+
+    # Index sync and the app's startup log at INFO; keep the report readable
+    logging.disable(logging.INFO)
+    target = args.url or "in-process app"
+    print(f"{args.users} artists against {target} for {args.duration}s (+{args.ramp_up}s ramp-up)", file=sys.stderr)
+    report = asyncio.run(run_remote(args) if args.url else run_in_process(args))
+    print_report(report)
+    if args.json:
+        report["config"] = {
+            "users": args.users, "duration": args.duration, "ramp_up": args.ramp_up,
+            "actions": args.actions, "mix": args.mix, "target": target,
+            "bcrypt_rounds": os.environ.get("BCRYPT_ROUNDS"),
+        }
+        args.json.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Query accounting for mongomock, which never emits pymongo command events.
+
+Wrapping the benchmark database in ProfiledDatabase charges every
+collection call to the current query_profiler tally, the same way the
+CommandTimingListener does against a real server. That way X-DB-Queries
+and the per-case query counts work offline too. A find() is counted once,
+however many batches its cursor would have needed.
+"""
+import asyncio
+import time
+
+from services import query_profiler
+
+# Collection methods that issue a command, and the argument holding the filter or pipeline
+_QUERY_METHODS = {
+    "find": "find", "find_one": "find", "count_documents": "aggregate", "estimated_document_count": "count",
+    "distinct": "distinct", "aggregate": "aggregate",
+    "find_one_and_update": "findAndModify", "find_one_and_replace": "findAndModify",
+    "find_one_and_delete": "findAndModify",
+    "insert_one": "insert", "insert_many": "insert", "bulk_write": "bulkWrite",
+    "update_one": "update", "update_many": "update", "replace_one": "update",
+    "delete_one": "delete", "delete_many": "delete",
+    "create_index": "createIndexes", "create_indexes": "createIndexes", "drop_index": "dropIndexes",
+    "list_indexes": "listIndexes", "index_information": "listIndexes",
+}
+_NO_SPEC = {"insert", "bulkWrite", "count", "createIndexes", "dropIndexes", "listIndexes"}
+
+
+async def _timed(coro, tally):
+    started = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        tally.seconds += time.perf_counter() - started
+
+
+class ProfiledCollection:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        command = _QUERY_METHODS.get(name)
+        if command is None:
+            return attr
+
+        def wrapper(*args, **kwargs):
+            tally = query_profiler.current_tally()
+            if tally is None:
+                return attr(*args, **kwargs)
+            tally.commands += 1
+            if tally.shapes is not None:
+                spec = None
+                if command not in _NO_SPEC:
+                    spec = args[0] if args else kwargs.get("filter", kwargs.get("pipeline"))
+                tally.note_shape(query_profiler.query_shape(command, self._collection.name, spec))
+            result = attr(*args, **kwargs)
+            return _timed(result, tally) if asyncio.iscoroutine(result) else result
+        return wrapper
+
+
+class ProfiledDatabase:
+    def __init__(self, db):
+        self._db = db
+
+    def __getattr__(self, name):
+        attr = getattr(self._db, name)
+        return ProfiledCollection(attr) if hasattr(attr, "find_one") and not callable(attr) else attr
+
+    def __getitem__(self, name):
+        return ProfiledCollection(self._db[name])
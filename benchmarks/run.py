@@ -0,0 +1,113 @@
+"""Run the backend micro-benchmarks and record the results.
+
+Everything runs in-process against mongomock, so no server or network is
+needed. Results are written as JSON keyed by case name; pass an earlier
+file to --compare to see p50 and query-count changes and flag regressions.
+
+    python -m benchmarks.run [--filter routes.scenes] [--scale 0.2]
+                             [--output out.json] [--compare baseline.json]
+"""
+import argparse
+import json
+import logging
+import platform
+import subprocess
+import sys
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks import bench_auth, bench_models, bench_routes, bench_serialization
+from benchmarks.harness import run_case
+from services import query_profiler
+from services.passwords import BCRYPT_ROUNDS
+
+SUITES = [bench_auth, bench_models, bench_routes, bench_serialization]
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> int:
+    """Print p50 and query-count deltas against a baseline; returns the number of regressions.
+
+    Query counts are deterministic, so any increase counts as a regression.
+    """
+    regressions = 0
+    print(f"\n{'case':52} {'base p50':>12} {'p50':>12} {'change':>8} {'queries':>13}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None or not base["p50_us"]:
+            print(f"{name:52} {'-':>12} {result['p50_us']:12.1f}      new")
+            continue
+        change = result["p50_us"] / base["p50_us"] - 1
+        base_queries = base.get("db_queries", 0.0)
+        flags = []
+        if change > threshold:
+            flags.append("SLOWER")
+        if result["db_queries"] > base_queries + 0.01:
+            flags.append("MORE QUERIES")
+        regressions += bool(flags)
+        print(f"{name:52} {base['p50_us']:12.1f} {result['p50_us']:12.1f} {change:+7.1%} "
+              f"{base_queries:6.1f}->{result['db_queries']:<6.1f}{'  ' + ', '.join(flags) if flags else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every case's iteration count")
+    parser.add_argument("--output", type=Path, help="defaults to benchmarks/results/<commit>.json")
+    parser.add_argument("--compare", type=Path, help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="p50 slowdown counted as a regression (default 0.10 = 10%%)")
+    args = parser.parse_args()
+
+    # Index sync and the like log at INFO every time a case seeds its database
+    logging.disable(logging.INFO)
+
+    commit = git_commit()
+    cases = [case for suite in SUITES for case in suite.cases() if args.filter in case.name]
+    results = {}
+    print(f"{'case':52} {'p50 us':>12} {'p95 us':>12} {'ops/s':>10} {'peak B':>10} {'queries':>8}")
+    for case in cases:
+        result = run_case(case, scale=args.scale)
+        results[case.name] = asdict(result)
+        print(f"{case.name:52} {result.p50_us:12.1f} {result.p95_us:12.1f} "
+              f"{result.ops_per_sec:10.0f} {result.alloc_peak_bytes:10d} {result.db_queries:8.1f}")
+        if result.db_max_repeats >= query_profiler.DB_REPEATED_QUERY_LIMIT:
+            print(f"    one query shape repeated {result.db_max_repeats}x per call (possible N+1)")
+
+    output = args.output or RESULTS_DIR / f"{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "scale": args.scale,
+        },
+        "results": results,
+    }, indent=2))
+    print(f"\nWrote {len(results)} results to {output}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        if baseline["meta"].get("bcrypt_rounds") != BCRYPT_ROUNDS:
+            print("Note: baseline used a different BCRYPT_ROUNDS; auth cases are not comparable")
+        if compare(results, baseline["results"], args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -83,7 +83,8 @@ const PersonalGallery = ({ artistFriend, position = [0, 0, 0], onUploadSuccess }
     type: art.type,
     color: getColorForType(art.type),
     description: art.description || 'No description available',
-    url: art.file_url,
+    url: art.metadata?.variants?.texture?.url || art.file_url,
+    thumbnailUrl: art.thumbnail_url || art.file_url,
     likes: art.likes,
     views: art.views
   })) : personalArtwork[artistFriend.id] || [];
@@ -0,0 +1,61 @@
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+
+
+class CountingCollection:
+    """Wraps a mock collection and records every command issued against it"""
+
+    def __init__(self, collection, calls):
+        self._collection = collection
+        self._calls = calls
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr):
+            return attr
+
+        def wrapper(*args, **kwargs):
+            self._calls.append((self._collection.name, name))
+            return attr(*args, **kwargs)
+        return wrapper
+
+
+class CountingDatabase:
+    def __init__(self, db):
+        self._db = db
+        self.calls = []
+
+    def __getattr__(self, name):
+        return CountingCollection(getattr(self._db, name), self.calls)
+
+    def __getitem__(self, name):
+        return CountingCollection(self._db[name], self.calls)
+
+    def count(self, collection: str = None) -> int:
+        return len([call for call in self.calls if collection is None or call[0] == collection])
+
+
+@pytest.fixture
+def db():
+    return CountingDatabase(AsyncMongoMockClient()["test_db"])
+
+
+@pytest.fixture
+def run():
+    return lambda coro: asyncio.run(coro)
+
+
+@pytest.fixture
+def fetch(run):
+    """Run a handler that returns a JSON Response and decode its body"""
+    return lambda coro: json.loads(run(coro).body)
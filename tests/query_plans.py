@@ -0,0 +1,32 @@
+"""Explain-plan assertions for the queries the routes issue.
+
+Needs a real MongoDB (mongomock has no query planner); point MONGO_TEST_URL
+at a disposable server to run the checks.
+"""
+from typing import Iterable, Optional, Set
+
+
+def plan_stages(plan: dict) -> Set[str]:
+    """Every stage name in a winning plan, for classic and SBE explain output"""
+    stages = set()
+    pending = [plan]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, dict):
+            if "stage" in node:
+                stages.add(node["stage"])
+            pending.extend(node.values())
+        elif isinstance(node, list):
+            pending.extend(node)
+    return stages
+
+
+async def assert_uses_index(collection, query: dict, sort: Optional[Iterable] = None):
+    cursor = collection.find(query)
+    if sort:
+        cursor = cursor.sort(list(sort))
+    explanation = await cursor.explain()
+    stages = plan_stages(explanation["queryPlanner"]["winningPlan"])
+    assert "COLLSCAN" not in stages, (
+        f"{collection.name}.find({query!r}).sort({sort!r}) is a collection scan: {sorted(stages)}"
+    )
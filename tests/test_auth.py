@@ -0,0 +1,21 @@
+from bson import ObjectId
+
+import database
+from auth import authenticate_token, create_access_token, invalidate_user_principals
+
+
+def test_principal_is_cached_until_user_is_invalidated(db, run, monkeypatch):
+    monkeypatch.setattr(database, "_db", db)
+    user_id = ObjectId()
+    run(db.users.insert_one({"_id": user_id, "name": "Ann", "email": "ann@example.com", "password": "x"}))
+    token = create_access_token({"sub": str(user_id)})
+    db.calls.clear()
+
+    first = run(authenticate_token(token))
+    second = run(authenticate_token(token))
+    assert first is second
+    assert db.count("users") == 1
+
+    invalidate_user_principals(str(user_id))
+    run(authenticate_token(token))
+    assert db.count("users") == 2
@@ -0,0 +1,62 @@
+import asyncio
+
+from services.counters import CounterBuffer
+
+
+def test_views_are_coalesced_into_bulk_writes(db, run):
+    async def scenario():
+        await db.artworks.insert_many([{"id": "hot", "views": 0}, {"id": "cold", "views": 2}])
+        counter = CounterBuffer("views", flush_interval=3600, max_pending=100)
+        counter.start(db)
+        db.calls.clear()
+
+        for _ in range(99):
+            counter.record("hot")
+        counter.record("cold")
+        for _ in range(3):
+            await asyncio.sleep(0)
+        flushed_writes = db.count("artworks")
+
+        counter.record("hot")
+        await counter.stop()
+        total_writes = db.count("artworks")
+        return flushed_writes, total_writes, await db.artworks.find({}, {"_id": 0}).sort("id").to_list(None)
+
+    flushed_writes, total_writes, docs = run(scenario())
+
+    # Reaching max_pending triggers one bulk write; stop() flushes the rest
+    assert flushed_writes == 1
+    assert docs == [{"id": "cold", "views": 3}, {"id": "hot", "views": 100}]
+    assert total_writes == 2
+
+
+def test_stop_during_a_flush_loses_no_counts(db, run):
+    async def scenario():
+        await db.artworks.insert_one({"id": "hot", "views": 0})
+        counter = CounterBuffer("views", flush_interval=0, max_pending=1000)
+        release = asyncio.Event()
+        real_bulk_write = db.artworks.bulk_write
+
+        class SlowArtworks:
+            async def bulk_write(self, *args, **kwargs):
+                await release.wait()
+                return await real_bulk_write(*args, **kwargs)
+
+        class SlowDatabase:
+            artworks = SlowArtworks()
+
+        for _ in range(5):
+            counter.record("hot")
+        counter.start(SlowDatabase())
+        # Let the periodic flusher take the batch and block in bulk_write
+        for _ in range(3):
+            await asyncio.sleep(0)
+        assert counter.stats()["pending"] == 0
+
+        stopping = asyncio.create_task(counter.stop())
+        await asyncio.sleep(0)
+        release.set()
+        await stopping
+        return await db.artworks.find_one({"id": "hot"})
+
+    assert run(scenario())["views"] == 5
@@ -0,0 +1,35 @@
+import os
+
+from PIL import Image
+
+import services.uploads as uploads
+from models.artwork import Artwork
+from services.derivatives import DerivativePipeline
+
+
+def test_variants_are_generated_in_background_and_recorded(tmp_path, db, run, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", str(tmp_path))
+    source = tmp_path / "painting.png"
+    Image.new("RGB", (3000, 1500), "navy").save(source)
+    artwork = Artwork(artist_id="a", suite_id="suite-1", title="Sea", type="painting",
+                      file_url="/uploads/painting.png", mime_type="image/png", file_size=1,
+                      metadata={"sha256": "ab" * 32})
+
+    async def scenario():
+        await db.artworks.insert_one(artwork.dict())
+        pipeline = DerivativePipeline(workers=1)
+        pipeline.schedule(db, artwork, str(source), "ab" * 32)
+        await pipeline.shutdown()
+        return await db.artworks.find_one({"id": artwork.id})
+
+    doc = run(scenario())
+
+    variants = doc["metadata"]["variants"]
+    assert doc["thumbnail_url"] == variants["thumb"]["url"]
+    assert (variants["thumb"]["width"], variants["thumb"]["height"]) == (256, 128)
+    assert (variants["texture"]["width"], variants["texture"]["height"]) == (2048, 1024)
+    for variant in variants.values():
+        assert os.path.exists(str(tmp_path) + variant["url"][len("/uploads"):])
+
+    DerivativePipeline.remove("ab" * 32)
+    assert os.listdir(tmp_path / "derivatives" / "ab") == []
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models.artwork import Artwork
+from routes.artwork import GallerySort, gallery_cache, get_public_gallery
+
+
+@pytest.fixture(autouse=True)
+def clear_gallery_cache():
+    gallery_cache.clear()
+
+
+def seed(db, run, count):
+    start = datetime(2024, 1, 1)
+    run(db.artworks.insert_many([
+        Artwork(artist_id="a", suite_id="suite-1", title=str(i), type="painting",
+                file_url=f"/uploads/{i}.png", mime_type="image/png", file_size=1,
+                likes=i % 3, views=i, is_public=i != 0,
+                created_at=start + timedelta(minutes=i)).dict()
+        for i in range(count)
+    ]))
+
+
+def walk(db, fetch, sort, limit):
+    titles, after = [], None
+    while True:
+        page = fetch(get_public_gallery(db=db, sort=sort, limit=limit, after=after))
+        if not page:
+            return titles
+        titles += [artwork["title"] for artwork in page]
+        after = page[-1]["cursor"]
+
+
+@pytest.mark.parametrize("sort", list(GallerySort))
+def test_cursor_pages_cover_public_gallery_exactly_once(db, run, fetch, sort):
+    seed(db, run, 17)
+
+    titles = walk(db, fetch, sort, limit=4)
+
+    assert sorted(titles, key=int) == [str(i) for i in range(1, 17)]
+    if sort is GallerySort.newest:
+        assert titles == [str(i) for i in range(16, 0, -1)]
+    if sort is GallerySort.most_viewed:
+        assert titles[0] == "16"
+
+
+def test_first_page_is_served_from_cache(db, run, fetch):
+    seed(db, run, 5)
+
+    run(get_public_gallery(db=db, sort=GallerySort.newest, limit=3, after=None))
+    db.calls.clear()
+    page = fetch(get_public_gallery(db=db, sort=GallerySort.newest, limit=3, after=None))
+
+    assert [artwork["title"] for artwork in page] == ["4", "3", "2"]
+    assert db.count() == 0
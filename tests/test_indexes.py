@@ -0,0 +1,59 @@
+import os
+import uuid
+
+import pytest
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from models.indexes import INDEXES
+from routes.artwork import GALLERY_SORTS
+from routes.messages import HISTORY_SORT_DESC
+from services.index_manager import diff_indexes, sync_indexes
+from services.pagination import keyset_filter
+from tests.query_plans import assert_uses_index
+
+MONGO_TEST_URL = os.environ.get("MONGO_TEST_URL")
+
+user_id, scene_id = ObjectId(), ObjectId()
+
+# (collection, filter, sort) for each hot query the routes issue
+ROUTE_QUERIES = [
+    ("users", {"email": "ann@example.com"}, None),
+    ("users", {"_id": user_id}, None),
+    ("scenes", {"owner": user_id}, None),
+    ("scenes", {"collaborators.user": user_id, "collaborators.status": "active"}, None),
+    ("scene_ops", {"scene_id": scene_id, "version": {"$gt": 3}}, [("version", 1)]),
+    ("messages", {"scene_id": scene_id}, HISTORY_SORT_DESC),
+    ("messages", {"scene_id": scene_id, **keyset_filter(HISTORY_SORT_DESC, [None, ObjectId()])}, HISTORY_SORT_DESC),
+    ("media", {"scene_id": scene_id}, None),
+    ("artworks", {"id": "artwork"}, None),
+    *[("artworks", {"is_public": True}, sort) for sort in GALLERY_SORTS.values()],
+    *[("artworks", {"suite_id": "suite-1"}, sort) for sort in GALLERY_SORTS.values()],
+    ("artwork_likes", {"artwork_id": "artwork", "user_id": "user"}, None),
+    ("artwork_likes", {"user_id": "user", "artwork_id": {"$in": ["a", "b"]}}, None),
+]
+
+
+def test_sync_is_idempotent(db, run):
+    first = run(sync_indexes(db))
+    second = run(sync_indexes(db))
+
+    assert len(first.missing) == len(INDEXES)
+    assert second.in_sync
+    assert run(diff_indexes(db)).in_sync
+
+
+@pytest.mark.skipif(not MONGO_TEST_URL, reason="set MONGO_TEST_URL to check query plans")
+@pytest.mark.parametrize("collection,query,sort", ROUTE_QUERIES)
+def test_route_queries_use_an_index(run, collection, query, sort):
+    async def scenario():
+        client = AsyncIOMotorClient(MONGO_TEST_URL)
+        db = client[f"plans_{uuid.uuid4().hex[:8]}"]
+        try:
+            await sync_indexes(db)
+            await assert_uses_index(db[collection], query, sort)
+        finally:
+            await client.drop_database(db.name)
+            client.close()
+
+    run(scenario())
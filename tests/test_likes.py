@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from models.artwork import ArtworkLikeQuery
+from routes.artwork import get_liked_artworks, like_artwork, unlike_artwork
+from services.counters import like_counter
+
+
+def test_likes_are_idempotent_and_materialised_in_batches(db, run):
+    user = SimpleNamespace(id="user-1")
+
+    async def scenario():
+        await db.artworks.insert_many([{"id": art_id, "likes": 0} for art_id in ("a", "b", "c")])
+        like_counter.start(db)
+        db.calls.clear()
+
+        for _ in range(3):
+            await like_artwork("a", current_user=user, db=db)
+        await like_artwork("b", current_user=user, db=db)
+        await unlike_artwork("b", current_user=user, db=db)
+        # Repeat clicks cost a single upsert each
+        assert db.count("artwork_likes") == 5
+        assert db.count("artworks") == 2
+
+        with pytest.raises(HTTPException):
+            await like_artwork("missing", current_user=user, db=db)
+
+        liked = await get_liked_artworks(ArtworkLikeQuery(artwork_ids=["a", "b", "c"]), current_user=user, db=db)
+        assert liked == {"liked": ["a"]}
+
+        await like_counter.stop()
+        return {doc["id"]: doc["likes"] for doc in await db.artworks.find({}).to_list(None)}
+
+    assert run(scenario()) == {"a": 1, "b": 0, "c": 0}
@@ -0,0 +1,137 @@
+import hashlib
+import os
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from routes.media import router
+from services import media, uploads
+
+TRACK = bytes(range(256)) * 4096  # 1 MB
+TRACK_SHA = hashlib.sha256(TRACK).hexdigest()
+TRACK_URL = f"/uploads/{TRACK_SHA[:2]}/{TRACK_SHA}.mp3"
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", str(tmp_path))
+    os.makedirs(tmp_path / TRACK_SHA[:2])
+    (tmp_path / TRACK_SHA[:2] / f"{TRACK_SHA}.mp3").write_bytes(TRACK)
+    (tmp_path / "legacy.txt").write_bytes(b"hello")
+    return tmp_path
+
+
+@pytest.fixture
+def request_media(run, upload_dir):
+    app = FastAPI()
+    app.include_router(router)
+
+    def request(url, method="GET", **headers):
+        async def scenario():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.request(method, url, headers=headers)
+        return run(scenario())
+    return request
+
+
+def test_content_hashed_files_are_immutable(request_media):
+    response = request_media(TRACK_URL)
+
+    assert response.status_code == 200
+    assert response.content == TRACK
+    assert response.headers["content-type"] == "audio/mpeg"
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["etag"] == f'"{TRACK_SHA}.mp3"'
+    assert response.headers["cache-control"] == media.IMMUTABLE_CACHE_CONTROL
+
+    legacy = request_media("/uploads/legacy.txt")
+    assert legacy.content == b"hello"
+    assert legacy.headers["cache-control"] == media.REVALIDATE_CACHE_CONTROL
+
+
+def test_seeking_transfers_only_the_requested_range(request_media, monkeypatch):
+    reads = []
+    monkeypatch.setattr(media, "MEDIA_CHUNK_SIZE", 64 * 1024)
+    real_open = media.anyio.open_file
+
+    async def counting_open(*args, **kwargs):
+        f = await real_open(*args, **kwargs)
+        real_read = f.read
+
+        async def read(size=-1):
+            chunk = await real_read(size)
+            reads.append(len(chunk))
+            return chunk
+        f.read = read
+        return f
+    monkeypatch.setattr(media.anyio, "open_file", counting_open)
+
+    response = request_media(TRACK_URL, range="bytes=500000-599999")
+
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 500000-599999/{len(TRACK)}"
+    assert response.headers["content-length"] == "100000"
+    assert response.content == TRACK[500000:600000]
+    assert sum(reads) == 100000
+
+
+def test_open_ended_and_suffix_ranges(request_media):
+    tail = request_media(TRACK_URL, range="bytes=-100")
+    assert tail.status_code == 206
+    assert tail.content == TRACK[-100:]
+
+    rest = request_media(TRACK_URL, range=f"bytes={len(TRACK) - 10}-")
+    assert rest.content == TRACK[-10:]
+    assert rest.headers["content-range"] == f"bytes {len(TRACK) - 10}-{len(TRACK) - 1}/{len(TRACK)}"
+
+
+def test_unsatisfiable_range(request_media):
+    response = request_media(TRACK_URL, range=f"bytes={len(TRACK)}-")
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(TRACK)}"
+
+
+def test_range_ignored_when_if_range_is_stale(request_media):
+    response = request_media(TRACK_URL, range="bytes=0-9", **{"if-range": '"something-else"'})
+    assert response.status_code == 200
+    assert len(response.content) == len(TRACK)
+
+    current = request_media(TRACK_URL, range="bytes=0-9", **{"if-range": f'"{TRACK_SHA}.mp3"'})
+    assert current.status_code == 206
+    assert current.content == TRACK[:10]
+
+
+def test_conditional_requests_return_not_modified(request_media):
+    first = request_media("/uploads/legacy.txt")
+
+    by_etag = request_media("/uploads/legacy.txt", **{"if-none-match": first.headers["etag"]})
+    assert by_etag.status_code == 304
+    assert by_etag.content == b""
+    assert by_etag.headers["etag"] == first.headers["etag"]
+
+    by_date = request_media("/uploads/legacy.txt", **{"if-modified-since": first.headers["last-modified"]})
+    assert by_date.status_code == 304
+
+    changed = request_media("/uploads/legacy.txt", **{"if-none-match": '"stale"'})
+    assert changed.status_code == 200
+
+
+def test_head_sends_headers_only(request_media):
+    response = request_media(TRACK_URL, method="HEAD")
+
+    assert response.status_code == 200
+    assert response.headers["content-length"] == str(len(TRACK))
+    assert response.content == b""
+
+
+def test_paths_outside_upload_dir_and_partial_uploads_are_not_served(request_media, upload_dir):
+    (upload_dir / "incoming.mp3.abc.part").write_bytes(b"partial")
+
+    assert request_media("/uploads/../secret").status_code == 404
+    assert request_media("/uploads/%2e%2e/%2e%2e/etc/passwd").status_code == 404
+    assert request_media("/uploads/incoming.mp3.abc.part").status_code == 404
+    assert request_media("/uploads/missing.mp3").status_code == 404
+    assert request_media(f"/uploads/{TRACK_SHA[:2]}").status_code == 404
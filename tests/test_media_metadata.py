@@ -0,0 +1,193 @@
+import struct
+import wave
+
+import pytest
+from PIL import Image
+
+import services.uploads as uploads
+from models.artwork import Artwork
+from services.media_metadata import MetadataExtractor, UnsupportedMedia, extract_metadata
+
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, joint stereo: 417-byte frames of 1152 samples
+MP3_HEADER = b"\xff\xfb\x90\x40"
+MP3_FRAME = MP3_HEADER + b"\x00" * 413
+
+
+def write_wav(path, seconds=2.5, rate=22050, channels=2):
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(b"\x00\x00" * channels * int(rate * seconds))
+
+
+def id3_tag(payload_size=1000):
+    size = bytes([(payload_size >> shift) & 0x7F for shift in (21, 14, 7, 0)])
+    return b"ID3\x04\x00\x00" + size + b"\x00" * payload_size
+
+
+def ogg_page(granule, serial, packet, flags=0):
+    return (b"OggS" + struct.pack("<BBqIIIB", 0, flags, granule, serial, 0, 0, 1)
+            + bytes([len(packet)]) + packet)
+
+
+def test_wav_duration_comes_from_the_data_chunk(tmp_path):
+    path = tmp_path / "take.wav"
+    write_wav(path)
+
+    meta = extract_metadata(str(path), "audio/wav")
+
+    assert meta == {"codec": "pcm", "duration": 2.5, "sample_rate": 22050, "channels": 2,
+                    "bits_per_sample": 16, "bitrate": 22050 * 2 * 2 * 8}
+
+
+def test_constant_bitrate_mp3_after_id3_tag(tmp_path):
+    path = tmp_path / "song.mp3"
+    path.write_bytes(id3_tag() + MP3_FRAME * 1000 + b"TAG" + b"\x00" * 125)
+
+    meta = extract_metadata(str(path), "audio/mpeg")
+
+    assert meta["codec"] == "mp3"
+    assert meta["sample_rate"] == 44100
+    assert meta["channels"] == 2
+    assert meta["bitrate"] == 128000
+    assert meta["duration"] == pytest.approx(417 * 1000 * 8 / 128000, abs=0.001)
+
+
+def test_variable_bitrate_mp3_uses_the_xing_frame_count(tmp_path):
+    xing = MP3_HEADER + b"\x00" * 32 + b"Xing" + struct.pack(">III", 3, 5000, 417 * 5000)
+    path = tmp_path / "vbr.mp3"
+    path.write_bytes(xing + b"\x00" * (417 - len(xing)) + MP3_FRAME * 10)
+
+    meta = extract_metadata(str(path), "audio/mpeg")
+
+    assert meta["duration"] == pytest.approx(5000 * 1152 / 44100, abs=0.001)
+    assert meta["bitrate"] == int(417 * 5000 * 8 / (5000 * 1152 / 44100))
+
+
+def test_ogg_vorbis_and_opus_read_the_last_granule(tmp_path):
+    vorbis_id = b"\x01vorbis" + struct.pack("<IBIiIiB", 0, 2, 44100, 0, 160000, 0, 0xB8) + b"\x01"
+    vorbis = tmp_path / "jam.ogg"
+    vorbis.write_bytes(ogg_page(0, 7, vorbis_id, flags=2) + b"\x00" * 100_000
+                       + ogg_page(44100 * 90, 7, b"audio", flags=4))
+
+    opus_id = b"OpusHead" + struct.pack("<BBHIhB", 1, 1, 312, 48000, 0, 0)
+    opus = tmp_path / "voice.ogg"
+    opus.write_bytes(ogg_page(0, 9, opus_id, flags=2) + ogg_page(48000 * 12 + 312, 9, b"audio", flags=4))
+
+    vorbis_meta = extract_metadata(str(vorbis), "audio/ogg")
+    assert (vorbis_meta["codec"], vorbis_meta["channels"], vorbis_meta["sample_rate"]) == ("vorbis", 2, 44100)
+    assert vorbis_meta["duration"] == 90.0
+
+    opus_meta = extract_metadata(str(opus), "audio/ogg")
+    assert (opus_meta["codec"], opus_meta["channels"], opus_meta["duration"]) == ("opus", 1, 12.0)
+
+
+def test_image_dimensions_account_for_exif_rotation(tmp_path):
+    plain = tmp_path / "plain.png"
+    Image.new("RGB", (300, 200)).save(plain)
+    rotated = tmp_path / "rotated.jpg"
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    Image.new("RGB", (300, 200)).save(rotated, exif=exif)
+
+    assert extract_metadata(str(plain), "image/png") == {"width": 300, "height": 200, "format": "png"}
+    assert extract_metadata(str(rotated), "image/jpeg")["width"] == 200
+
+
+def test_garbage_is_rejected(tmp_path):
+    path = tmp_path / "noise.mp3"
+    path.write_bytes(b"\x00\x01" * 1000)
+
+    with pytest.raises(UnsupportedMedia):
+        extract_metadata(str(path), "audio/mpeg")
+    with pytest.raises(UnsupportedMedia):
+        extract_metadata(str(path), "audio/wav")
+
+
+def test_truncated_ogg_does_not_stop_the_backfill(tmp_path, db, run, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", str(tmp_path))
+    (tmp_path / "short.ogg").write_bytes(b"OggS" + b"\x00" * 20)
+    write_wav(tmp_path / "fine.wav", seconds=1)
+
+    with pytest.raises(UnsupportedMedia):
+        extract_metadata(str(tmp_path / "short.ogg"), "audio/ogg")
+
+    docs = [
+        Artwork(artist_id="a", suite_id="suite-1", title=name, type="music", file_url=f"/uploads/{name}",
+                mime_type=mime_type, file_size=1).dict()
+        for name, mime_type in (("short.ogg", "audio/ogg"), ("fine.wav", "audio/wav"))
+    ]
+
+    async def scenario():
+        await db.artworks.insert_many(docs)
+        extractor = MetadataExtractor(workers=1, batch_size=10)
+        count = await extractor.backfill(db)
+        await extractor.stop()
+        return count, {doc["title"]: doc["metadata"] async for doc in db.artworks.find({})}
+
+    count, metadata = run(scenario())
+
+    assert count == 2
+    assert "probe_error" in metadata["short.ogg"] and "probed_at" in metadata["short.ogg"]
+    assert metadata["fine.wav"]["duration"] == 1.0
+
+
+def test_backlog_is_probed_in_bulk(tmp_path, db, run, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", str(tmp_path))
+    write_wav(tmp_path / "a.wav", seconds=1)
+    Image.new("RGB", (64, 32)).save(tmp_path / "b.png")
+    (tmp_path / "c.mp3").write_bytes(b"not audio")
+
+    def artwork(name, mime_type, artwork_type):
+        return Artwork(artist_id="a", suite_id="suite-1", title=name, type=artwork_type,
+                       file_url=f"/uploads/{name}", mime_type=mime_type, file_size=1).dict()
+
+    docs = [
+        artwork("a.wav", "audio/wav", "music"),
+        artwork("b.png", "image/png", "painting"),
+        artwork("c.mp3", "audio/mpeg", "music"),
+        artwork("gone.mp3", "audio/mpeg", "music"),
+        artwork("d.txt", "text/plain", "writing"),
+    ]
+
+    async def scenario():
+        await db.artworks.insert_many(docs)
+        extractor = MetadataExtractor(workers=2, batch_size=2)
+        db.calls.clear()
+        count = await extractor.backfill(db)
+        again = await extractor.backfill(db)
+        await extractor.stop()
+        return count, again, {doc["title"]: doc.get("metadata") or {} async for doc in db.artworks.find({})}
+
+    count, again, metadata = run(scenario())
+
+    assert (count, again) == (4, 0)
+    assert metadata["a.wav"]["duration"] == 1.0
+    assert (metadata["b.png"]["width"], metadata["b.png"]["height"]) == (64, 32)
+    assert "probe_error" in metadata["c.mp3"] and "probed_at" in metadata["c.mp3"]
+    assert metadata["gone.mp3"]["probe_error"] == "file not found"
+    assert metadata["d.txt"] == {}
+    # Two batches of two, one bulk write each
+    assert db.calls.count(("artworks", "bulk_write")) == 2
+
+
+def test_new_uploads_are_probed_in_background(tmp_path, db, run):
+    path = tmp_path / "take.wav"
+    write_wav(path, seconds=3)
+    artwork = Artwork(artist_id="a", suite_id="suite-1", title="Take", type="music",
+                      file_url="/uploads/take.wav", mime_type="audio/wav", file_size=1,
+                      metadata={"sha256": "ab" * 32})
+
+    async def scenario():
+        await db.artworks.insert_one(artwork.dict())
+        extractor = MetadataExtractor(workers=1, batch_size=10)
+        extractor.schedule(db, artwork, str(path))
+        await extractor.stop()
+        return await db.artworks.find_one({"id": artwork.id})
+
+    doc = run(scenario())
+
+    assert doc["metadata"]["sha256"] == "ab" * 32
+    assert doc["metadata"]["duration"] == 3.0
+    assert doc["metadata"]["sample_rate"] == 22050
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from models.user import UserResponse
+import routes.messages as messages_routes
+from routes.messages import get_scene_messages
+from services.hydration import user_summary_cache
+
+
+def seed(db, run, count):
+    user_id, scene_id = ObjectId(), ObjectId()
+    run(db.users.insert_one({"_id": user_id, "name": "Ann", "email": "ann@example.com"}))
+    run(db.scenes.insert_one({"_id": scene_id, "owner": user_id, "is_public": False, "collaborators": []}))
+    start = datetime(2024, 1, 1)
+    # Pairs of messages share a timestamp so the _id tie-breaker is exercised
+    run(db.messages.insert_many([
+        {"_id": ObjectId(), "scene_id": scene_id, "sender": user_id, "content": str(i),
+         "type": "text", "timestamp": start + timedelta(seconds=i // 2)}
+        for i in range(count)
+    ]))
+    user = UserResponse(id=str(user_id), name="Ann", email="ann@example.com",
+                        created_at=start, last_seen=start, is_online=True)
+    return user, str(scene_id)
+
+
+def page(db, fetch, user, scene_id, **params):
+    params = {"limit": 4, "skip": 0, "before": None, "after": None, **params}
+    return fetch(get_scene_messages(scene_id, current_user=user, db=db, **params))
+
+
+def test_before_cursor_walks_history_without_gaps(db, run, fetch):
+    user, scene_id = seed(db, run, 11)
+
+    seen = []
+    messages = page(db, fetch, user, scene_id)
+    while messages:
+        seen = [m["content"] for m in messages] + seen
+        messages = page(db, fetch, user, scene_id, before=messages[0]["cursor"])
+
+    assert seen == [str(i) for i in range(11)]
+
+
+def test_after_cursor_returns_newer_messages_in_order(db, run, fetch):
+    user, scene_id = seed(db, run, 11)
+    oldest = page(db, fetch, user, scene_id, skip=7)
+
+    newer = page(db, fetch, user, scene_id, after=oldest[-1]["cursor"])
+
+    assert [m["content"] for m in oldest] == ["0", "1", "2", "3"]
+    assert [m["content"] for m in newer] == ["4", "5", "6", "7"]
+
+
+def test_invalid_cursor_is_rejected(db, run, fetch):
+    user, scene_id = seed(db, run, 1)
+
+    with pytest.raises(HTTPException) as exc:
+        page(db, fetch, user, scene_id, before="not-a-cursor")
+    assert exc.value.status_code == 400
+
+
+def test_senders_are_resolved_once_and_then_served_from_cache(db, run, fetch):
+    user, scene_id = seed(db, run, 12)
+    user_summary_cache.clear()
+    db.calls.clear()
+
+    first = page(db, fetch, user, scene_id, limit=12)
+    second = page(db, fetch, user, scene_id, limit=12)
+
+    assert {m["sender"]["name"] for m in first + second} == {"Ann"}
+    assert db.count("users") == 1
+
+    user_summary_cache.invalidate(ObjectId(user.id))
+    page(db, fetch, user, scene_id, limit=12)
+    assert db.count("users") == 2
+
+
+def test_oversized_limit_is_clamped_not_rejected(db, run, fetch, monkeypatch):
+    monkeypatch.setattr(messages_routes, "HISTORY_MAX_PAGE_SIZE", 5)
+    user, scene_id = seed(db, run, 11)
+
+    assert len(page(db, fetch, user, scene_id, limit=1000)) == 5
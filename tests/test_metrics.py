@@ -0,0 +1,86 @@
+import threading
+from types import SimpleNamespace
+
+import httpx
+
+from services import metrics, query_profiler
+from services.metrics import CommandTimingListener, Counter, Histogram
+
+
+def test_histogram_buckets_are_cumulative_and_summed_across_threads():
+    histogram = Histogram("test_thread_latency_seconds", "Test", ("route",), buckets=(0.1, 1.0), registry=[])
+
+    def record():
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value, ("/a",))
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    samples = {(name, labels): value for name, labels, value in histogram.samples()}
+    assert samples[("test_thread_latency_seconds_bucket", (("route", "/a"), ("le", "0.1")))] == 4
+    assert samples[("test_thread_latency_seconds_bucket", (("route", "/a"), ("le", "1")))] == 8
+    assert samples[("test_thread_latency_seconds_bucket", (("route", "/a"), ("le", "+Inf")))] == 12
+    assert samples[("test_thread_latency_seconds_count", (("route", "/a"),))] == 12
+    assert abs(samples[("test_thread_latency_seconds_sum", (("route", "/a"),))] - 4 * 5.55) < 1e-9
+
+
+def test_render_escapes_label_values():
+    registry = []
+    counter = Counter("test_escaped_total", "Test", ("path",), registry=registry)
+    counter.inc(('say "hi"\n',))
+
+    text = metrics.render(registry)
+    assert "# TYPE test_escaped_total counter" in text
+    assert 'test_escaped_total{path="say \\"hi\\"\\n"} 1' in text
+    assert "test_escaped_total" not in metrics.render()
+
+
+def test_command_listener_charges_the_current_request():
+    listener = CommandTimingListener()
+    before = metrics.mongo_command_duration.samples()
+    tally, token = query_profiler.begin(profile=True)
+    try:
+        for request_id, command in enumerate([{"find": "scenes", "filter": {"owner": 42, "$or": [{"is_public": True}]}},
+                                                  {"getMore": 7, "collection": "scenes"}]):
+            name = next(iter(command))
+            listener.started(SimpleNamespace(command=command, command_name=name, connection_id=("h", 1),
+                                             request_id=request_id))
+            listener.succeeded(SimpleNamespace(command_name=name, connection_id=("h", 1), request_id=request_id,
+                                               duration_micros=1500))
+    finally:
+        query_profiler.end(token)
+
+    assert tally.commands == 2
+    assert tally.shapes == {"find scenes {'owner': '?', '$or': [{'is_public': '?'}]}": 1, "getMore scenes": 1}
+    assert abs(tally.seconds - 0.003) < 1e-9
+    counts = {labels: value for name, labels, value in metrics.mongo_command_duration.samples()
+              if name.endswith("_count")}
+    previous = {labels: value for name, labels, value in before if name.endswith("_count")}
+    for command in ("find", "getMore"):
+        labels = (("command", command), ("collection", "scenes"))
+        assert counts[labels] - previous.get(labels, 0) == 1
+
+
+def test_requests_are_labelled_by_route_template(run):
+    import server
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await client.get("/api/scenes/65f000000000000000000001")
+            await client.get("/api/no-such-route")
+            return await client.get("/api/metrics")
+
+    response = run(scenario())
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert 'http_requests_total{method="GET",route="/api/scenes/{scene_id}",status="403"}' in text
+    assert 'http_requests_total{method="GET",route="unmatched",status="404"}' in text
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/scenes/{scene_id}"}' in text
+    assert 'http_response_size_bytes_bucket{method="GET",route="/api/scenes/{scene_id}",le="100"}' in text
+    assert "http_requests_in_flight 1" in text  # the scrape itself
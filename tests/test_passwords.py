@@ -0,0 +1,33 @@
+import asyncio
+
+import services.passwords as passwords
+from services.passwords import PasswordHasher
+
+
+def test_hashing_runs_off_the_event_loop_and_respects_work_factor(run, monkeypatch):
+    monkeypatch.setattr(passwords, "BCRYPT_ROUNDS", 4)
+    hasher = PasswordHasher(workers=2, max_pending=0)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        ticking = asyncio.create_task(ticker())
+        hashes = await asyncio.gather(*(hasher.hash(f"pw{i}") for i in range(4)))
+        ticking.cancel()
+        return ticks, hashes
+
+    ticks, hashes = run(scenario())
+
+    assert ticks > 0
+    assert all(h.startswith("$2b$04$") for h in hashes)
+    assert run(hasher.verify("pw0", hashes[0]))
+    assert not hasher.needs_rehash(hashes[0])
+    monkeypatch.setattr(passwords, "BCRYPT_ROUNDS", 5)
+    assert hasher.needs_rehash(hashes[0])
+    assert hasher.stats()["completed"] == 5
@@ -0,0 +1,125 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from models.scene import Scene, Collaborator
+from models.user import PresenceHeartbeat, UserResponse
+import routes.auth as auth_routes
+from routes.artwork import get_all_suites
+from routes.scenes import get_scene
+from services import presence as presence_module
+from services.presence import PresenceService
+
+
+def test_heartbeats_expire_after_ttl(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(presence_module.time, "monotonic", lambda: clock[0])
+    presence = PresenceService(ttl=60, flush_interval=30)
+
+    presence.heartbeat("a", suite_id="suite-1")
+    assert presence.is_online("a")
+    assert presence.suite_status("suite-1")[0]
+
+    clock[0] += 61
+    assert not presence.is_online("a")
+    assert not presence.suite_status("suite-1")[0]
+    assert presence.last_seen("a") is not None
+
+
+def test_last_seen_is_written_once_per_user_per_flush(db, run):
+    user_ids = [ObjectId() for _ in range(3)]
+    for user_id in user_ids:
+        run(db.users.insert_one({"_id": user_id, "name": "U", "last_seen": datetime(2020, 1, 1)}))
+    presence = PresenceService(ttl=60, flush_interval=30)
+    presence._db = db
+    db.calls.clear()
+
+    for _ in range(50):
+        for user_id in user_ids:
+            presence.heartbeat(str(user_id))
+    written = run(presence.flush())
+
+    assert written == 3
+    assert db.count("users") == 1
+    assert all(doc["last_seen"] > datetime(2020, 1, 1) for doc in run(db.users.find({}).to_list(None)))
+    assert run(presence.flush()) == 0
+
+
+def test_listings_read_presence_not_the_database(db, run, fetch, monkeypatch):
+    presence = PresenceService(ttl=60, flush_interval=30)
+    monkeypatch.setattr("services.hydration.presence", presence)
+    monkeypatch.setattr("routes.artwork.presence", presence)
+    owner_id, online_id, offline_id = ObjectId(), ObjectId(), ObjectId()
+    for user_id in (owner_id, online_id, offline_id):
+        # A stale stored flag must not leak through
+        run(db.users.insert_one({"_id": user_id, "name": str(user_id), "email": "", "is_online": True}))
+    scene = Scene(name="Office", owner=owner_id, collaborators=[
+        Collaborator(user=online_id, status="active"), Collaborator(user=offline_id, status="active")
+    ])
+    run(db.scenes.insert_one(scene.dict(by_alias=True)))
+    presence.heartbeat(str(online_id), suite_id="suite-2")
+    current_user = UserResponse(
+        id=str(owner_id), name="Owner", email="", created_at=datetime.utcnow(),
+        last_seen=datetime.utcnow(), is_online=True
+    )
+
+    response = fetch(get_scene(str(scene.id), current_user=current_user, db=db))
+    suites = {suite.id: suite for suite in run(get_all_suites(db=db))}
+
+    assert [collab["user"]["is_online"] for collab in response["collaborators"]] == [True, False]
+    assert suites["suite-2"].is_online and suites["suite-2"].last_seen != "Unknown"
+    assert not suites["suite-1"].is_online and suites["suite-1"].last_seen == "Unknown"
+
+
+def test_unknown_suites_are_rejected_and_offline_users_forgotten(db, run, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(presence_module.time, "monotonic", lambda: clock[0])
+    presence = PresenceService(ttl=60, flush_interval=30)
+    monkeypatch.setattr(auth_routes, "presence", presence)
+    presence._db = db
+    user_id = ObjectId()
+    current_user = UserResponse(id=str(user_id), name="U", email="u@example.com",
+                                created_at=datetime.utcnow(), last_seen=datetime.utcnow(), is_online=True)
+
+    with pytest.raises(HTTPException) as exc:
+        run(auth_routes.heartbeat(PresenceHeartbeat(suite_id="made-up"), current_user=current_user))
+    assert exc.value.status_code == 404
+    run(auth_routes.heartbeat(PresenceHeartbeat(suite_id="suite-1"), current_user=current_user))
+    assert presence.suite_status("suite-1")[0]
+
+    clock[0] += 61
+    run(presence.flush())
+    assert presence.last_seen(str(user_id)) is not None  # Persisted by this flush
+    run(presence.flush())
+    assert presence.last_seen(str(user_id)) is None
+    assert presence.stats()["tracked"] == 0
+
+
+def test_stop_during_a_flush_keeps_the_batch(db, run):
+    user_id = ObjectId()
+    run(db.users.insert_one({"_id": user_id, "last_seen": datetime(2020, 1, 1)}))
+
+    async def scenario():
+        presence = PresenceService(ttl=60, flush_interval=0)
+        blocked = asyncio.Event()
+
+        class StalledUsers:
+            async def bulk_write(self, *args, **kwargs):
+                blocked.set()
+                await asyncio.Event().wait()
+
+        class StalledDatabase:
+            users = StalledUsers()
+
+        presence.heartbeat(str(user_id))
+        presence.start(StalledDatabase())
+        await blocked.wait()
+        presence._db = db
+        await presence.stop()
+
+    run(scenario())
+
+    assert run(db.users.find_one({"_id": user_id}))["last_seen"] > datetime(2020, 1, 1)
@@ -0,0 +1,79 @@
+import logging
+from types import SimpleNamespace
+
+import httpx
+from fastapi import FastAPI
+
+from services import query_profiler
+from services.metrics import CommandTimingListener, MetricsMiddleware
+
+
+def issue_command(listener, request_id, command):
+    name = next(iter(command))
+    listener.started(SimpleNamespace(command=command, command_name=name, connection_id=("h", 1),
+                                     request_id=request_id))
+    listener.succeeded(SimpleNamespace(command_name=name, connection_id=("h", 1), request_id=request_id,
+                                       duration_micros=2000))
+
+
+def make_app(lookups: int) -> FastAPI:
+    listener = CommandTimingListener()
+    app = FastAPI()
+
+    @app.get("/api/scenes/{scene_id}")
+    async def scene(scene_id: str):
+        issue_command(listener, 0, {"find": "scenes", "filter": {"_id": scene_id}})
+        # One user lookup per collaborator: the N+1 pattern
+        for i in range(lookups):
+            issue_command(listener, i + 1, {"find": "users", "filter": {"_id": i}})
+        return {"ok": True}
+
+    app.add_middleware(MetricsMiddleware, profile=True)
+    return app
+
+
+def get(run, app, url):
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(url)
+    return run(scenario())
+
+
+def test_profiled_responses_carry_db_headers(run, caplog):
+    with caplog.at_level(logging.WARNING, logger="services.query_profiler"):
+        response = get(run, make_app(lookups=2), "/api/scenes/abc")
+
+    assert response.headers["x-db-queries"] == "3"
+    assert response.headers["x-db-time"] == "6.00ms"
+    assert not caplog.records
+
+
+def test_repeated_query_shapes_are_reported(run, caplog):
+    with caplog.at_level(logging.WARNING, logger="services.query_profiler"):
+        response = get(run, make_app(lookups=query_profiler.DB_REPEATED_QUERY_LIMIT), "/api/scenes/abc")
+
+    assert response.headers["x-db-queries"] == str(query_profiler.DB_REPEATED_QUERY_LIMIT + 1)
+    [record] = caplog.records
+    message = record.getMessage()
+    assert message.startswith("GET /api/scenes/{scene_id} issued")
+    assert f"{query_profiler.DB_REPEATED_QUERY_LIMIT}x find users {{'_id': '?'}}" in message
+
+
+def test_requests_over_budget_are_reported(monkeypatch):
+    monkeypatch.setattr(query_profiler, "DB_QUERY_BUDGET", 2)
+    tally = query_profiler.RequestTally(profile=True)
+    for collection in ("scenes", "users", "messages"):
+        tally.commands += 1
+        tally.note_shape(query_profiler.query_shape("find", collection, {"_id": 1}))
+
+    assert not tally.repeated()
+    assert query_profiler.review("GET", "/api/scenes/", tally)
+
+
+def test_query_shapes_keep_operators_and_drop_values():
+    spec = query_profiler.command_spec("update", {"update": "artworks", "updates": [
+        {"q": {"id": "a", "likes": {"$gte": 3}}, "u": {"$inc": {"likes": 1}}}
+    ]})
+    assert query_profiler.query_shape("update", "artworks", spec) == \
+        "update artworks [{'id': '?', 'likes': {'$gte': '?'}}]"
@@ -0,0 +1,79 @@
+import pytest
+from fastapi import FastAPI, HTTPException, WebSocketDisconnect
+from fastapi.testclient import TestClient
+
+import routes.realtime as realtime
+from tests.test_scene_patch import make_object, seed
+
+
+@pytest.fixture
+def scene_socket(db, run, monkeypatch):
+    scene_id, current_user = run(seed(db, 3, version=2))
+
+    async def get_database():
+        return db
+
+    async def authenticate_token(token):
+        return current_user
+
+    monkeypatch.setattr(realtime, "get_database", get_database)
+    monkeypatch.setattr(realtime, "authenticate_token", authenticate_token)
+    app = FastAPI()
+    app.include_router(realtime.router)
+
+    def connect():
+        return TestClient(app).websocket_connect(f"/ws/scenes/{scene_id}?token=t")
+    return connect
+
+
+def receive(websocket, event):
+    while True:
+        frame = websocket.receive_json()
+        if frame["event"] == event:
+            return frame["data"]
+
+
+def test_non_object_frames_are_rejected_without_dropping_the_socket(scene_socket):
+    with scene_socket() as websocket:
+        websocket.send_json({"event": "chat-message", "data": "x"})
+        assert receive(websocket, "error") == {"detail": "Malformed frame"}
+        websocket.send_json(["not", "an", "object"])
+        assert receive(websocket, "error") == {"detail": "Malformed frame"}
+
+        websocket.send_json({"event": "heartbeat"})
+        websocket.send_json({"event": "join-scene"})
+        assert receive(websocket, "collaboration-update")["type"] == "presence"
+
+
+def test_object_updates_are_versioned_through_the_op_log(scene_socket, db, run):
+    with scene_socket() as websocket:
+        websocket.send_json({"event": "object-update", "data": {"version": 2, "ops": [
+            {"op": "update", "id": "obj_1", "changes": {"rotation": 90}},
+            {"op": "add", "object": make_object("obj_new").dict()},
+        ]}})
+        ack = receive(websocket, "scene-patched")
+        assert ack["version"] == 3
+        assert [obj["id"] for obj in ack["objects"]] == ["obj_1", "obj_new"]
+
+        websocket.send_json({"event": "object-update", "data": {"version": 2, "ops": [
+            {"op": "remove", "id": "obj_0"},
+        ]}})
+        conflict = receive(websocket, "error")
+        assert conflict["status"] == 409
+        assert conflict["detail"]["version"] == 3
+
+    assert run(db.scene_ops.count_documents({})) == 1
+    assert run(db.scenes.find_one({}))["version"] == 3
+
+
+def test_failed_auth_closes_with_the_documented_code(scene_socket, monkeypatch):
+    async def authenticate_token(token):
+        raise HTTPException(status_code=401, detail="Could not validate credentials")
+
+    monkeypatch.setattr(realtime, "authenticate_token", authenticate_token)
+
+    with scene_socket() as websocket:
+        with pytest.raises(WebSocketDisconnect) as exc:
+            websocket.receive_json()
+
+    assert exc.value.code == 4401
@@ -0,0 +1,42 @@
+import asyncio
+from types import SimpleNamespace
+
+from services.scene_hub import SceneHub, SLOW_CONSUMER_CLOSE_CODE
+
+
+class StalledSocket:
+    """A client that never drains its socket"""
+
+    def __init__(self):
+        self.close_code = None
+
+    async def send_text(self, payload):
+        await asyncio.Event().wait()
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+def make_user(user_id):
+    return SimpleNamespace(id=user_id, name=user_id, avatar=None)
+
+
+def test_slow_consumer_is_evicted_without_blocking_publisher(run):
+    async def scenario():
+        hub = SceneHub(queue_size=2, send_timeout=60)
+        slow_socket = StalledSocket()
+        slow = await hub.join("scene", slow_socket, make_user("slow"))
+        fast = await hub.join("scene", StalledSocket(), make_user("fast"))
+        await asyncio.sleep(0)
+
+        for i in range(4):
+            hub.publish("scene", "new-message", {"n": i}, exclude=fast)
+        await asyncio.sleep(0)
+
+        assert slow.closed
+        assert slow_socket.close_code == SLOW_CONSUMER_CLOSE_CODE
+        assert hub.evictions == 1
+        assert hub.stats()["connections"] == 1
+        await hub.close_all()
+
+    run(scenario())
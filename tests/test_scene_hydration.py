@@ -0,0 +1,53 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from models.scene import Scene, Collaborator
+from models.user import UserResponse
+from routes.scenes import get_user_scenes, get_scene
+
+
+async def seed(db, scene_count: int, collaborator_count: int) -> UserResponse:
+    owner_id = ObjectId()
+    await db.users.insert_one({"_id": owner_id, "name": "Owner", "email": "owner@example.com"})
+    collaborator_ids = [ObjectId() for _ in range(collaborator_count)]
+    for i, user_id in enumerate(collaborator_ids):
+        await db.users.insert_one({"_id": user_id, "name": f"User {i}", "email": f"user{i}@example.com"})
+
+    for i in range(scene_count):
+        scene = Scene(
+            name=f"Scene {i}",
+            owner=owner_id,
+            collaborators=[Collaborator(user=user_id, status="active") for user_id in collaborator_ids]
+        )
+        await db.scenes.insert_one(scene.dict(by_alias=True))
+
+    db.calls.clear()
+    return UserResponse(
+        id=str(owner_id), name="Owner", email="owner@example.com",
+        created_at=datetime.utcnow(), last_seen=datetime.utcnow(), is_online=True
+    )
+
+
+@pytest.mark.parametrize("scene_count,collaborator_count", [(1, 0), (5, 3), (40, 10)])
+def test_user_scenes_resolve_users_in_one_query(db, run, fetch, scene_count, collaborator_count):
+    current_user = run(seed(db, scene_count, collaborator_count))
+
+    scenes = fetch(get_user_scenes(current_user=current_user, db=db, include_shared=True))
+
+    assert len(scenes) == scene_count
+    assert all(len(scene["collaborators"]) == collaborator_count for scene in scenes)
+    assert db.count("users") == 1
+    assert db.count() == 3
+
+
+def test_get_scene_includes_collaborator_details(db, run, fetch):
+    current_user = run(seed(db, 1, 4))
+    scene_doc = run(db.scenes.find_one({}))
+    db.calls.clear()
+
+    scene = fetch(get_scene(str(scene_doc["_id"]), current_user=current_user, db=db))
+
+    assert [collab["user"]["name"] for collab in scene["collaborators"]] == [f"User {i}" for i in range(4)]
+    assert db.count("users") == 1
@@ -0,0 +1,156 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from models.scene import Scene, SceneObject, SceneObjectOp, ScenePatch
+from models.user import UserResponse
+from routes.scenes import get_scene, patch_scene_objects, sync_scene
+from services import scene_log
+from services.index_manager import sync_indexes
+from services.scene_ops import PatchError, plan_patch
+
+
+def make_object(object_id: str, x: float = 0) -> SceneObject:
+    return SceneObject(id=object_id, type="desk", position={"x": x, "y": 0})
+
+
+async def seed(db, object_count: int, version: int = None):
+    await sync_indexes(db)
+    owner_id = ObjectId()
+    await db.users.insert_one({"_id": owner_id, "name": "Owner", "email": "owner@example.com"})
+    scene = Scene(name="Office", owner=owner_id, objects=[make_object(f"obj_{i}", i) for i in range(object_count)])
+    scene_doc = scene.dict(by_alias=True)
+    if version is None:
+        # Scenes stored before versioning
+        scene_doc.pop("version")
+        scene_doc.pop("snapshot_version")
+    else:
+        scene_doc["version"] = scene_doc["snapshot_version"] = version
+    await db.scenes.insert_one(scene_doc)
+    db.calls.clear()
+    current_user = UserResponse(
+        id=str(owner_id), name="Owner", email="owner@example.com",
+        created_at=datetime.utcnow(), last_seen=datetime.utcnow(), is_online=True
+    )
+    return str(scene.id), current_user
+
+
+def patch(version: int, *ops) -> ScenePatch:
+    return ScenePatch(version=version, ops=[SceneObjectOp(**op) for op in ops])
+
+
+def test_plan_merges_updates_per_object():
+    plan = plan_patch([
+        SceneObjectOp(op="update", id="a", changes={"position": {"x": 1, "y": 2}}),
+        SceneObjectOp(op="update", id="a", changes={"rotation": 90}),
+        SceneObjectOp(op="remove", id="b"),
+    ])
+    objects = {"a": {"id": "a", "rotation": 0, "scale": 1}, "b": {"id": "b"}}
+
+    plan.apply(objects)
+
+    assert objects == {"a": {"id": "a", "position": {"x": 1, "y": 2}, "rotation": 90, "scale": 1}}
+
+
+@pytest.mark.parametrize("ops", [
+    [{"op": "add", "object": {"id": "a", "type": "desk", "position": {}}}] * 2,
+    [{"op": "remove", "id": "a"}, {"op": "update", "id": "a", "changes": {"scale": 2}}],
+    [{"op": "add", "object": {"id": "a", "type": "desk", "position": {}}},
+     {"op": "update", "id": "a", "changes": {"scale": 2}}],
+])
+def test_plan_rejects_conflicting_ops(ops):
+    with pytest.raises(PatchError):
+        plan_patch([SceneObjectOp(**op) for op in ops])
+
+
+def test_patch_appends_to_log_without_rewriting_scene(db, run, fetch):
+    scene_id, current_user = run(seed(db, 2000))
+
+    response = run(patch_scene_objects(scene_id, patch(
+        0,
+        {"op": "remove", "id": "obj_5"},
+        {"op": "update", "id": "obj_6", "changes": {"rotation": 45}},
+        {"op": "add", "object": make_object("obj_new", 42).dict()},
+    ), current_user=current_user, db=db))
+
+    assert response.version == 1
+    assert response.removed == ["obj_5"]
+    assert [(obj.id, obj.rotation) for obj in response.objects] == [("obj_6", 45), ("obj_new", 0)]
+    stored = run(db.scenes.find_one({}))
+    assert stored["version"] == 1
+    assert len(stored["objects"]) == 2000  # Snapshot untouched until compaction
+
+    scene = fetch(get_scene(scene_id, current_user=current_user, db=db))
+    objects = {obj["id"]: obj for obj in scene["objects"]}
+    assert "obj_5" not in objects and "obj_new" in objects
+    assert objects["obj_6"]["rotation"] == 45
+
+
+def test_compaction_folds_ops_into_snapshot(db, run):
+    scene_id, current_user = run(seed(db, 10, version=3))
+    for version in range(3, 6):
+        run(patch_scene_objects(scene_id, patch(
+            version, {"op": "update", "id": "obj_0", "changes": {"position": {"x": version, "y": 0}}}
+        ), current_user=current_user, db=db))
+
+    folded = run(scene_log.compact(db, ObjectId(scene_id)))
+
+    stored = run(db.scenes.find_one({}))
+    assert folded == 3
+    assert (stored["version"], stored["snapshot_version"]) == (6, 6)
+    assert stored["objects"][0]["position"] == {"x": 5, "y": 0}
+    assert run(scene_log.compact(db, ObjectId(scene_id))) == 0
+
+
+def test_sync_returns_delta_then_falls_back_to_snapshot(db, run, monkeypatch):
+    scene_id, current_user = run(seed(db, 10, version=0))
+    for version in range(4):
+        run(patch_scene_objects(scene_id, patch(
+            version, {"op": "add", "object": make_object(f"new_{version}").dict()}
+        ), current_user=current_user, db=db))
+
+    delta = run(sync_scene(scene_id, since=2, current_user=current_user, db=db))
+    assert delta.objects is None
+    assert [op.version for op in delta.ops] == [3, 4]
+
+    monkeypatch.setattr(scene_log, "SCENE_OPS_RETAIN", 1)
+    run(scene_log.compact(db, ObjectId(scene_id)))
+    full = run(sync_scene(scene_id, since=2, current_user=current_user, db=db))
+    assert (full.version, full.snapshot_version, full.ops) == (4, 4, [])
+    assert len(full.objects) == 14
+
+
+def test_stale_version_is_rejected(db, run):
+    scene_id, current_user = run(seed(db, 3, version=7))
+
+    with pytest.raises(HTTPException) as exc:
+        run(patch_scene_objects(scene_id, patch(6, {"op": "remove", "id": "obj_1"}),
+                                current_user=current_user, db=db))
+
+    assert exc.value.status_code == 409
+    assert exc.value.detail["version"] == 7
+    assert run(db.scene_ops.count_documents({})) == 0
+
+
+def test_concurrent_append_from_same_version_conflicts(db, run):
+    scene_id, current_user = run(seed(db, 3, version=0))
+    run(scene_log.append(db, ObjectId(scene_id), 0, plan_patch([SceneObjectOp(op="remove", id="obj_0")]),
+                         ObjectId(current_user.id)))
+
+    with pytest.raises(scene_log.VersionConflict) as exc:
+        run(scene_log.append(db, ObjectId(scene_id), 0, plan_patch([SceneObjectOp(op="remove", id="obj_1")]),
+                             ObjectId(current_user.id)))
+
+    assert exc.value.version == 1
+
+
+def test_missing_object_is_a_bad_request(db, run):
+    scene_id, current_user = run(seed(db, 3, version=1))
+
+    with pytest.raises(HTTPException) as exc:
+        run(patch_scene_objects(scene_id, patch(1, {"op": "remove", "id": "obj_missing"}),
+                                current_user=current_user, db=db))
+
+    assert exc.value.status_code == 400
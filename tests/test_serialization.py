@@ -0,0 +1,48 @@
+import json
+from datetime import datetime
+
+from bson import ObjectId
+
+from models.artwork import Artwork, ArtworkResponse
+from models.message import Message, MessageResponse
+from models.scene import Scene, SceneObject, Collaborator, SceneResponse
+from services.serialization import dumps
+
+
+def validated(model) -> dict:
+    return json.loads(model.model_dump_json())
+
+
+def test_artwork_fast_path_matches_validated_response():
+    doc = Artwork(artist_id="a", suite_id="suite-1", title="t", type="painting", file_url="/uploads/x.png",
+                  mime_type="image/png", file_size=10, metadata={"variants": {}}, tags=["x"],
+                  created_at=datetime(2024, 1, 1, 12, 0, 0, 123000)).dict()
+    doc["_id"] = ObjectId()
+
+    fast = json.loads(dumps(ArtworkResponse.from_doc(doc, "Ann", "cursor")))
+
+    assert fast == validated(ArtworkResponse.from_artwork(Artwork(**doc), "Ann", "cursor"))
+
+
+def test_message_fast_path_matches_validated_response():
+    doc = Message(scene_id=ObjectId(), sender=ObjectId(), content="hi",
+                  timestamp=datetime(2024, 1, 1, 0, 0, 1, 5000)).dict(by_alias=True)
+    sender = {"id": str(doc["sender"]), "name": "Ann", "email": "", "avatar": None}
+
+    fast = json.loads(dumps(MessageResponse.from_doc(doc, sender, "c")))
+
+    assert fast == validated(MessageResponse.from_message(Message(**doc), sender, "c"))
+
+
+def test_scene_fast_path_matches_validated_response():
+    doc = Scene(
+        name="Office", owner=ObjectId(),
+        objects=[SceneObject(id=str(i), type="desk", position={"x": i, "y": 0.5}) for i in range(3)],
+        collaborators=[Collaborator(user=ObjectId(), status="active")]
+    ).dict(by_alias=True)
+    details = [{"user": {"id": "u"}, "permissions": ["view"], "status": "active", "invited_at": datetime(2024, 1, 1)}]
+
+    fast = json.loads(dumps(SceneResponse.from_scene(Scene.from_doc(doc), "Ann", details)))
+
+    expected = SceneResponse(**SceneResponse.from_scene(Scene(**doc), "Ann", details).model_dump())
+    assert fast == validated(expected)
@@ -0,0 +1,19 @@
+from routes.artwork import get_all_suites
+from services import suite_counts
+
+
+def test_suite_listing_reads_maintained_counters(db, run):
+    run(db.artworks.insert_many([{"id": str(i), "suite_id": "suite-2"} for i in range(3)]))
+    run(suite_counts.bootstrap(db))
+    run(suite_counts.increment(db, "suite-4"))
+    db.calls.clear()
+
+    suites = run(get_all_suites(db=db))
+
+    counts = {suite.id: suite.artwork_count for suite in suites}
+    assert counts["suite-2"] == 3 and counts["suite-1"] == 0
+    assert db.count() == 1
+
+    assert run(suite_counts.verify(db)) == {"suite-4": {"stored": 1, "actual": 0}}
+    run(suite_counts.rebuild(db))
+    assert run(suite_counts.verify(db)) == {}
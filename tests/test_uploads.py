@@ -0,0 +1,156 @@
+import hashlib
+import io
+import os
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from starlette.datastructures import Headers
+
+import services.uploads as uploads
+from routes.artwork import upload_artwork
+from services.uploads import (
+    UploadSizeLimitMiddleware, stream_upload, store_upload, release_upload, storage_key
+)
+
+
+def test_upload_is_streamed_and_hashed(tmp_path, run, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_SIZE", 1000)
+    body = os.urandom(10_500)
+    dest = str(tmp_path / "art.png")
+
+    stored = run(stream_upload(UploadFile(io.BytesIO(body)), dest, max_bytes=20_000))
+
+    assert stored.size == len(body)
+    assert stored.sha256 == hashlib.sha256(body).hexdigest()
+    assert open(dest, "rb").read() == body
+
+
+def test_oversized_upload_is_aborted_without_leftovers(tmp_path, run, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_SIZE", 1000)
+    dest = str(tmp_path / "song.mp3")
+
+    with pytest.raises(HTTPException) as exc:
+        run(stream_upload(UploadFile(io.BytesIO(b"x" * 5000)), dest, max_bytes=2500))
+
+    assert exc.value.status_code == 413
+    assert os.listdir(tmp_path) == []
+
+
+def test_identical_uploads_share_one_refcounted_file(tmp_path, db, run, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", str(tmp_path))
+    body = b"same pixels" * 100
+
+    first = run(store_upload(db, UploadFile(io.BytesIO(body)), "PNG", max_bytes=10_000))
+    second = run(store_upload(db, UploadFile(io.BytesIO(body)), "png", max_bytes=10_000))
+
+    assert first.key == second.key == storage_key(hashlib.sha256(body).hexdigest(), "png")
+    assert not first.deduplicated and second.deduplicated
+    assert os.path.exists(first.path)
+
+    assert run(release_upload(db, first.key)) is False
+    assert os.path.exists(first.path)
+    assert run(release_upload(db, first.key)) is True
+    assert not os.path.exists(first.path)
+    assert run(db.upload_blobs.count_documents({})) == 0
+
+
+def test_release_keeps_file_reuploaded_after_last_reference(tmp_path, db, run, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", str(tmp_path))
+    body = b"same pixels" * 100
+
+    class ReuploadAfterDelete:
+        """The same content arrives again between the blob record's delete and the unlink"""
+
+        def __getattr__(self, name):
+            collection = getattr(db, name)
+            if name != "upload_blobs":
+                return collection
+
+            class Blobs:
+                def __getattr__(self, attr):
+                    return getattr(collection, attr)
+
+                async def delete_one(self, *args, **kwargs):
+                    result = await collection.delete_one(*args, **kwargs)
+                    await store_upload(db, UploadFile(io.BytesIO(body)), "png", max_bytes=10_000)
+                    return result
+            return Blobs()
+
+    stored = run(store_upload(db, UploadFile(io.BytesIO(body)), "png", max_bytes=10_000))
+
+    assert run(release_upload(ReuploadAfterDelete(), stored.key)) is False
+    assert open(stored.path, "rb").read() == body
+    assert run(db.upload_blobs.find_one({"_id": stored.key}))["refcount"] == 1
+
+
+def test_failed_store_leaves_no_blob_record(tmp_path, db, run, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", str(tmp_path))
+
+    async def stale_hash(file, max_bytes):
+        # As if the spooled body changed after it was hashed
+        return 5, "0" * 64
+    monkeypatch.setattr(uploads, "hash_upload", stale_hash)
+
+    with pytest.raises(HTTPException) as exc:
+        run(store_upload(db, UploadFile(io.BytesIO(b"pixels")), "png", max_bytes=10_000))
+
+    assert exc.value.status_code == 400
+    assert run(db.upload_blobs.count_documents({})) == 0
+    assert os.listdir(tmp_path / "00") == []
+
+
+def test_artwork_insert_failure_releases_the_blob(tmp_path, db, run, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", str(tmp_path))
+    user = SimpleNamespace(id="artist")
+
+    class FailingInsert:
+        def __getattr__(self, name):
+            collection = getattr(db, name)
+            if name != "artworks":
+                return collection
+
+            class Artworks:
+                def __getattr__(self, attr):
+                    return getattr(collection, attr)
+
+                async def insert_one(self, *args, **kwargs):
+                    raise RuntimeError("primary stepped down")
+            return Artworks()
+
+    file = UploadFile(io.BytesIO(b"RIFF take" * 100), filename="take.wav",
+                      headers=Headers({"content-type": "audio/wav"}))
+    with pytest.raises(RuntimeError):
+        run(upload_artwork("suite-2", file=file, title="Take", description=None, artwork_type="music",
+                           tags="[]", is_public=True, current_user=user, db=FailingInsert()))
+
+    assert run(db.upload_blobs.count_documents({})) == 0
+    assert [name for _, _, names in os.walk(tmp_path) for name in names] == []
+
+
+def test_oversized_upload_requests_are_refused_before_parsing(run):
+    handled = []
+    app = FastAPI()
+
+    @app.post("/api/suites/{suite_id}/artworks")
+    async def upload(suite_id: str, file: UploadFile = File(...)):
+        handled.append(suite_id)
+        return {"ok": True}
+
+    app.add_middleware(UploadSizeLimitMiddleware, max_bytes=10_000)
+
+    async def post(content):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/api/suites/suite-1/artworks", content=content,
+                                     headers={"content-type": "multipart/form-data; boundary=x"})
+
+    async def chunked():
+        yield b'--x\r\nContent-Disposition: form-data; name="file"; filename="big.png"\r\n\r\n'
+        for _ in range(20):
+            yield b"x" * 1000
+
+    assert run(post(b"x" * 20_000)).status_code == 413
+    assert run(post(chunked())).status_code == 413
+    assert handled == []